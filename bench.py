@@ -0,0 +1,395 @@
+"""Headless benchmarks for the drill hot paths at scale.
+
+    python bench.py                              # 1k..1M reviews, 100..100k points
+    python bench.py --quick                      # stop at 100k reviews / 10k points
+    python bench.py --reviews 1000 50000 --points 500 --out before.json
+    python bench.py --compare before.json after.json [--threshold 1.25]
+
+Every run builds synthetic user_data/ and data/ trees in a scratch directory,
+times the same code paths the app runs (without creating any windows) and
+writes the results as JSON, so two runs can be compared for regressions.
+When numpy is installed, each run also checks that the vectorised stats
+rebuild gives the same figures as the per-row one.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from itertools import chain
+
+import drill
+
+from storage import (DATA_FOLDER, LEGACY_LOG_FILE, PROGRESS_FILE, PROGRESS_FOLDER,
+                     STATS_FILE, JsonStore, LevelCache, StudyLog, atomic_write_json)
+from drill import DrillSession, HistoryStore, StatsIndex, make_entry, optional_numpy
+
+REVIEW_SIZES = [1000, 10000, 100000, 1000000]
+POINT_SIZES  = [100, 1000, 10000, 100000]
+QUICK_REVIEWS = [1000, 10000, 100000]
+QUICK_POINTS  = [100, 1000, 10000]
+LOG_POINTS   = 1000            # grammar points referenced by the synthetic study logs
+LEVEL        = "BENCH"         # level name of the synthetic level file and weights shard
+TODAY        = date(2025, 6, 30)
+DIFFS        = ["Easy", "Normal", "Normal", "Hard"]
+KANA         = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわを"
+QUERIES      = ["", "の", "文法", "ます", "文法0001", "ね か"]
+ODD_ENTRIES  = [              # dates outside the canonical format, which HistoryStore keeps aside
+    {"date": "2025-6-30 9:05", "grammar": "文法000001", "sentence": "", "difficulty": "Hard"},
+    {"date": "yesterday", "grammar": "文法000002", "sentence": "変な日付", "difficulty": "Easy"},
+]
+
+
+# ─────────────────────────────────────────────────────────────
+# Synthetic Data
+# ─────────────────────────────────────────────────────────────
+
+def grammar_name(i):
+    return f"文法{i:06d}"
+
+
+def write_level(path, num_points):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(num_points):
+            f.write(f"{grammar_name(i)} ;; https://example.com/grammar/{i}\n")
+
+
+def synthetic_entries(num_reviews, rng):
+    """Oldest first, spread over roughly a year per 20k reviews, with repeats."""
+    days = max(1, min(num_reviews // 20, 3 * 365))
+    start = datetime.combine(TODAY - timedelta(days=days - 1), datetime.min.time())
+    sentences = []
+    for i in range(num_reviews):
+        when = start + timedelta(minutes=(i * days * 1440) // num_reviews)
+        if sentences and rng.random() < 0.3:
+            sentence = rng.choice(sentences)
+        else:
+            sentence = "".join(rng.choice(KANA) for _ in range(rng.randint(8, 30))) + "ます。"
+            if len(sentences) < 5000:
+                sentences.append(sentence)
+        yield make_entry(grammar_name(rng.randrange(LOG_POINTS)), sentence, rng.choice(DIFFS), when)
+
+
+def build_user_data(num_reviews, seed, legacy=False):
+    rng = random.Random(seed)
+    weights = {grammar_name(i): round(rng.uniform(10, 500), 2) for i in range(LOG_POINTS)}
+    os.makedirs(PROGRESS_FOLDER)
+    with open(os.path.join(PROGRESS_FOLDER, LEVEL + ".json"), 'w', encoding='utf-8') as f:
+        json.dump(weights, f, ensure_ascii=False, indent=2)
+    if legacy:
+        # The pre-journal format: one JSON array, newest first.
+        with open(LEGACY_LOG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(list(synthetic_entries(num_reviews, rng))[::-1], f, ensure_ascii=False, indent=2)
+        return
+    log, batch = StudyLog(), []
+    for entry in synthetic_entries(num_reviews, rng):
+        batch.append(entry)
+        if len(batch) >= 10000:
+            log.append(batch)
+            batch = []
+    log.append(batch)
+    log.compact()
+
+
+def reset_user_data():
+    shutil.rmtree("user_data", ignore_errors=True)
+    os.makedirs("user_data")
+
+
+# ─────────────────────────────────────────────────────────────
+# Measurement
+# ─────────────────────────────────────────────────────────────
+
+def measure(run, setup=None, repeat=5):
+    """Best and median wall time over `repeat` runs, then one traced run for peak memory."""
+    times = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        gc.collect()
+        t0 = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - t0)
+    state = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    run(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"best_s": min(times), "median_s": statistics.median(times),
+            "repeat": repeat, "peak_kb": peak // 1024}
+
+
+def repeats_for(size):
+    return 5 if size <= 10000 else 3 if size <= 100000 else 1
+
+
+# ─────────────────────────────────────────────────────────────
+# Cases
+# ─────────────────────────────────────────────────────────────
+
+def review_cases(num_reviews, seed):
+    """App._load_data / _save_data, StatsWindow, _calc_streaks and HistoryWindow._apply_filter."""
+    reset_user_data()
+    build_user_data(num_reviews, seed)
+    repeat = repeats_for(num_reviews)
+    out = {}
+
+    def load_cold():
+        if os.path.exists(STATS_FILE):
+            os.remove(STATS_FILE)
+
+    def load(_):
+        store = JsonStore()
+        store.load_weights(LEVEL)
+        store.load_stats(store.load_history())
+
+    out["load_data_cold"] = measure(load, load_cold, repeat)    # rebuilds stats.json
+    out["load_data"] = measure(load, None, repeat)
+
+    store = JsonStore()
+    weights = store.load_weights(LEVEL)
+    history = store.load_history()
+    stats = store.load_stats(history)
+
+    def save(_):
+        entries = [make_entry(grammar_name(i), "ベンチマークの文です。", "Hard") for i in range(3)]
+        for entry in entries:
+            history.add(entry)
+            stats.add(entry)
+        changed = {e["grammar"]: weights[e["grammar"]] for e in entries}
+        store.write({"weights": {LEVEL: changed}, "reviews": entries, "stats": None})
+
+    out["save_data"] = measure(save, None, repeat)
+    # stats.json is written once, on close; the next load folds in the reviews saved since.
+    out["load_data_catch_up"] = measure(load, None, 1)
+    out["save_stats_on_close"] = measure(
+        lambda _: store.write({"weights": None, "reviews": [], "stats": stats.to_json()}), None, repeat)
+
+    def stats_window(_):
+        stats.unique_sentences()
+        stats.streaks(TODAY)
+        stats.day_counts()
+        for num_days in (1, 7, 30, 365):
+            stats.period(num_days, TODAY)
+        sorted(weights.items(), key=lambda x: x[1], reverse=True)[:10]
+
+    out["stats_window"] = measure(stats_window, None, repeat)
+
+    def calc_streaks(_):
+        stats.recount_streaks()
+        stats.streaks(TODAY)
+
+    out["calc_streaks"] = measure(calc_streaks, None, repeat)
+
+    rows = HistoryStore.from_entries(StudyLog().iter_entries())
+    out["stats_from_rows"] = measure(lambda _: StatsIndex.from_store(rows), None, repeat)
+    del rows
+    check_numpy_stats(HistoryStore.from_entries(chain(StudyLog().iter_entries(), ODD_ENTRIES)))
+
+    def fresh_history():
+        return JsonStore().load_history()
+
+    def search_everything(h):
+        # A query that has to open and index every closed month.
+        h.search("の").fetch(float("inf"), max_segments=len(h.segments))
+
+    out["search_all_segments"] = measure(search_everything, fresh_history, repeat)
+
+    history.search("")
+    for query in QUERIES:
+        def apply_filter(_, query=query):
+            history.search(query, "All")
+            history.search(query, "Hard")
+        out[f"apply_filter[{query}]"] = measure(apply_filter, None, repeat)
+
+    def typing(_):
+        # One keystroke at a time, each query narrowing the previous result.
+        result = None
+        for i in range(1, len("文法0001") + 1):
+            result = history.search("文法0001"[:i], "All", result)
+
+    out["apply_filter_typing"] = measure(typing, None, repeat)
+
+    def migrate_setup():
+        reset_user_data()
+        build_user_data(num_reviews, seed, legacy=True)
+
+    out["migrate_legacy_log"] = measure(lambda _: StudyLog().migrate(), migrate_setup, 1)
+    out["compact_log"] = measure(lambda _: StudyLog().compact(), None, 1)
+    return out
+
+
+def stats_signature(stats):
+    """StatsIndex.to_json with the orderings that carry no meaning taken out."""
+    data = stats.to_json()
+    data["difficulty"] = dict(data["difficulty"])
+    data["day_grammar"] = {day: sorted(names) for day, names in data["day_grammar"].items()}
+    data["sentences"] = sorted(data["sentences"])
+    return data
+
+
+def check_numpy_stats(rows):
+    """Fail the run if the numpy StatsIndex.from_store disagrees with the per-row path."""
+    if not drill.USE_NUMPY or optional_numpy() is None or len(rows) < drill.NUMPY_MIN_ROWS:
+        return
+    fast = stats_signature(StatsIndex.from_store(rows))
+    drill.USE_NUMPY = False
+    try:
+        slow = stats_signature(StatsIndex.from_store(rows))
+    finally:
+        drill.USE_NUMPY = True
+    differ = [key for key in slow if fast.get(key) != slow[key]]
+    if differ:
+        raise AssertionError(f"numpy stats differ from the per-row path in: {', '.join(differ)}")
+
+
+def point_cases(num_points, seed):
+    """Level scanning (cold and cached), App._deal_cards and the progress split on a level of `num_points`."""
+    shutil.rmtree(DATA_FOLDER, ignore_errors=True)
+    os.makedirs(DATA_FOLDER)
+    write_level(os.path.join(DATA_FOLDER, LEVEL + ".txt"), num_points)
+    reset_user_data()
+    repeat = repeats_for(num_points)
+    out = {}
+
+    out["scan_levels_cold"] = measure(lambda _: LevelCache(path=os.devnull).scan(), None, repeat)
+    cache = LevelCache(path=os.devnull)
+    cache.scan()
+    warm = cache.to_json()
+    with open("user_data/levels.json", 'w', encoding='utf-8') as f:
+        json.dump(warm, f, ensure_ascii=False)
+    out["scan_levels"] = measure(lambda _: LevelCache(path="user_data/levels.json").scan(), None, repeat)
+
+    def start_session(_):
+        c = LevelCache(path="user_data/levels.json")
+        c.scan()
+        return DrillSession(c.points(LEVEL), c.index(LEVEL), {})
+
+    out["start_session"] = measure(start_session, None, repeat)
+
+    session = start_session(None)
+    rng = random.Random(seed)
+
+    def deal(_):
+        for _ in range(200):
+            for card in session.deal(5, rng):
+                session.rate(card["name"], rng.choice(DIFFS))
+
+    out["deal_cards_x200"] = measure(deal, None, repeat)
+
+    def flat_progress():
+        shutil.rmtree(PROGRESS_FOLDER, ignore_errors=True)
+        atomic_write_json(PROGRESS_FILE, {grammar_name(i): 100.0 for i in range(num_points)}, indent=2)
+
+    def split_progress(_):
+        JsonStore().migrate_progress(LevelCache(path="user_data/levels.json"))
+
+    out["migrate_progress"] = measure(split_progress, flat_progress, repeat)
+    return out
+
+
+# ─────────────────────────────────────────────────────────────
+# Reports
+# ─────────────────────────────────────────────────────────────
+
+def git_revision(repo):
+    try:
+        return subprocess.run(["git", "-C", repo, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(args):
+    repo = os.path.dirname(os.path.abspath(__file__))
+    report = {
+        "meta": {
+            "started": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(repo),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "numpy": getattr(optional_numpy(), "__version__", None),
+        },
+        "results": [],
+    }
+    workdir = tempfile.mkdtemp(prefix="drill-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for size in args.reviews:
+            for case, result in review_cases(size, args.seed).items():
+                report["results"].append({"case": case, "size": size, **result})
+                _print_row(case, size, result)
+        for size in args.points:
+            for case, result in point_cases(size, args.seed).items():
+                report["results"].append({"case": case, "size": size, **result})
+                _print_row(case, size, result)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    out = args.out or os.path.join(repo, "bench_results",
+                                   datetime.now().strftime("bench-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nwrote {out}")
+    return 0
+
+
+def _print_row(case, size, result):
+    print(f"{case:<28} {size:>9,}  best {result['best_s'] * 1000:10.2f} ms"
+          f"  median {result['median_s'] * 1000:10.2f} ms  peak {result['peak_kb']:>9,} KB")
+
+
+def compare(base_path, new_path, threshold):
+    """Print new/base ratios; exit status 1 if any case got slower than `threshold`."""
+    with open(base_path, 'r', encoding='utf-8') as f:
+        base = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)["results"]
+    regressed = 0
+    for r in new:
+        old = base.get((r["case"], r["size"]))
+        if not old:
+            continue
+        ratio = r["best_s"] / old["best_s"] if old["best_s"] else 1.0
+        mem = r["peak_kb"] / old["peak_kb"] if old["peak_kb"] else 1.0
+        flag = "  REGRESSION" if ratio > threshold else ""
+        regressed += bool(flag)
+        print(f"{r['case']:<28} {r['size']:>9,}  time x{ratio:5.2f}  mem x{mem:5.2f}{flag}")
+    return 1 if regressed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grammar Drill benchmarks")
+    parser.add_argument("--reviews", type=int, nargs="*", help="study log sizes")
+    parser.add_argument("--points", type=int, nargs="*", help="level file sizes")
+    parser.add_argument("--quick", action="store_true", help="skip the largest sizes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="result file (default bench_results/bench-<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression by --compare")
+    args = parser.parse_args(argv)
+    if args.compare:
+        return compare(*args.compare, args.threshold)
+    if args.reviews is None:
+        args.reviews = QUICK_REVIEWS if args.quick else REVIEW_SIZES
+    if args.points is None:
+        args.points = QUICK_POINTS if args.quick else POINT_SIZES
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,829 @@
+import hashlib
+import random
+from array import array
+from datetime import date, datetime, timedelta
+
+# ─────────────────────────────────────────────────────────────
+# Weight Rules
+# ─────────────────────────────────────────────────────────────
+
+DEFAULT_WEIGHT = 100
+MIN_WEIGHT     = 10
+MAX_WEIGHT     = 500
+
+
+def apply_rating(weight, difficulty):
+    """HARD x1.5 (max 500), EASY x0.6 (min 10), OK unchanged."""
+    if difficulty == "Hard":
+        return min(weight * 1.5, MAX_WEIGHT)
+    if difficulty == "Easy":
+        return max(weight * 0.6, MIN_WEIGHT)
+    return weight
+
+
+def mastery(weight):
+    """0-100, where 100 is a point sitting at the minimum weight."""
+    return max(0, min(100, int((1 - (weight - MIN_WEIGHT) / (MAX_WEIGHT - MIN_WEIGHT)) * 100)))
+
+
+TIERS = ((30, "Mastered"), (80, "Comfortable"), (150, "Learning"))
+
+
+def mastery_tier(weight):
+    """Mastered / Comfortable / Learning / Struggling, as in the Stats overview."""
+    for limit, tier in TIERS:
+        if weight <= limit:
+            return tier
+    return "Struggling"
+
+
+def make_entry(name, sentence, difficulty, when=None):
+    return {
+        "date": (when or datetime.now()).strftime("%Y-%m-%d %H:%M"),
+        "grammar": name,
+        "sentence": sentence,
+        "difficulty": difficulty,
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Weighted Sampler
+# ─────────────────────────────────────────────────────────────
+
+class WeightedSampler:
+    """Fenwick (binary indexed) tree over card weights.
+
+    Lives for the whole session: `update` and each draw are O(log n), so
+    dealing a round no longer copies the deck or rebuilds a weights list.
+    A draw picks index i with probability w[i] / sum(w), exactly like
+    `random.choices`, and `draw(k)` repeats that without replacement.
+    """
+
+    def __init__(self, weights=()):
+        self._w = [float(w) for w in weights]
+        self.n = len(self._w)
+        tree = [0.0] + self._w
+        for i in range(1, self.n + 1):
+            parent = i + (i & -i)
+            if parent <= self.n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << max(self.n.bit_length() - 1, 0)
+
+    def __len__(self):
+        return self.n
+
+    def weight(self, index):
+        return self._w[index]
+
+    def total(self):
+        i, s = self.n, 0.0
+        while i > 0:
+            s += self._tree[i]
+            i -= i & -i
+        return s
+
+    def update(self, index, weight):
+        weight = float(weight)
+        delta = weight - self._w[index]
+        if not delta:
+            return
+        self._w[index] = weight
+        i = index + 1
+        while i <= self.n:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _find(self, target):
+        # Smallest index whose prefix sum exceeds target (bisect_right).
+        pos, step = 0, self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.n and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        if pos >= self.n:
+            # Float drift at the very top of the range: take the last live card.
+            pos = max(i for i in range(self.n) if self._w[i] > 0)
+        return pos
+
+    def draw(self, k, rng=random):
+        """Draw up to k distinct indices, weighted, without replacement."""
+        picks = []
+        for _ in range(min(k, self.n)):
+            total = self.total()
+            if total <= 0:
+                break
+            idx = self._find(rng.random() * total)
+            picks.append((idx, self._w[idx]))
+            self.update(idx, 0.0)
+        for idx, w in picks:
+            self.update(idx, w)
+        return [idx for idx, _ in picks]
+
+
+class DrillSession:
+    """One level's deck: weighted dealing and rating, shared by every front end.
+
+    `weights` is the caller's dict and is updated in place; names whose
+    weight changed (including new defaults) are added to `dirty`.
+    """
+
+    def __init__(self, points, index, weights, dirty=None):
+        self.points = points
+        self.index = index
+        self.weights = weights
+        self.dirty = dirty if dirty is not None else set()
+        for name in index:
+            if name not in weights:
+                weights[name] = DEFAULT_WEIGHT
+                self.dirty.add(name)
+        self.sampler = WeightedSampler(weights[p["name"]] for p in points)
+
+    def __len__(self):
+        return len(self.points)
+
+    def deal(self, n, rng=random):
+        return [self.points[i] for i in self.sampler.draw(n, rng)]
+
+    def rate(self, name, difficulty):
+        w = apply_rating(self.weights.get(name, DEFAULT_WEIGHT), difficulty)
+        self.weights[name] = w
+        self.dirty.add(name)
+        for i in self.index.get(name, ()):
+            self.sampler.update(i, w)
+        return w
+
+
+# ─────────────────────────────────────────────────────────────
+# Stats Index
+# ─────────────────────────────────────────────────────────────
+
+DATE_FMT = "%Y-%m-%d %H:%M"
+DAY_FMT  = "%Y-%m-%d"
+DIFF_SLOTS = {"Easy": 1, "Normal": 2, "Hard": 3}
+EPOCH = datetime(1970, 1, 1)
+EPOCH_WEEKDAY = EPOCH.weekday()
+
+USE_NUMPY = True          # set False to force the pure-Python aggregation
+NUMPY_MIN_ROWS = 2000     # below this the per-row loop is as fast
+_numpy = None
+
+
+def optional_numpy():
+    """The numpy module if it is installed, else None. Imported on first use
+    so the terminal mode and small histories never pay for it."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def sentence_key(sentence):
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class StatsIndex:
+    """Running aggregate behind the Stats dashboard.
+
+    `add` folds in one review as it is rated, so opening the dashboard reads
+    a handful of counters instead of re-parsing the whole history. Per-day
+    buckets are `[total, easy, normal, hard]`; `recent` keeps the last
+    RECENT (grammar, difficulty) pairs, newest first.
+    """
+
+    VERSION = 1
+    RECENT = 50
+
+    def __init__(self):
+        self.entries = 0
+        self.reviews = 0
+        self.days = {}
+        self.day_grammar = {}
+        self.weekdays = [0] * 7
+        self.hours = [0] * 24
+        self.difficulty = {}
+        self.grammar = {}
+        self.run_end = None
+        self.run = 0
+        self.best = 0
+        self._stale_streaks = False
+        self.chars = 0
+        self.written = 0
+        self.longest = 0
+        self.shortest = 0
+        self.sentences = set()
+        self.blank_sentence = False
+        self.recent = []
+        self._parsed = (None, None)
+        self._day = (None, None)
+        self._sentence = None
+
+    @classmethod
+    def from_store(cls, store):
+        """Build from a HistoryStore's columns without materialising entries."""
+        np = optional_numpy() if USE_NUMPY and len(store) >= NUMPY_MIN_ROWS else None
+        if np is not None:
+            return cls._from_store_numpy(store, np)
+        stats = cls()
+        last_minute, dt = None, None
+        for row, (minute, name, sentence, diff) in enumerate(store.rows()):
+            if minute < 0:
+                # Not in the canonical format; let strptime have the final say.
+                stats.add(store.entry_by_row(row))
+                continue
+            stats.entries += 1
+            if minute != last_minute:
+                last_minute, dt = minute, EPOCH + timedelta(minutes=minute)
+            stats._fold(dt, name, sentence, diff)
+        return stats
+
+    @classmethod
+    def _from_store_numpy(cls, store, np):
+        """from_store over typed arrays: bincounts per day, weekday, hour,
+        difficulty and grammar, with Python loops only over distinct days,
+        (day, grammar) pairs and sentences. Rows kept in `_odd` are folded
+        one by one as usual; the numbers match the per-row path exactly."""
+        stats = cls()
+        n = len(store)
+        canonical = np.ones(n, dtype=bool)
+        if store._odd:
+            canonical[np.fromiter(store._odd, dtype=np.int64, count=len(store._odd))] = False
+        minutes = np.frombuffer(store.minutes, dtype=np.int32).astype(np.int64)[canonical]
+        gids = np.frombuffer(store.grammar_ids, dtype=np.uint32).astype(np.int64)[canonical]
+        sids = np.frombuffer(store.sentence_ids, dtype=np.uint32).astype(np.int64)[canonical]
+        codes = np.frombuffer(store.diffs, dtype=np.uint8).astype(np.int64)[canonical]
+        names, sentences = store.names, store.sentences
+
+        days = minutes // 1440
+        uniq, first, inv = np.unique(days, return_index=True, return_inverse=True)
+        inv = inv.reshape(-1)
+        per_diff = np.bincount(inv * 3 + codes, minlength=len(uniq) * 3).reshape(-1, 3)
+        labels = [(EPOCH + timedelta(days=d)).strftime(DAY_FMT) for d in uniq.tolist()]
+        for k in np.argsort(first, kind="stable").tolist():
+            row = per_diff[k].tolist()
+            stats.days[labels[k]] = [sum(row)] + row
+            stats.day_grammar[labels[k]] = []
+        pairs, pair_first = np.unique(inv * len(names) + gids, return_index=True)
+        order = np.argsort(pair_first, kind="stable")
+        day_grammar = stats.day_grammar
+        for pair in pairs[order].tolist():
+            day_grammar[labels[pair // len(names)]].append(names[pair % len(names)])
+
+        stats.weekdays = np.bincount((days + EPOCH_WEEKDAY) % 7, minlength=7).tolist()
+        stats.hours = np.bincount(minutes % 1440 // 60, minlength=24).tolist()
+        for code in np.unique(codes).tolist():
+            stats.difficulty[DIFF_CODES[code]] = int(np.count_nonzero(codes == code))
+        counts = np.bincount(gids, minlength=len(names))
+        for gid in np.flatnonzero(counts).tolist():
+            stats.grammar[names[gid]] = int(counts[gid])
+
+        lengths = np.fromiter(map(len, sentences), dtype=np.int64, count=len(sentences))[sids]
+        written = lengths > 0
+        stats.reviews = len(minutes)
+        stats.written = int(np.count_nonzero(written))
+        stats.chars = int(lengths.sum())
+        if stats.written:
+            stats.longest = int(lengths.max())
+            stats.shortest = int(lengths[written].min())
+        stats.blank_sentence = stats.written < stats.reviews
+        stats.sentences = {sentence_key(sentences[sid]) for sid in np.unique(sids[written]).tolist()}
+
+        stats._stale_streaks = True
+        odd = store._odd
+        for row in sorted(odd):
+            minute, entry = store.minutes[row], odd[row]
+            if minute < 0:
+                stats.add(entry)
+            else:
+                stats._fold(EPOCH + timedelta(minutes=minute), entry.get("grammar"),
+                            entry.get("sentence", ""), entry.get("difficulty"))
+        stats.entries = n
+
+        # The newest RECENT folded reviews, as the per-row path leaves them.
+        stats.recent = []
+        for row in range(n - 1, -1, -1):
+            if len(stats.recent) >= cls.RECENT:
+                break
+            entry = odd.get(row)
+            if entry is None:
+                stats.recent.append((names[store.grammar_ids[row]], DIFF_CODES[store.diffs[row]]))
+            elif store.minutes[row] >= 0 or stats._parse(entry.get("date", "")) is not None:
+                stats.recent.append((entry.get("grammar"), entry.get("difficulty")))
+        return stats
+
+    def _parse(self, date_str):
+        # Entries of one round share a timestamp; parse each distinct one once.
+        if date_str != self._parsed[0]:
+            try:
+                dt = datetime.strptime(date_str, DATE_FMT)
+            except Exception:
+                dt = None
+            self._parsed = (date_str, dt)
+        return self._parsed[1]
+
+    def add(self, item):
+        self.entries += 1
+        dt = self._parse(item.get("date", ""))
+        if dt is not None:
+            self._fold(dt, item.get("grammar"), item.get("sentence", ""), item.get("difficulty"))
+
+    def _fold(self, dt, name, sentence, diff):
+        self.reviews += 1
+        day = dt.strftime(DAY_FMT) if dt != self._day[0] else self._day[1]
+        self._day = (dt, day)
+        bucket = self.days.get(day)
+        if bucket is None:
+            bucket = self.days[day] = [0, 0, 0, 0]
+            self.day_grammar[day] = []
+            self._mark_day(dt.date())
+        bucket[0] += 1
+        if diff in DIFF_SLOTS:
+            bucket[DIFF_SLOTS[diff]] += 1
+        self.difficulty[diff] = self.difficulty.get(diff, 0) + 1
+        if name not in self.day_grammar[day]:
+            self.day_grammar[day].append(name)
+        self.grammar[name] = self.grammar.get(name, 0) + 1
+        self.weekdays[dt.weekday()] += 1
+        self.hours[dt.hour] += 1
+        if sentence:
+            n = len(sentence)
+            self.chars += n
+            self.longest = max(self.longest, n)
+            self.shortest = n if not self.written else min(self.shortest, n)
+            self.written += 1
+            if sentence != self._sentence:
+                # Cards of one round share their sentence; hash it once.
+                self._sentence = sentence
+                self.sentences.add(sentence_key(sentence))
+        else:
+            self.blank_sentence = True
+        self.recent.insert(0, (name, diff))
+        del self.recent[self.RECENT:]
+
+    def merge(self, other):
+        """Fold in the aggregate of a later stretch of history (a segment rollup)."""
+        self.entries += other.entries
+        self.reviews += other.reviews
+        for day, bucket in other.days.items():
+            mine = self.days.get(day)
+            if mine is None:
+                self.days[day] = list(bucket)
+                self.day_grammar[day] = list(other.day_grammar.get(day, ()))
+                continue
+            for i in range(4):
+                mine[i] += bucket[i]
+            names = self.day_grammar[day]
+            names.extend(n for n in other.day_grammar.get(day, ()) if n not in names)
+        for i in range(7):
+            self.weekdays[i] += other.weekdays[i]
+        for i in range(24):
+            self.hours[i] += other.hours[i]
+        for diff, n in other.difficulty.items():
+            self.difficulty[diff] = self.difficulty.get(diff, 0) + n
+        for name, n in other.grammar.items():
+            self.grammar[name] = self.grammar.get(name, 0) + n
+        if other.written:
+            self.longest = max(self.longest, other.longest)
+            self.shortest = other.shortest if not self.written else min(self.shortest, other.shortest)
+        self.chars += other.chars
+        self.written += other.written
+        self.sentences |= other.sentences
+        self.blank_sentence = self.blank_sentence or other.blank_sentence
+        self.recent = (list(other.recent) + self.recent)[:self.RECENT]
+        if other.days:
+            self._stale_streaks = True
+        self._day = (None, None)
+        self._sentence = None
+
+    def _mark_day(self, day):
+        if self._stale_streaks:
+            return
+        if self.run_end is None or day > self.run_end:
+            self.run = self.run + 1 if self.run_end == day - timedelta(days=1) else 1
+            self.run_end = day
+            self.best = max(self.best, self.run)
+        else:
+            # A day older than the latest one (clock change, import): recount
+            # once, when the streaks are next read.
+            self._stale_streaks = True
+
+    def recount_streaks(self):
+        self._stale_streaks = False
+        self.run_end, self.run, self.best = None, 0, 0
+        prev = None
+        for day in sorted(datetime.strptime(d, DAY_FMT).date() for d in self.days):
+            self.run = self.run + 1 if prev == day - timedelta(days=1) else 1
+            self.best = max(self.best, self.run)
+            prev = day
+        self.run_end = prev
+
+    def streaks(self, today=None):
+        """(current, best) streak in days; current survives until tomorrow ends."""
+        today = today or datetime.now().date()
+        if self._stale_streaks:
+            self.recount_streaks()
+        if self.run_end is not None and (today - self.run_end).days in (0, 1):
+            return self.run, self.best
+        return 0, self.best
+
+    def unique_sentences(self):
+        return len(self.sentences) + (1 if self.blank_sentence else 0)
+
+    def day_counts(self):
+        return {day: bucket[0] for day, bucket in self.days.items()}
+
+    def period(self, num_days, today=None):
+        """Totals over the last `num_days` calendar days, today included.
+
+        Returns (total, easy, normal, hard, unique_grammar).
+        """
+        today = today or datetime.now().date()
+        totals = [0, 0, 0, 0]
+        names = set()
+        for d in range(num_days):
+            day = (today - timedelta(days=d)).strftime(DAY_FMT)
+            bucket = self.days.get(day)
+            if bucket:
+                for i in range(4):
+                    totals[i] += bucket[i]
+                names.update(self.day_grammar[day])
+        return tuple(totals) + (len(names),)
+
+    def to_json(self):
+        """Detached snapshot, safe to serialise on another thread."""
+        if self._stale_streaks:
+            self.recount_streaks()
+        return {
+            "version": self.VERSION,
+            "entries": self.entries,
+            "reviews": self.reviews,
+            "days": {d: list(b) for d, b in self.days.items()},
+            "day_grammar": {d: list(g) for d, g in self.day_grammar.items()},
+            "weekdays": list(self.weekdays),
+            "hours": list(self.hours),
+            "difficulty": [[k, v] for k, v in self.difficulty.items()],
+            "grammar": dict(self.grammar),
+            "run_end": self.run_end.strftime(DAY_FMT) if self.run_end else None,
+            "run": self.run,
+            "best": self.best,
+            "chars": self.chars,
+            "written": self.written,
+            "longest": self.longest,
+            "shortest": self.shortest,
+            "sentences": list(self.sentences),
+            "blank_sentence": self.blank_sentence,
+            "recent": list(self.recent),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        if not isinstance(data, dict) or data.get("version") != cls.VERSION:
+            return None
+        stats = cls()
+        try:
+            stats.entries = data["entries"]
+            stats.reviews = data["reviews"]
+            stats.days = data["days"]
+            stats.day_grammar = data["day_grammar"]
+            stats.weekdays = data["weekdays"]
+            stats.hours = data["hours"]
+            stats.difficulty = {k: v for k, v in data["difficulty"]}
+            stats.grammar = data["grammar"]
+            run_end = data["run_end"]
+            stats.run_end = datetime.strptime(run_end, DAY_FMT).date() if run_end else None
+            stats.run = data["run"]
+            stats.best = data["best"]
+            stats.chars = data["chars"]
+            stats.written = data["written"]
+            stats.longest = data["longest"]
+            stats.shortest = data["shortest"]
+            stats.sentences = set(data["sentences"])
+            stats.blank_sentence = data["blank_sentence"]
+            stats.recent = [tuple(r) for r in data["recent"]]
+        except (KeyError, TypeError, ValueError):
+            return None
+        return stats
+
+
+# ─────────────────────────────────────────────────────────────
+# Search Index
+# ─────────────────────────────────────────────────────────────
+
+class SearchResult:
+    def __init__(self, query, difficulty, ids, size, lookup=None):
+        self.query = query
+        self.difficulty = difficulty
+        self.ids = ids
+        self.size = size
+        self.lookup = lookup
+
+    def __len__(self):
+        return len(self.ids)
+
+    def item(self, i):
+        return self.lookup(self.ids[i])
+
+
+class SearchIndex:
+    """Character n-gram index over history date, grammar, sentence and difficulty.
+
+    Entries get chronological ids (0 is the oldest review). Each distinct
+    field value is lowercased and indexed once by its 1- and 2-grams, which
+    needs no tokenizer for Japanese. A query finds the field values that
+    contain it and maps them back to entries. Results are newest first and
+    match a substring test on "date grammar sentence difficulty", as before.
+    """
+
+    FIELDS = 4
+    NARROW_LIMIT = 500
+
+    def __init__(self, lookup=None):
+        self.lookup = lookup
+        self._sid = {}
+        self._texts = []
+        self._grams = {}
+        self._postings = []
+        self._fields = array("I")
+        self._diff_keys = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_history(cls, history, lookup=None):
+        index = cls(lookup)
+        for item in reversed(history):
+            index.add(item)
+        return index
+
+    def _intern(self, value):
+        sid = self._sid.get(value)
+        if sid is None:
+            sid = self._sid[value] = len(self._texts)
+            text = value.lower()
+            self._texts.append(text)
+            self._postings.append(array("I"))
+            grams = set(text)
+            grams.update(text[i:i + 2] for i in range(len(text) - 1))
+            for g in grams:
+                self._grams.setdefault(g, []).append(sid)
+        return sid
+
+    def add(self, item):
+        eid = self.size
+        for value in (item.get("date", ""), item.get("grammar", ""),
+                      item.get("sentence", ""), item.get("difficulty", "")):
+            sid = self._intern(str(value))
+            self._fields.append(sid)
+            self._postings[sid].append(eid)
+        key = item.get("difficulty", "Normal")
+        self._diff_keys.setdefault(key, array("I")).append(eid)
+        self.size += 1
+
+    def _text(self, eid):
+        base = eid * self.FIELDS
+        return " ".join(self._texts[sid] for sid in self._fields[base:base + self.FIELDS])
+
+    def _matching_strings(self, piece):
+        if len(piece) == 1:
+            return self._grams.get(piece, ())
+        lists = []
+        for i in range(len(piece) - 1):
+            sids = self._grams.get(piece[i:i + 2])
+            if not sids:
+                return ()
+            lists.append(sids)
+        return [sid for sid in min(lists, key=len) if piece in self._texts[sid]]
+
+    def _entries_containing(self, piece):
+        ids = set()
+        for sid in self._matching_strings(piece):
+            ids.update(self._postings[sid])
+        return ids
+
+    def search(self, query, difficulty="All", previous=None):
+        """Entry ids matching `query`, newest first.
+
+        When `query` extends `previous.query` under the same difficulty
+        filter and the previous hits are few, only those (plus entries added
+        since) are checked; broad results are cheaper to redo from the index.
+        """
+        query = query.strip().lower()
+        if (previous is not None and previous.difficulty == difficulty
+                and previous.query and previous.query in query
+                and len(previous.ids) <= self.NARROW_LIMIT):
+            fresh = range(self.size - 1, previous.size - 1, -1)
+            if difficulty != "All":
+                allowed = set(self._diff_keys.get(difficulty, ()))
+                fresh = [i for i in fresh if i in allowed]
+            ids = [i for i in fresh if query in self._text(i)]
+            ids.extend(i for i in previous.ids if query in self._text(i))
+            return SearchResult(query, difficulty, ids, self.size, self.lookup)
+
+        if not query:
+            if difficulty == "All":
+                ids = range(self.size - 1, -1, -1)
+            else:
+                ids = self._diff_keys.get(difficulty, array("I"))[::-1]
+            return SearchResult(query, difficulty, ids, self.size, self.lookup)
+
+        if " " in query:
+            # The query may straddle fields; every space-free piece still sits
+            # inside one field, so narrow by the longest one and verify.
+            piece = max(query.split(" "), key=len)
+            if piece:
+                ids = [i for i in self._entries_containing(piece) if query in self._text(i)]
+            else:
+                ids = [i for i in range(self.size) if query in self._text(i)]
+        else:
+            ids = self._entries_containing(query)
+        if difficulty != "All":
+            ids = set(ids).intersection(self._diff_keys.get(difficulty, ()))
+        return SearchResult(query, difficulty, sorted(ids, reverse=True), self.size, self.lookup)
+
+
+# ─────────────────────────────────────────────────────────────
+# History Store
+# ─────────────────────────────────────────────────────────────
+
+DIFF_CODES = ("Easy", "Normal", "Hard")
+DIFF_CODE = {name: code for code, name in enumerate(DIFF_CODES)}
+ODD = 255
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+_day_minutes = {}
+
+
+def parse_minute(date_str):
+    """"YYYY-MM-DD HH:MM" -> minutes since 1970-01-01 (naive local time), or -1."""
+    try:
+        if len(date_str) != 16 or date_str[4] != "-" or date_str[7] != "-" \
+                or date_str[10] != " " or date_str[13] != ":":
+            return -1
+        # Reviews cluster on few days; each day's date() is built once.
+        day = _day_minutes.get(date_str[:10])
+        if day is None:
+            day = _day_minutes[date_str[:10]] = (date(int(date_str[0:4]), int(date_str[5:7]),
+                                                      int(date_str[8:10])).toordinal() - EPOCH_ORDINAL) * 1440
+        hour, minute = int(date_str[11:13]), int(date_str[14:16])
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            return -1
+    except (TypeError, ValueError):
+        return -1
+    return day + hour * 60 + minute
+
+
+def format_minute(minute):
+    day = date.fromordinal(EPOCH_ORDINAL + minute // 1440)
+    return f"{day.isoformat()} {minute % 1440 // 60:02d}:{minute % 60:02d}"
+
+
+class HistoryStore:
+    """Columnar review history, appended oldest first.
+
+    One row per review: epoch-minute timestamp (array 'i'), interned grammar
+    and sentence ids (array 'I') and a one-byte difficulty code. Rows that do
+    not fit (unparseable date, unusual difficulty, missing fields) keep their
+    original dict in `_odd` so nothing is lost. Index i of the public view is
+    newest first, as the old list was; `add` is O(1).
+    """
+
+    def __init__(self):
+        self.minutes = array("i")
+        self.grammar_ids = array("I")
+        self.sentence_ids = array("I")
+        self.diffs = array("B")
+        self.names = []
+        self.sentences = []
+        self._name_ids = {}
+        self._sentence_ids = {}
+        self._odd = {}
+        self._last_date = (None, -1)
+        self._index = None
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build from entries in chronological (oldest first) order."""
+        store = cls()
+        store.extend(entries)
+        return store
+
+    def __len__(self):
+        return len(self.diffs)
+
+    def _intern(self, table, ids, value):
+        i = ids.get(value)
+        if i is None:
+            i = ids[value] = len(table)
+            table.append(value)
+        return i
+
+    def append(self, entry):
+        date_str = entry.get("date", "")
+        if date_str == self._last_date[0]:
+            minute = self._last_date[1]
+        else:
+            minute = parse_minute(date_str)
+            self._last_date = (date_str, minute)
+        name = entry.get("grammar", "")
+        sentence = entry.get("sentence", "")
+        code = DIFF_CODE.get(entry.get("difficulty"), ODD)
+        row = len(self.diffs)
+        self.minutes.append(minute)
+        self.grammar_ids.append(self._intern(self.names, self._name_ids, name))
+        self.sentence_ids.append(self._intern(self.sentences, self._sentence_ids, sentence))
+        self.diffs.append(code)
+        if minute < 0 or code == ODD or len(entry) != 4 or not isinstance(name, str) \
+                or not isinstance(sentence, str):
+            self._odd[row] = dict(entry)
+        return row
+
+    def extend(self, entries):
+        """`append` for many entries (oldest first), with the per-row lookups hoisted."""
+        minutes, grammar_ids, sentence_ids, diffs = self.minutes, self.grammar_ids, self.sentence_ids, self.diffs
+        names, name_ids, sentences, sentence_ids_of = self.names, self._name_ids, self.sentences, self._sentence_ids
+        odd, diff_code = self._odd, DIFF_CODE.get
+        last_date, last_minute = self._last_date
+        row = len(diffs)
+        for entry in entries:
+            date_str = entry.get("date", "")
+            if date_str != last_date:
+                last_date, last_minute = date_str, parse_minute(date_str)
+            name = entry.get("grammar", "")
+            sentence = entry.get("sentence", "")
+            code = diff_code(entry.get("difficulty"), ODD)
+            gid = name_ids.get(name)
+            if gid is None:
+                gid = name_ids[name] = len(names)
+                names.append(name)
+            sid = sentence_ids_of.get(sentence)
+            if sid is None:
+                sid = sentence_ids_of[sentence] = len(sentences)
+                sentences.append(sentence)
+            minutes.append(last_minute)
+            grammar_ids.append(gid)
+            sentence_ids.append(sid)
+            diffs.append(code)
+            if last_minute < 0 or code == ODD or len(entry) != 4 or not isinstance(name, str) \
+                    or not isinstance(sentence, str):
+                odd[row] = dict(entry)
+            row += 1
+        self._last_date = (last_date, last_minute)
+
+    def add(self, entry):
+        """Record a new review (the newest) and keep the search index in step."""
+        self.append(entry)
+        if self._index is not None:
+            self._index.add(entry)
+
+    def entry_by_row(self, row):
+        odd = self._odd.get(row)
+        if odd is not None:
+            return dict(odd)
+        return {
+            "date": format_minute(self.minutes[row]),
+            "grammar": self.names[self.grammar_ids[row]],
+            "sentence": self.sentences[self.sentence_ids[row]],
+            "difficulty": DIFF_CODES[self.diffs[row]],
+        }
+
+    def __getitem__(self, i):
+        n = len(self.diffs)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return self.entry_by_row(n - 1 - i)
+
+    def __iter__(self):
+        for row in range(len(self.diffs) - 1, -1, -1):
+            yield self.entry_by_row(row)
+
+    def __reversed__(self):
+        for row in range(len(self.diffs)):
+            yield self.entry_by_row(row)
+
+    def rows(self):
+        """(minute, grammar, sentence, difficulty) tuples, oldest first; minute is -1 if unparseable."""
+        names, sentences, odd = self.names, self.sentences, self._odd
+        for row in range(len(self.diffs)):
+            if row in odd:
+                entry = odd[row]
+                yield (self.minutes[row], entry.get("grammar"), entry.get("sentence", ""),
+                       entry.get("difficulty"))
+            else:
+                yield (self.minutes[row], names[self.grammar_ids[row]],
+                       sentences[self.sentence_ids[row]], DIFF_CODES[self.diffs[row]])
+
+    def search(self, query, difficulty="All", previous=None):
+        if self._index is None:
+            self._index = SearchIndex.from_history(self, self.entry_by_row)
+        return self._index.search(query, difficulty, previous)
@@ -0,0 +1,159 @@
+"""Export review history or progress as TSV, CSV or JSON Lines.
+
+    python exporter.py history -o history.csv              # every review, oldest first
+    python exporter.py history --level N3 --format jsonl   # to stdout
+    python exporter.py progress -o progress.tsv            # Anki-importable notes
+    python exporter.py progress --level N3 -o N3.csv
+
+History rows are date, grammar, sentence and difficulty; --level keeps the
+reviews of that level's grammar points. Progress rows are one per grammar
+point: its url, level, weight, mastery % and tier. As TSV, progress carries
+Anki's import headers (Basic notes: front = grammar, back = url, one deck
+per level, tier as a tag), so File > Import in Anki takes it as is.
+
+Rows are read from the store as a stream and written `--chunk` at a time,
+so memory stays flat however long the history is. The app may stay open.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from itertools import islice
+
+from storage import LevelCache, open_store, read_settings
+from drill import DEFAULT_WEIGHT, mastery, mastery_tier
+
+CHUNK = 5000
+FORMATS = ("tsv", "csv", "jsonl")
+EXTENSIONS = {".tsv": "tsv", ".txt": "tsv", ".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+HISTORY_FIELDS = ("date", "grammar", "sentence", "difficulty")
+PROGRESS_FIELDS = ("grammar", "url", "level", "weight", "mastery", "tier", "tags")
+DECK = "Grammar Drill"
+
+
+# ─────────────────────────────────────────────────────────────
+# Writers
+# ─────────────────────────────────────────────────────────────
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        block = list(islice(rows, size))
+        if not block:
+            return
+        yield block
+
+
+def write_rows(out, fields, rows, fmt, chunk=CHUNK, header=True):
+    """Write dict rows to the text stream `out`, `chunk` rows per write; returns the count.
+
+    `rows` may be any iterable (a store's stream, or an in-memory history).
+    """
+    count = 0
+    if fmt == "jsonl":
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        for block in _chunks(rows, chunk):
+            out.write("".join(encode({f: row.get(f) for f in fields}) + "\n" for row in block))
+            count += len(block)
+        return count
+    buf = io.StringIO()
+    writer = csv.writer(buf, csv.excel_tab if fmt == "tsv" else csv.excel, lineterminator="\n")
+    if header:
+        writer.writerow(fields)
+    for block in _chunks(rows, chunk):
+        writer.writerows([row.get(f, "") for f in fields] for row in block)
+        out.write(buf.getvalue())
+        buf.seek(0)
+        buf.truncate()
+        count += len(block)
+    out.write(buf.getvalue())
+    return count
+
+
+def anki_header(fields):
+    # Anki 2.1.55+ reads these instead of asking; columns are 1-based.
+    return "".join([
+        "#separator:tab\n",
+        "#html:false\n",
+        "#notetype:Basic\n",
+        f"#deck column:{fields.index('deck') + 1}\n" if "deck" in fields else "",
+        f"#tags column:{fields.index('tags') + 1}\n",
+        "#columns:" + "\t".join(fields) + "\n",
+    ])
+
+
+# ─────────────────────────────────────────────────────────────
+# Rows
+# ─────────────────────────────────────────────────────────────
+
+def history_rows(store, names=None):
+    for entry in store.iter_reviews():
+        if isinstance(entry, dict) and (names is None or entry.get("grammar") in names):
+            yield entry
+
+
+def progress_rows(store, cache, levels):
+    """One row per grammar point, level by level; only one level's weights are held at a time."""
+    for level in levels:
+        weights = store.load_weights(level)
+        for point in cache.points(level):
+            weight = weights.get(point["name"], DEFAULT_WEIGHT)
+            tier = mastery_tier(weight)
+            yield {
+                "grammar": point["name"],
+                "url": point["url"],
+                "level": level,
+                "deck": f"{DECK}::{level}",
+                "weight": round(weight, 2),
+                "mastery": mastery(weight),
+                "tier": tier,
+                "tags": f"grammar_drill {tier.lower()}",
+            }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Grammar Drill history or progress")
+    parser.add_argument("what", choices=("history", "progress"))
+    parser.add_argument("--level", help="only this level (default: all)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the -o extension, else tsv")
+    parser.add_argument("-o", "--output", default="-", help="file to write (default: stdout)")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="rows per write")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or EXTENSIONS.get(os.path.splitext(args.output)[1].lower(), "tsv")
+    cache = LevelCache()
+    levels = cache.scan()
+    if args.level is not None:
+        if args.level not in levels:
+            print(f"Unknown level: {args.level}", file=sys.stderr)
+            return 1
+        levels = [args.level]
+    store = open_store(read_settings().get("storage", "json"))
+    store.migrate_progress(cache)
+
+    if args.what == "history":
+        names = set(cache.index(args.level)) if args.level else None
+        fields, rows, header = HISTORY_FIELDS, history_rows(store, names), None
+    else:
+        fields, rows = PROGRESS_FIELDS, progress_rows(store, cache, levels)
+        header = None
+        if fmt == "tsv":
+            fields = PROGRESS_FIELDS[:3] + ("deck",) + PROGRESS_FIELDS[3:]
+            header = anki_header(fields)
+
+    out = sys.stdout if args.output == "-" else open(args.output, 'w', encoding='utf-8', newline='')
+    try:
+        if header:
+            out.write(header)
+        count = write_rows(out, fields, rows, fmt, max(1, args.chunk), header=header is None)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{count} rows written as {fmt}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
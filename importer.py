@@ -0,0 +1,314 @@
+"""Bulk import of earlier reviews from Anki or CSV exports.
+
+    python importer.py reviews.csv                      # the header row names the columns
+    python importer.py reviews.tsv --columns date,grammar,difficulty,sentence
+    python importer.py collection.anki2 --level N3      # also .anki21, .apkg, .colpkg
+
+Each review is matched to grammar points by name against the data/ levels
+(every level that lists the name, or only --level). The source is read once,
+row by row, and spilled to per-month scratch files in pickled chunks, with
+at most CHUNK rows held at a time. Each month is then merged into the study
+log, skipping reviews it already holds (same date, grammar, sentence and
+rating; each held review matches one source row, so two real reviews in
+one minute both count), and the new ones replay the app's HARD / OK / EASY weight rules,
+oldest first, on top of the current weights.
+
+Close the app (and server.py) first: the import writes user_data/ directly.
+"""
+import argparse
+import csv
+import html
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from operator import itemgetter
+
+from storage import USER_DATA_FOLDER, LevelCache, open_store, read_settings
+from drill import DEFAULT_WEIGHT, apply_rating
+
+CHUNK = 10000
+DATE_FMT = "%Y-%m-%d %H:%M"
+COLUMNS = {
+    "date": ("date", "time", "timestamp", "datetime", "reviewed", "review time"),
+    "grammar": ("grammar", "grammar point", "point", "name", "front"),
+    "sentence": ("sentence", "example", "text"),
+    "difficulty": ("difficulty", "rating", "ease", "answer", "grade", "button"),
+}
+RATINGS = {
+    "hard": "Hard", "again": "Hard", "fail": "Hard", "1": "Hard", "2": "Hard",
+    "normal": "Normal", "ok": "Normal", "good": "Normal", "3": "Normal",
+    "easy": "Easy", "4": "Easy",
+}
+ANKI_EASE = {1: "Hard", 2: "Hard", 3: "Normal", 4: "Easy"}
+ANKI_COLLECTIONS = ("collection.anki21", "collection.anki2")
+TAG = re.compile(r"<[^>]*>")
+
+
+class SourceError(Exception):
+    """A source the importer cannot read; the message is shown as is."""
+
+
+# ─────────────────────────────────────────────────────────────
+# Sources
+# ─────────────────────────────────────────────────────────────
+
+def parse_date(value):
+    """"YYYY-MM-DD HH:MM" from the usual export spellings, or None."""
+    value = value.strip()
+    if len(value) >= 16 and value[4] == "-" and value[7] == "-" and value[10] in " T" \
+            and value[13] == ":" and value[:4].isdigit() and value[5:7].isdigit() \
+            and value[8:10].isdigit() and value[11:13].isdigit() and value[14:16].isdigit():
+        return value[:10] + " " + value[11:16]
+    if len(value) == 10 and value[4] == "-" and value[7] == "-" and value.replace("-", "").isdigit():
+        return value + " 00:00"
+    if value.isdigit():
+        stamp = int(value)
+        try:
+            # Anki and most exporters count milliseconds; Unix tools count seconds.
+            return datetime.fromtimestamp(stamp / 1000 if stamp > 10 ** 11 else stamp).strftime(DATE_FMT)
+        except (OverflowError, OSError, ValueError):
+            return None
+    return None
+
+
+def _find_columns(header):
+    names = [cell.strip().lower().replace("_", " ") for cell in header]
+    found = {}
+    for column, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                found[column] = names.index(alias)
+                break
+    missing = [c for c in ("date", "grammar", "difficulty") if c not in found]
+    if missing:
+        raise SourceError(f"no {', '.join(missing)} column in {header} (name them with --columns)")
+    return found
+
+
+def csv_rows(path, columns=None):
+    """(date, names, sentence, difficulty) per CSV / TSV row."""
+    try:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            if path.lower().endswith((".tsv", ".txt")):
+                dialect = csv.excel_tab
+            else:
+                try:
+                    dialect = csv.Sniffer().sniff(f.read(1 << 16), delimiters=",;\t")
+                except csv.Error:
+                    dialect = csv.excel
+                f.seek(0)
+            reader = csv.reader(f, dialect)
+            found = _find_columns(columns or next(reader, []))
+            d, g, r = found["date"], found["grammar"], found["difficulty"]
+            s = found.get("sentence")
+            for row in reader:
+                try:
+                    yield (parse_date(row[d]), (row[g].strip(),),
+                           row[s].strip() if s is not None else "",
+                           RATINGS.get(row[r].strip().lower()))
+                except IndexError:
+                    yield None, (), "", None
+    except UnicodeDecodeError:
+        # Excel's plain "CSV" is the system code page, not UTF-8.
+        raise SourceError(f"{path} is not UTF-8 text (save it as \"CSV UTF-8\")")
+
+
+def _clean_field(field):
+    return html.unescape(TAG.sub("", field)).strip()
+
+
+def anki_rows(path):
+    """(date, note fields, "", difficulty) per Anki review, oldest first."""
+    import sqlite3  # only paid for when an Anki collection is imported
+    conn = None
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        cursor = conn.execute(
+            "SELECT r.id, r.ease, n.flds FROM revlog r "
+            "JOIN cards c ON c.id = r.cid JOIN notes n ON n.id = c.nid "
+            "WHERE r.ease > 0 ORDER BY r.id")
+        for review_id, ease, fields in cursor:
+            yield (datetime.fromtimestamp(review_id / 1000).strftime(DATE_FMT),
+                   [_clean_field(field) for field in fields.split("\x1f")],
+                   "", ANKI_EASE.get(ease))
+    except sqlite3.DatabaseError as e:
+        if not os.path.isfile(path):
+            raise SourceError(f"{path}: no such file")
+        raise SourceError(f"{path} is not an Anki collection ({e})")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def _unpack_anki(path, scratch):
+    # .apkg / .colpkg are zip files around the collection database.
+    with zipfile.ZipFile(path) as z:
+        names = z.namelist()
+        for member in ANKI_COLLECTIONS:
+            if member in names:
+                return z.extract(member, scratch)
+    raise SourceError(f"{path} has no {' or '.join(ANKI_COLLECTIONS)} "
+                       "(export again with \"Support older Anki versions\")")
+
+
+def open_source(path, columns, scratch):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".apkg", ".colpkg"):
+        return anki_rows(_unpack_anki(path, scratch))
+    if ext in (".anki2", ".anki21"):
+        return anki_rows(path)
+    return csv_rows(path, columns)
+
+
+# ─────────────────────────────────────────────────────────────
+# Import
+# ─────────────────────────────────────────────────────────────
+
+class Importer:
+    """Spill matched rows by month, then merge each month and replay its ratings."""
+
+    def __init__(self, store, lookup, scratch):
+        self.store = store
+        self.lookup = lookup
+        self.scratch = scratch
+        self.counts = {"read": 0, "imported": 0, "duplicates": 0, "unmatched": 0, "invalid": 0}
+        self.weights = {}
+        self.changed = {}
+
+    def _month_path(self, month):
+        return os.path.join(self.scratch, month + ".chunks")
+
+    def _spill(self, month, rows):
+        # Private scratch files, so pickle is safe here and far cheaper than JSON.
+        with open(self._month_path(month), 'ab') as f:
+            pickle.dump(rows, f, pickle.HIGHEST_PROTOCOL)
+        rows.clear()
+
+    def spill(self, rows):
+        """One pass over the source; returns the months seen, oldest first.
+
+        At most CHUNK rows are buffered, across all months, before they go to disk.
+        """
+        buffers = {}
+        buffered = 0
+        counts, lookup = self.counts, self.lookup
+        for when, names, sentence, difficulty in rows:
+            counts["read"] += 1
+            if when is None or difficulty is None:
+                counts["invalid"] += 1
+                continue
+            name = next((n for n in names if n in lookup), None)
+            if name is None:
+                counts["unmatched"] += 1
+                continue
+            chunk = buffers.get(when[:7])
+            if chunk is None:
+                chunk = buffers[when[:7]] = []
+            chunk.append((when, name, sentence, difficulty))
+            buffered += 1
+            if buffered >= CHUNK:
+                self._spill_all(buffers)
+                buffered = 0
+        self._spill_all(buffers)
+        return sorted(buffers)
+
+    def _spill_all(self, buffers):
+        for month, chunk in buffers.items():
+            if chunk:
+                self._spill(month, chunk)
+
+    def merge(self, month, later=False):
+        """Merge one spilled month; `later` tells the store more months follow."""
+        rows = []
+        with open(self._month_path(month), 'rb') as f:
+            while True:
+                try:
+                    rows.extend(pickle.load(f))
+                except EOFError:
+                    break
+        rows.sort(key=itemgetter(0))
+        entries = [{"date": when, "grammar": name, "sentence": sentence, "difficulty": difficulty}
+                   for when, name, sentence, difficulty in rows]
+        added = self.store.merge_reviews(month, entries, later)
+        self.counts["imported"] += len(added)
+        self.counts["duplicates"] += len(entries) - len(added)
+        for entry in added:
+            self._replay(entry["grammar"], entry["difficulty"])
+        os.remove(self._month_path(month))
+
+    def _replay(self, name, difficulty):
+        for level in self.lookup[name]:
+            weights = self.weights.get(level)
+            if weights is None:
+                weights = self.weights[level] = self.store.load_weights(level)
+                self.changed[level] = set()
+            weights[name] = apply_rating(weights.get(name, DEFAULT_WEIGHT), difficulty)
+            self.changed[level].add(name)
+
+    def save_weights(self):
+        changed = {level: {name: self.weights[level][name] for name in names}
+                   for level, names in self.changed.items() if names}
+        points = sum(len(shard) for shard in changed.values())
+        if changed:
+            self.store.write({"weights": changed, "reviews": [], "stats": None})
+        return points
+
+
+def build_lookup(cache, level=None):
+    """{grammar name: [levels listing it]}."""
+    lookup = {}
+    for lvl in cache.scan():
+        if level is None or lvl == level:
+            for name in cache.index(lvl):
+                lookup.setdefault(name, []).append(lvl)
+    return lookup
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import Anki or CSV review history into Grammar Drill")
+    parser.add_argument("source", help="CSV/TSV file, Anki collection (.anki2/.anki21) or package (.apkg/.colpkg)")
+    parser.add_argument("--level", help="only match grammar points of this level")
+    parser.add_argument("--columns", help="comma-separated column names for a CSV without a header row")
+    args = parser.parse_args(argv)
+
+    os.makedirs(USER_DATA_FOLDER, exist_ok=True)
+    cache = LevelCache()
+    lookup = build_lookup(cache, args.level)
+    if not lookup:
+        print(f"No grammar points to match ({'unknown level' if args.level else 'no levels in data/'}).")
+        return 1
+    store = open_store(read_settings().get("storage", "json"))
+    store.migrate_progress(cache)
+
+    t0 = time.perf_counter()
+    scratch = tempfile.mkdtemp(prefix="drill-import-")
+    try:
+        columns = args.columns.split(",") if args.columns else None
+        importer = Importer(store, lookup, scratch)
+        months = importer.spill(open_source(args.source, columns, scratch))
+        for month in months:
+            importer.merge(month, later=month != months[-1])
+        points = importer.save_weights()
+        if importer.counts["imported"]:
+            store.finish_import()
+    except (SourceError, OSError, csv.Error, zipfile.BadZipFile) as e:
+        print(f"Import failed: {e}")
+        return 1
+    finally:
+        store.close_writer()
+        shutil.rmtree(scratch, ignore_errors=True)
+    c = importer.counts
+    print(f"{c['read']} rows in {time.perf_counter() - t0:.1f}s: {c['imported']} imported, "
+          f"{c['duplicates']} already there, {c['unmatched']} unmatched, {c['invalid']} unreadable; "
+          f"weights updated for {points} grammar points.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
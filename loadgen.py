@@ -0,0 +1,153 @@
+"""Load generator for the drill service.
+
+    python loadgen.py                              # 200 learners against an in-process service
+    python loadgen.py --users 500 --rounds 50 --points 3
+    python loadgen.py --url http://127.0.0.1:8765 --level N3
+
+Without --url it builds a synthetic data/ tree in a scratch directory,
+starts server.py on a free port and checks afterwards that every rated
+review reached its learner's journal. Each simulated learner runs on its
+own thread: deal once, then rate-and-deal for --rounds rounds, then read
+their stats. Prints throughput and latency percentiles per endpoint.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from bench import write_level
+from storage import JsonStore
+
+DIFFS = ["Easy", "Normal", "Normal", "Hard"]
+
+
+class Client:
+    """One learner's session, recording (endpoint, seconds, ok) per request."""
+
+    def __init__(self, base, user, results):
+        self.base = base.rstrip("/")
+        self.user = user
+        self.results = results
+
+    def call(self, endpoint, body=None, query=""):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.base + endpoint + query, data=data,
+                                         headers={"Content-Type": "application/json"})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                payload = json.loads(response.read().decode('utf-8'))
+            ok = True
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            payload, ok = {"error": str(e)}, False
+        self.results.append((endpoint, time.perf_counter() - t0, ok))
+        return payload if ok else None
+
+    def drill(self, level, rounds, points, rng):
+        reply = self.call("/deal", {"user": self.user, "level": level, "points": points})
+        rated = 0
+        for i in range(rounds):
+            if reply is None:
+                break
+            ratings = {card["name"]: rng.choice(DIFFS) for card in reply["cards"]}
+            reply = self.call("/rate", {"user": self.user, "sentence": f"{self.user} の文 {i}",
+                                        "ratings": ratings, "points": points})
+            if reply is not None:
+                rated += len(ratings)
+        self.call("/stats", query=f"?user={self.user}")
+        return rated
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100))]
+
+
+def report(results, elapsed):
+    print(f"{len(results)} requests in {elapsed:.2f}s  ({len(results) / elapsed:.0f} req/s)")
+    print(f"  {'endpoint':<8} {'count':>7} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for endpoint in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == endpoint]
+        times = sorted(t * 1000 for _, t, _ in rows)
+        errors = sum(1 for *_, ok in rows if not ok)
+        print(f"  {endpoint:<8} {len(rows):>7} {errors:>6} {percentile(times, 50):>8.1f} "
+              f"{percentile(times, 95):>8.1f} {percentile(times, 99):>8.1f} {times[-1]:>8.1f}")
+    return sum(1 for *_, ok in results if not ok)
+
+
+def run(base, args):
+    level = args.level
+    if level is None:
+        levels = Client(base, None, []).call("/levels")
+        if not levels or not levels["levels"]:
+            print("The service has no levels.")
+            return None
+        level = levels["levels"][0]["name"]
+    results, rated = [], {}
+
+    def learner(i):
+        user = f"learner{i:04d}"
+        rated[user] = Client(base, user, results).drill(level, args.rounds, args.points,
+                                                        random.Random(args.seed + i))
+
+    threads = [threading.Thread(target=learner, args=(i,)) for i in range(args.users)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    errors = report(results, time.perf_counter() - t0)
+    return errors, rated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grammar Drill service load generator")
+    parser.add_argument("--url", help="target a running service instead of starting one")
+    parser.add_argument("--level", help="level to drill (default: the first one)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=20, help="rated rounds per learner")
+    parser.add_argument("--points", type=int, default=2, help="grammar points per round")
+    parser.add_argument("--level-size", type=int, default=1000, help="points in the synthetic level")
+    parser.add_argument("--flush", type=float, default=1.0, help="save interval of the in-process service")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if args.url:
+        outcome = run(args.url, args)
+        return 1 if outcome is None or outcome[0] else 0
+
+    import server  # only needed when the service runs in this process
+    scratch = tempfile.mkdtemp(prefix="drill-loadgen-")
+    try:
+        data, user_data = os.path.join(scratch, "data"), os.path.join(scratch, "user_data")
+        os.makedirs(data)
+        write_level(os.path.join(data, "N3.txt"), args.level_size)
+        service = server.DrillService(data, user_data)
+        httpd, flusher = server.start(service, flush=args.flush)
+        host, port = httpd.server_address[:2]
+        print(f"service on http://{host}:{port}/  {args.users} learners x {args.rounds} rounds")
+        try:
+            errors, rated = run(f"http://{host}:{port}", args)
+        finally:
+            server.stop(httpd, flusher)
+        # Everything rated must be in the journals once the service has shut down.
+        missing = 0
+        for user, count in rated.items():
+            store = JsonStore(folder=os.path.join(user_data, "users", user))
+            missing += abs(count - len(store.load_history()))
+        print(f"saved: {sum(rated.values()) - missing}/{sum(rated.values())} reviews")
+        return 1 if errors or missing else 0
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
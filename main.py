@@ -1,14 +1,169 @@
+import sys
+import time
+
+T0 = time.perf_counter()
+
+if __name__ == "__main__" and "--tui" in sys.argv[1:]:
+    # Terminal mode must start without tkinter (headless boxes, SSH).
+    from tui import main as tui_main
+    sys.exit(tui_main(sys.argv[1:]))
+
 import tkinter as tk
-from tkinter import messagebox, scrolledtext
+from tkinter import messagebox, font as tkfont
 import json
-import random
 import os
-import glob
 import webbrowser
+import queue
+import threading
+import traceback
+import functools
 from datetime import datetime, timedelta
-from collections import Counter, defaultdict
+from collections import Counter, deque
 import math
 
+from storage import (DATA_FOLDER, USER_DATA_FOLDER, SETTINGS_FILE, LEVEL_CACHE_FILE, PROFILE_FOLDER,
+                     HistoryLoader, LogTail, SaveWorker, LevelCache, open_store)
+from drill import DEFAULT_WEIGHT, TIERS, DrillSession, StatsIndex, make_entry, mastery, mastery_tier
+
+# ─────────────────────────────────────────────────────────────
+# Startup Timing
+# ─────────────────────────────────────────────────────────────
+
+class StartupTimer:
+    """`python main.py --timing`: startup milestones printed to stderr."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.last = T0
+        self.seen = set()
+
+    def mark(self, label, once=False):
+        if not self.enabled or (once and label in self.seen):
+            return
+        self.seen.add(label)
+        now = time.perf_counter()
+        print(f"[timing] {label:<16} +{(now - self.last) * 1000:8.1f} ms"
+              f"  {(now - T0) * 1000:9.1f} ms", file=sys.stderr)
+        self.last = now
+
+
+TIMER = StartupTimer("--timing" in sys.argv[1:])
+
+
+# ─────────────────────────────────────────────────────────────
+# Hot-path Profiling
+# ─────────────────────────────────────────────────────────────
+
+class Profiler:
+    """`python main.py --profile`: rolling timings of the UI's hot paths.
+
+    `timed` wraps a method to record its wall time per call; without
+    --profile it hands the method back untouched, so a normal run pays
+    nothing. The last SAMPLES calls of each are kept for percentiles.
+    `arm(label)` runs the next call of that action under cProfile and
+    dumps the stats to user_data/profiles/.
+    """
+
+    SAMPLES = 500
+
+    def __init__(self, enabled, folder=PROFILE_FOLDER):
+        self.enabled = enabled
+        self.folder = folder
+        self.samples = {}
+        self.counts = Counter()
+        self.latest = None
+        self.armed = None
+        self.dumps = []
+
+    def timed(self, fn):
+        if not self.enabled:
+            return fn
+        label = fn.__qualname__
+        self.samples[label] = deque(maxlen=self.SAMPLES)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kw):
+            if self.armed == label:
+                return self._profile(label, fn, args, kw)
+            t = time.perf_counter()
+            try:
+                return fn(*args, **kw)
+            finally:
+                self.record(label, time.perf_counter() - t)
+        return wrapper
+
+    def record(self, label, seconds):
+        ms = seconds * 1000
+        self.samples[label].append(ms)
+        self.counts[label] += 1
+        self.latest = (label, ms)
+
+    def arm(self, label):
+        self.armed = label
+
+    def _profile(self, label, fn, args, kw):
+        import cProfile  # only paid for when a dump is asked for
+        self.armed = None
+        profile = cProfile.Profile()
+        t = time.perf_counter()
+        try:
+            return profile.runcall(fn, *args, **kw)
+        finally:
+            self.record(label, time.perf_counter() - t)
+            os.makedirs(self.folder, exist_ok=True)
+            path = os.path.join(self.folder, f"{label}-{datetime.now():%Y%m%d-%H%M%S}.prof")
+            profile.dump_stats(path)
+            self.dumps.append(path)
+            print(f"[profile] {label} -> {path}", file=sys.stderr)
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self):
+        """(label, calls, last, p50, p95, p99, max) per action that has run; times in ms."""
+        rows = []
+        for label, samples in list(self.samples.items()):
+            # record() may be appending from the Stats worker; read one copy of each.
+            snap = list(samples)
+            if snap:
+                ordered = sorted(snap)
+                rows.append((label, self.counts[label], snap[-1], self._percentile(ordered, 50),
+                             self._percentile(ordered, 95), self._percentile(ordered, 99), ordered[-1]))
+        return rows
+
+    def format_summary(self):
+        lines = [f"{'action':<30} {'calls':>6} {'last':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+        for label, calls, *times in self.summary():
+            lines.append(f"{label:<30} {calls:>6} " + " ".join(f"{t:>8.1f}" for t in times))
+        return "\n".join(lines)
+
+    def report(self, extra=None):
+        """Write timings, raw samples and environment to a JSON file for a bug report; returns its path."""
+        import platform
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"timings-{datetime.now():%Y%m%d-%H%M%S}.json")
+        keys = ("calls", "last_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+        data = {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "tk": tk.TkVersion,
+            "uptime_s": round(time.perf_counter() - T0, 1),
+            "app": extra or {},
+            "summary": {label: dict(zip(keys, [calls] + [round(t, 2) for t in times]))
+                        for label, calls, *times in self.summary()},
+            "samples_ms": {label: [round(t, 2) for t in list(samples)]
+                           for label, samples in self.samples.items() if samples},
+            "profiles": self.dumps,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+        return path
+
+
+PROFILER = Profiler("--profile" in sys.argv[1:])
+
 # ─────────────────────────────────────────────────────────────
 # Themes
 # ─────────────────────────────────────────────────────────────
@@ -150,12 +305,6 @@ F = {
     "mono":       ("Consolas", 9),
 }
 
-DATA_FOLDER      = "data"
-USER_DATA_FOLDER = "user_data"
-PROGRESS_FILE    = os.path.join(USER_DATA_FOLDER, "progress.json")
-LOG_FILE         = os.path.join(USER_DATA_FOLDER, "study_log.json")
-SETTINGS_FILE    = os.path.join(USER_DATA_FOLDER, "settings.json")
-DEFAULT_WEIGHT   = 100
 
 def _lighten(hex_color, amount):
     try:
@@ -177,180 +326,613 @@ def _blend(hex1, hex2, ratio=0.5):
         return hex1
 
 
+# ─────────────────────────────────────────────────────────────
+# Theme Registry
+# ─────────────────────────────────────────────────────────────
+
+COLOR_OPTIONS = frozenset(("bg", "fg", "background", "foreground", "insertbackground",
+                           "selectcolor", "activebackground", "activeforeground",
+                           "highlightbackground", "highlightcolor", "troughcolor",
+                           "fill", "outline"))
+
+
+def _resolve_roles(kw):
+    """Swap C role names in `kw` for colors in place; returns {option: role}."""
+    roles = {}
+    for opt, value in kw.items():
+        if opt in COLOR_OPTIONS and isinstance(value, str) and value in C:
+            roles[opt] = value
+    for opt, role in roles.items():
+        kw[opt] = C[role]
+    return roles
+
+
+def _merge_roles(known, kw, roles):
+    # An option set to a plain color stops following the theme.
+    for opt in kw:
+        if opt in COLOR_OPTIONS and opt not in roles:
+            known.pop(opt, None)
+    known.update(roles)
+
+
+class StyleRegistry:
+    """Remembers which C[...] role each live widget uses.
+
+    `recolor()` re-applies every role from the current C in one pass, so a
+    theme switch costs one configure per widget instead of a rebuild.
+    Widgets with a `recolor()` of their own (charts, buttons, canvases with
+    items) are asked to recolor themselves after their options are set.
+    """
+
+    def __init__(self):
+        self.widgets = {}
+        self._prune_at = 512
+
+    def record(self, widget, kw, roles):
+        known = self.widgets.get(widget)
+        if known is None:
+            self.widgets[widget] = dict(roles)
+            if len(self.widgets) > self._prune_at:
+                self.prune()
+        else:
+            _merge_roles(known, kw, roles)
+
+    def prune(self):
+        # Rounds create and destroy cards; drop the dead ones now and then.
+        for widget in [w for w in self.widgets if not w.winfo_exists()]:
+            del self.widgets[widget]
+        self._prune_at = max(512, 2 * len(self.widgets))
+
+    def recolor(self):
+        dead = []
+        for widget, roles in self.widgets.items():
+            try:
+                if roles:
+                    tk.Misc.configure(widget, **{opt: C[role] for opt, role in roles.items()})
+                recolor = getattr(widget, "recolor", None)
+                if recolor is not None:
+                    recolor()
+            except tk.TclError:
+                dead.append(widget)
+        for widget in dead:
+            del self.widgets[widget]
+
+
+STYLES = StyleRegistry()
+
+
+def themed(widget, **roles):
+    """Give a widget we did not create (root, an OptionMenu's menu) theme roles."""
+    kw = dict(roles)
+    roles = _resolve_roles(kw)
+    tk.Misc.configure(widget, **kw)
+    STYLES.record(widget, kw, roles)
+    return widget
+
+
+class Themed:
+    """Mixin: color options may name a C role ("surface", "accent").
+
+    Roles are resolved against the current theme and recorded in STYLES, on
+    creation and on every later `config`, so the widget follows theme
+    switches. Plain hex colors are passed through untouched.
+    """
+
+    def __init__(self, master=None, *args, **kw):
+        roles = _resolve_roles(kw)
+        super().__init__(master, *args, **kw)
+        STYLES.record(self, kw, roles)
+
+    def configure(self, cnf=None, **kw):
+        roles = _resolve_roles(kw)
+        if kw:
+            STYLES.record(self, kw, roles)
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+
+class Frame(Themed, tk.Frame):
+    pass
+
+
+class Label(Themed, tk.Label):
+    pass
+
+
+class Text(Themed, tk.Text):
+    pass
+
+
+class Entry(Themed, tk.Entry):
+    pass
+
+
+class Radiobutton(Themed, tk.Radiobutton):
+    pass
+
+
+class Scrollbar(Themed, tk.Scrollbar):
+    pass
+
+
+class Toplevel(Themed, tk.Toplevel):
+    pass
+
+
+class OptionMenu(Themed, tk.OptionMenu):
+    pass
+
+
+class Canvas(Themed, tk.Canvas):
+    """Themed canvas whose items may also use role names for fill/outline."""
+
+    def __init__(self, master=None, **kw):
+        self.item_roles = {}
+        super().__init__(master, **kw)
+
+    def _create_item(self, create, args, kw):
+        roles = _resolve_roles(kw)
+        item = create(self, *args, **kw)
+        if roles:
+            self.item_roles[item] = roles
+        return item
+
+    def create_text(self, *args, **kw):
+        return self._create_item(tk.Canvas.create_text, args, kw)
+
+    def create_rectangle(self, *args, **kw):
+        return self._create_item(tk.Canvas.create_rectangle, args, kw)
+
+    def create_oval(self, *args, **kw):
+        return self._create_item(tk.Canvas.create_oval, args, kw)
+
+    def itemconfigure(self, tagOrId, cnf=None, **kw):
+        roles = _resolve_roles(kw)
+        if roles or tagOrId in self.item_roles:
+            _merge_roles(self.item_roles.setdefault(tagOrId, {}), kw, roles)
+        return super().itemconfigure(tagOrId, cnf, **kw)
+
+    itemconfig = itemconfigure
+
+    def delete(self, *args):
+        if "all" in args:
+            self.item_roles.clear()
+        else:
+            for item in args:
+                self.item_roles.pop(item, None)
+        super().delete(*args)
+
+    def recolor(self):
+        for item, roles in self.item_roles.items():
+            if roles:
+                tk.Canvas.itemconfigure(self, item, **{opt: C[role] for opt, role in roles.items()})
+
+
 # ─────────────────────────────────────────────────────────────
 # Custom Widgets
 # ─────────────────────────────────────────────────────────────
 
-class FlatButton(tk.Canvas):
+class FlatButton(Themed, tk.Canvas):
+    """Pill button; colors are C roles (or hex) looked up at draw time.
+
+    The shape and label items are created once. Hover, focus, disabled and
+    text changes are itemconfig calls; only a resize moves the items.
+    """
+
     def __init__(self, master, text, command, fg=None, bg=None,
                  hover_bg=None, btn_width=140, btn_height=36, font=None, **kw):
-        fg = fg or C["text"]
-        bg = bg or C["surface2"]
+        fg = fg or "text"
+        bg = bg or "surface2"
         font = font or F["ui_bold"]
         super().__init__(master, width=btn_width, height=btn_height,
-                         bg=master["bg"], highlightthickness=0, **kw)
+                         bg=master["bg"], highlightthickness=0, takefocus=1, **kw)
         self.command = command
         self.fg = fg
         self.bg_color = bg
-        self.hover_bg = hover_bg or _lighten(bg, 15)
-        self._text = text
-        self._font = font
+        self.hover_bg = hover_bg
         self.btn_w = btn_width
         self.btn_h = btn_height
         self._disabled = False
-        self._draw(bg)
-        self.bind("<Enter>", lambda e: self._on_hover(True))
-        self.bind("<Leave>", lambda e: self._on_hover(False))
+        self._hover = False
+        self._focus = False
+        self._left = self.create_oval(0, 0, 0, 0, outline="", tags="body")
+        self._right = self.create_oval(0, 0, 0, 0, outline="", tags="body")
+        self._mid = self.create_rectangle(0, 0, 0, 0, outline="", tags="body")
+        self._label = self.create_text(0, 0, text=text, font=font)
+        self._layout(btn_width, btn_height)
+        self._restyle()
+        self.bind("<Enter>", lambda e: self._set_hover(True))
+        self.bind("<Leave>", lambda e: self._set_hover(False))
+        self.bind("<FocusIn>", lambda e: self._set_focus(True))
+        self.bind("<FocusOut>", lambda e: self._set_focus(False))
         self.bind("<Button-1>", lambda e: self._click())
+        self.bind("<Return>", lambda e: self._click())
+        self.bind("<space>", lambda e: self._click())
+        self.bind("<Configure>", self._on_resize)
+
+    def _color(self, color):
+        if color is None:
+            return _lighten(self._color(self.bg_color), 15)
+        return C.get(color, color)
+
+    def _layout(self, w, h):
+        self.btn_w, self.btn_h = w, h
+        r = h // 2
+        self.coords(self._left, 0, 0, r*2, r*2)
+        self.coords(self._right, w - r*2, 0, w, r*2)
+        self.coords(self._mid, r, 0, w - r, h)
+        self.coords(self._label, w // 2, h // 2)
+
+    def _on_resize(self, event):
+        if (event.width, event.height) != (self.btn_w, self.btn_h):
+            self._layout(event.width, event.height)
+
+    def _restyle(self):
+        if self._disabled:
+            fill, text = "bg", "text_faint"
+        elif self._hover or self._focus:
+            fill, text = self.hover_bg, self.fg
+        else:
+            fill, text = self.bg_color, self.fg
+        self.itemconfig("body", fill=self._color(fill))
+        self.itemconfig(self._label, fill=self._color(text))
 
-    def _draw(self, fill):
-        self.delete("all")
-        r = self.btn_h // 2
-        self.create_oval(0, 0, r*2, r*2, fill=fill, outline="")
-        self.create_oval(self.btn_w - r*2, 0, self.btn_w, r*2, fill=fill, outline="")
-        self.create_rectangle(r, 0, self.btn_w - r, self.btn_h, fill=fill, outline="")
-        self.create_text(self.btn_w // 2, self.btn_h // 2, text=self._text,
-                         fill=self.fg if not self._disabled else C["text_faint"],
-                         font=self._font)
-
-    def _on_hover(self, entering):
+    def _set_hover(self, entering):
+        self._hover = entering
         if self._disabled:
             return
-        self._draw(self.hover_bg if entering else self.bg_color)
+        self._restyle()
         self.config(cursor="hand2" if entering else "")
 
+    def _set_focus(self, focused):
+        self._focus = focused
+        if not self._disabled:
+            self._restyle()
+
     def _click(self):
         if not self._disabled:
             self.command()
 
     def set_disabled(self, val):
+        if val == self._disabled:
+            return
         self._disabled = val
-        self._draw(C["bg"] if val else self.bg_color)
+        if val:
+            self.config(cursor="")
+        self._restyle()
 
     def update_text(self, text):
-        self._text = text
-        self._draw(self.bg_color)
+        self.itemconfig(self._label, text=text)
+
+    def recolor(self):
+        tk.Canvas.configure(self, bg=self.master["bg"])
+        self._restyle()
+
+
+MONTH_ABBR = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+              "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+_RAMPS = {}
 
+def heat_ramp(theme=None):
+    """Five heatmap shades from border to accent, computed once per theme."""
+    theme = theme or C
+    key = (theme["border"], theme["accent"])
+    ramp = _RAMPS.get(key)
+    if ramp is None:
+        border, accent = key
+        ramp = _RAMPS[key] = (border, _blend(border, accent, 0.3), _blend(border, accent, 0.55),
+                              _blend(border, accent, 0.8), accent)
+    return ramp
+
+
+class BarChart(Themed, tk.Canvas):
+    """Horizontal bars whose canvas items are kept and re-pointed on `set_data`.
+
+    Bar colors may be theme keys ("red", "accent") or plain hex; keys are
+    looked up again by `recolor`.
+    """
 
-class BarChart(tk.Canvas):
     def __init__(self, master, data, width=300, bar_height=18, spacing=4,
                  label_width=100, **kw):
-        if not data:
-            data = [("No data", 0, C["text_faint"])]
-        max_val = max((d[1] for d in data), default=1)
-        max_val = max(max_val, 1)
-        total_h = len(data) * (bar_height + spacing) + 10
-        super().__init__(master, width=width, height=total_h,
+        super().__init__(master, width=width, height=10,
                          bg=master["bg"], highlightthickness=0, **kw)
-        chart_w = width - label_width - 50
-        for i, (label, val, color) in enumerate(data):
-            y = i * (bar_height + spacing) + 5
+        self.bar_height = bar_height
+        self.pitch = bar_height + spacing
+        self.label_width = label_width
+        self.chart_w = width - label_width - 50
+        self.rows = []
+        self.data = []
+        self.set_data(data)
+
+    def _add_row(self):
+        i = len(self.rows)
+        y = i * self.pitch + 5
+        mid = y + self.bar_height // 2
+        lw, cw = self.label_width, self.chart_w
+        self.rows.append((
+            self.create_text(lw - 4, mid, anchor="e", fill=C["text_dim"], font=F["ui_tiny"]),
+            self.create_rectangle(lw, y, lw + cw, y + self.bar_height, fill=C["border"], outline=""),
+            self.create_rectangle(lw, y, lw, y + self.bar_height, outline="", state="hidden"),
+            self.create_text(lw + cw + 6, mid, anchor="w", fill=C["text_dim"], font=F["ui_tiny"]),
+        ))
+
+    def set_data(self, data, theme=None):
+        theme = theme or C
+        if not data:
+            data = [("No data", 0, "text_faint")]
+        while len(self.rows) < len(data):
+            self._add_row()
+        for items in self.rows[len(data):]:
+            self.delete(*items)
+        del self.rows[len(data):]
+        self.config(height=len(data) * self.pitch + 10)
+        max_val = max(max(d[1] for d in data), 1)
+        lw = self.label_width
+        for (label, val, color), (text, _, bar, value) in zip(data, self.rows):
             display_label = label if len(label) <= 18 else label[:16] + "..."
-            self.create_text(label_width - 4, y + bar_height // 2, text=display_label,
-                             anchor="e", fill=C["text_dim"], font=F["ui_tiny"])
-            self.create_rectangle(label_width, y, label_width + chart_w,
-                                  y + bar_height, fill=C["border"], outline="")
+            self.itemconfig(text, text=display_label)
+            self.itemconfig(value, text=str(val))
             if val > 0:
-                bw = max(2, int(chart_w * val / max_val))
-                self.create_rectangle(label_width, y, label_width + bw,
-                                      y + bar_height, fill=color, outline="")
-            self.create_text(label_width + chart_w + 6, y + bar_height // 2,
-                             text=str(val), anchor="w", fill=C["text_dim"], font=F["ui_tiny"])
+                _, y0, _, y1 = self.coords(bar)
+                self.coords(bar, lw, y0, lw + max(2, int(self.chart_w * val / max_val)), y1)
+                self.itemconfig(bar, fill=theme.get(color, color), state="normal")
+            else:
+                self.itemconfig(bar, state="hidden")
+        self.data = list(data)
 
+    def recolor(self, theme=None):
+        theme = theme or C
+        self.config(bg=self.master["bg"])
+        for (label, val, color), (text, track, bar, value) in zip(self.data, self.rows):
+            self.itemconfig(text, fill=theme["text_dim"])
+            self.itemconfig(value, fill=theme["text_dim"])
+            self.itemconfig(track, fill=theme["border"])
+            self.itemconfig(bar, fill=theme.get(color, color))
 
-class HeatmapStrip(tk.Canvas):
-    def __init__(self, master, day_counts, num_days=90, cell=10, gap=2, **kw):
+
+class HeatmapStrip(Themed, tk.Canvas):
+    """Day-per-cell activity grid ending today.
+
+    Cells are laid out once; `set_data` only re-shades them. Counts are looked
+    up by day offset, so a multi-year range costs no per-cell date formatting.
+    """
+
+    def __init__(self, master, day_counts, num_days=90, cell=10, gap=2, legend=False, **kw):
         cols = math.ceil(num_days / 7)
         w = cols * (cell + gap) + 60
-        h = 7 * (cell + gap) + 30
+        h = 7 * (cell + gap) + 30 + (cell + 8 if legend else 0)
         super().__init__(master, width=w, height=h,
                          bg=master["bg"], highlightthickness=0, **kw)
-        max_count = max(day_counts.values()) if day_counts else 1
-        max_count = max(max_count, 1)
-        today = datetime.now().date()
-        day_names = ["M", "", "W", "", "F", "", "S"]
-        for r, name in enumerate(day_names):
-            y = r * (cell + gap) + 20
-            self.create_text(8, y + cell // 2, text=name, anchor="w",
-                             fill=C["text_faint"], font=F["ui_tiny"])
+        self.num_days = num_days
+        self.cell = cell
+        self.gap = gap
+        self.legend = legend
+        self.today = None
+        self.cells = []
+        self.levels = []
+        self.labels = []
+        self.swatches = []
+        self.set_data(day_counts)
+
+    def _layout(self, today):
+        self.delete("all")
+        self.today = today
+        step = self.cell + self.gap
+        self.labels = []
+        for r, name in enumerate(["M", "", "W", "", "F", "", "S"]):
+            self.labels.append(self.create_text(8, r * step + 20 + self.cell // 2, text=name,
+                                                anchor="w", fill=C["text_faint"], font=F["ui_tiny"]))
+        start = today - timedelta(days=self.num_days - 1)
+        first_row = start.weekday()
         last_month = None
-        for d in range(num_days - 1, -1, -1):
-            date = today - timedelta(days=d)
-            col = (num_days - 1 - d) // 7
-            row = date.weekday()
-            x = col * (cell + gap) + 24
-            y = row * (cell + gap) + 20
-            count = day_counts.get(date.strftime("%Y-%m-%d"), 0)
+        self.cells = []
+        for d in range(self.num_days):
+            col, row = d // 7, (first_row + d) % 7
+            x = col * step + 24
+            y = row * step + 20
+            self.cells.append(self.create_rectangle(x, y, x + self.cell, y + self.cell, outline=""))
+            if row == 0:
+                month = (start + timedelta(days=d)).month
+                if month != last_month:
+                    self.labels.append(self.create_text(x, 8, text=MONTH_ABBR[month - 1], anchor="w",
+                                                        fill=C["text_faint"], font=F["ui_tiny"]))
+                    last_month = month
+        self.levels = [None] * self.num_days
+        self.swatches = []
+        if self.legend:
+            y = 7 * step + 28
+            ramp = heat_ramp()
+            self.labels.append(self.create_text(24, y + self.cell // 2, text="Less", anchor="w",
+                                                fill=C["text_faint"], font=F["ui_tiny"]))
+            for i, color in enumerate(ramp):
+                x = 56 + i * step
+                self.swatches.append(self.create_rectangle(x, y, x + self.cell, y + self.cell,
+                                                           fill=color, outline=""))
+            self.labels.append(self.create_text(60 + len(ramp) * step, y + self.cell // 2, text="More",
+                                                anchor="w", fill=C["text_faint"], font=F["ui_tiny"]))
+
+    def set_data(self, day_counts, today=None):
+        today = today or datetime.now().date()
+        if today != self.today:
+            self._layout(today)
+        start = today - timedelta(days=self.num_days - 1)
+        first_key = start.strftime("%Y-%m-%d")
+        base = start.toordinal()
+        counts = [0] * self.num_days
+        # Only days with activity are parsed; keys compare as ISO dates.
+        for key, count in day_counts.items():
+            if key >= first_key:
+                try:
+                    d = datetime(int(key[:4]), int(key[5:7]), int(key[8:10])).toordinal() - base
+                except ValueError:
+                    continue
+                if 0 <= d < self.num_days:
+                    counts[d] = count
+        max_count = max(max(counts), 1)
+        levels = []
+        for count in counts:
             if count == 0:
-                color = C["border"]
+                levels.append(0)
             else:
-                intensity = min(count / max_count, 1.0)
-                if intensity < 0.25:
-                    color = _blend(C["border"], C["accent"], 0.3)
-                elif intensity < 0.5:
-                    color = _blend(C["border"], C["accent"], 0.55)
-                elif intensity < 0.75:
-                    color = _blend(C["border"], C["accent"], 0.8)
-                else:
-                    color = C["accent"]
-            self.create_rectangle(x, y, x + cell, y + cell, fill=color, outline="")
-            month_str = date.strftime("%b")
-            if month_str != last_month and row == 0:
-                self.create_text(x, 8, text=month_str, anchor="w",
-                                 fill=C["text_faint"], font=F["ui_tiny"])
-                last_month = month_str
-
-
-class GrammarCard(tk.Frame):
+                levels.append(min(int(4 * count / max_count), 3) + 1)
+        ramp = heat_ramp()
+        for item, level, old in zip(self.cells, levels, self.levels):
+            if level != old:
+                self.itemconfig(item, fill=ramp[level])
+        self.levels = levels
+
+    def recolor(self, theme=None):
+        theme = theme or C
+        ramp = heat_ramp(theme)
+        self.config(bg=self.master["bg"])
+        for item in self.labels:
+            self.itemconfig(item, fill=theme["text_faint"])
+        for item, level in zip(self.cells, self.levels):
+            self.itemconfig(item, fill=ramp[level])
+        for item, color in zip(self.swatches, ramp):
+            self.itemconfig(item, fill=color)
+
+
+class VirtualList(Frame):
+    """Fixed-height rows over a canvas; only rows in view are materialised.
+
+    Row items are created once per visible slot by `make_row(canvas)` and
+    re-pointed at data by `fill_row(canvas, row, index, y, width)` while
+    scrolling, so a redraw costs the same for 50 or 500,000 rows.
+    """
+
+    def __init__(self, master, row_height, make_row, fill_row, bg, buffer=2, **kw):
+        super().__init__(master, bg=bg, **kw)
+        self.row_h = row_height
+        self.make_row = make_row
+        self.fill_row = fill_row
+        self.buffer = buffer
+        self.count = 0
+        self.offset = 0
+        self.rows = []
+        self.scrollbar = Scrollbar(self, orient="vertical", command=self._on_scrollbar,
+                                   bg="surface", troughcolor="bg")
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas = Canvas(self, bg=bg, highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.empty_item = self.canvas.create_text(14, 14, anchor="nw", text="",
+                                                  fill="text_faint", font=F["mono"])
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll_by(-1 * (e.delta // 120) * self.row_h))
+        self.canvas.bind("<Button-4>", lambda e: self.scroll_by(-self.row_h))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll_by(self.row_h))
+
+    def set_count(self, count, empty_text="", keep_offset=False):
+        self.count = count
+        self.offset = min(self.offset, self._max_offset()) if keep_offset else 0
+        self.canvas.itemconfig(self.empty_item, text="" if count else empty_text)
+        self.redraw()
+
+    def _total_height(self):
+        return max(self.count * self.row_h, 1)
+
+    def _max_offset(self):
+        return max(0, self.count * self.row_h - self.canvas.winfo_height())
+
+    def scroll_by(self, pixels):
+        self.offset = max(0, min(self._max_offset(), self.offset + pixels))
+        self.redraw()
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = max(0, min(self._max_offset(), int(float(amount) * self._total_height())))
+            self.redraw()
+        elif unit == "pages":
+            self.scroll_by(int(amount) * max(self.row_h, self.canvas.winfo_height() - self.row_h))
+        else:
+            self.scroll_by(int(amount) * self.row_h)
+
+    def redraw(self):
+        height = max(self.canvas.winfo_height(), 1)
+        width = max(self.canvas.winfo_width(), 1)
+        first = self.offset // self.row_h
+        visible = height // self.row_h + 1 + self.buffer
+        while len(self.rows) < visible:
+            self.rows.append(self.make_row(self.canvas))
+        for slot, row in enumerate(self.rows):
+            index = first + slot
+            if slot < visible and index < self.count:
+                self.fill_row(self.canvas, row, index, index * self.row_h - self.offset, width)
+                for item in row.values():
+                    self.canvas.itemconfig(item, state="normal")
+            else:
+                for item in row.values():
+                    self.canvas.itemconfig(item, state="hidden")
+        total = self._total_height()
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + height) / total))
+
+
+class GrammarCard(Frame):
+    """One drill card. Cards are pooled by the app and rebound with `reset`."""
+
     def __init__(self, master, grammar, index, total, on_rated, app):
-        super().__init__(master, bg=C["surface"], highlightthickness=1,
-                         highlightbackground=C["border"])
-        self.grammar = grammar
+        super().__init__(master, bg="surface", highlightthickness=1,
+                         highlightbackground="border")
         self.on_rated = on_rated
         self.app = app
-        self.rated = False
 
-        header = tk.Frame(self, bg=C["surface"])
+        header = Frame(self, bg="surface")
         header.pack(fill=tk.X, padx=16, pady=(14, 6))
-        badge = tk.Label(header, text=f"{index}/{total}", bg=C["accent_dim"],
-                         fg=C["bg"], font=F["ui_tiny"], padx=6, pady=1)
-        badge.pack(side=tk.LEFT, padx=(0, 10))
-        name_lbl = tk.Label(header, text=grammar["name"], bg=C["surface"],
-                            fg=C["text"], font=F["jp_medium"], anchor="w")
-        name_lbl.pack(side=tk.LEFT, fill=tk.X, expand=True)
-        link = tk.Label(header, text="bunpro >>", bg=C["surface"],
-                        fg=C["accent"], font=F["ui_small"], cursor="hand2")
+        self.badge = Label(header, bg="accent_dim",
+                           fg="bg", font=F["ui_tiny"], padx=6, pady=1)
+        self.badge.pack(side=tk.LEFT, padx=(0, 10))
+        self.name_lbl = Label(header, bg="surface",
+                              fg="text", font=F["jp_medium"], anchor="w")
+        self.name_lbl.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        link = Label(header, text="bunpro >>", bg="surface",
+                     fg="accent", font=F["ui_small"], cursor="hand2")
         link.pack(side=tk.RIGHT)
         link.bind("<Button-1>", lambda e: self._open_ref())
-        link.bind("<Enter>", lambda e: link.config(fg=C["text"]))
-        link.bind("<Leave>", lambda e: link.config(fg=C["accent"]))
+        link.bind("<Enter>", lambda e: link.config(fg="text"))
+        link.bind("<Leave>", lambda e: link.config(fg="accent"))
 
-        w = app.weights.get(grammar["name"], DEFAULT_WEIGHT)
-        mastery = max(0, min(100, int((1 - (w - 10) / 490) * 100)))
-        bar_frame = tk.Frame(self, bg=C["surface"])
+        bar_frame = Frame(self, bg="surface")
         bar_frame.pack(fill=tk.X, padx=16, pady=(0, 8))
-        bar_bg = tk.Frame(bar_frame, bg=C["border"], height=3)
+        bar_bg = Frame(bar_frame, bg="border", height=3)
         bar_bg.pack(fill=tk.X)
-        bar_fill = tk.Frame(bar_bg, bg=C["accent"] if mastery < 80 else C["green"],
-                            height=3, width=max(1, int(mastery * 3)))
-        bar_fill.place(x=0, y=0, relheight=1)
+        self.bar_fill = Frame(bar_bg, bg="accent", height=3, width=1)
+        self.bar_fill.place(x=0, y=0, relheight=1)
 
-        rate_frame = tk.Frame(self, bg=C["surface"])
+        rate_frame = Frame(self, bg="surface")
         rate_frame.pack(fill=tk.X, padx=16, pady=(0, 12))
-        self.status_lbl = tk.Label(rate_frame, text="Rate this point:",
-                                    bg=C["surface"], fg=C["text_dim"], font=F["ui_small"])
+        self.status_lbl = Label(rate_frame, text="Rate this point:",
+                                 bg="surface", fg="text_dim", font=F["ui_small"])
         self.status_lbl.pack(side=tk.LEFT)
         btn_w, btn_h = 80, 28
         self.btn_easy = FlatButton(rate_frame, "EASY", lambda: self._rate("Easy"),
-                                    fg=C["green"], bg=C["green_bg"], btn_width=btn_w, btn_height=btn_h, font=F["ui_small"])
+                                    fg="green", bg="green_bg", btn_width=btn_w, btn_height=btn_h, font=F["ui_small"])
         self.btn_easy.pack(side=tk.RIGHT, padx=(4, 0))
         self.btn_norm = FlatButton(rate_frame, "OK", lambda: self._rate("Normal"),
-                                    fg=C["text_dim"], bg=C["surface2"], btn_width=btn_w, btn_height=btn_h, font=F["ui_small"])
+                                    fg="text_dim", bg="surface2", btn_width=btn_w, btn_height=btn_h, font=F["ui_small"])
         self.btn_norm.pack(side=tk.RIGHT, padx=(4, 0))
         self.btn_hard = FlatButton(rate_frame, "HARD", lambda: self._rate("Hard"),
-                                    fg=C["red"], bg=C["red_bg"], btn_width=btn_w, btn_height=btn_h, font=F["ui_small"])
+                                    fg="red", bg="red_bg", btn_width=btn_w, btn_height=btn_h, font=F["ui_small"])
         self.btn_hard.pack(side=tk.RIGHT, padx=(4, 0))
 
+        self.rated = False
+        self.reset(grammar, index, total)
+
+    def reset(self, grammar, index, total):
+        """Rebind the card to a new grammar point; only changed options are touched."""
+        self.grammar = grammar
+        self.badge.config(text=f"{index}/{total}")
+        self.name_lbl.config(text=grammar["name"])
+        pct = mastery(self.app.session.weights.get(grammar["name"], DEFAULT_WEIGHT))
+        self.bar_fill.config(bg="accent" if pct < 80 else "green", width=max(1, int(pct * 3)))
+        if self.rated:
+            self.rated = False
+            for b in (self.btn_hard, self.btn_norm, self.btn_easy):
+                b.set_disabled(False)
+            self.status_lbl.config(text="Rate this point:", fg="text_dim")
+            self.configure(highlightbackground="border")
+
     def _open_ref(self):
         url = self.grammar.get("url", "")
         if url.startswith("http"):
@@ -362,10 +944,10 @@ class GrammarCard(tk.Frame):
         self.rated = True
         for b in (self.btn_hard, self.btn_norm, self.btn_easy):
             b.set_disabled(True)
-        labels = {"Hard": ("HARD x", C["red"]), "Normal": ("OK -", C["text_dim"]), "Easy": ("EASY +", C["green"])}
+        labels = {"Hard": ("HARD x", "red"), "Normal": ("OK -", "text_dim"), "Easy": ("EASY +", "green")}
         txt, color = labels[difficulty]
         self.status_lbl.config(text=f"Rated: {txt}", fg=color)
-        self.configure(highlightbackground=C["text_faint"])
+        self.configure(highlightbackground="text_faint")
         self.on_rated(self.grammar, difficulty)
 
     def is_rated(self):
@@ -377,312 +959,400 @@ class GrammarCard(tk.Frame):
 # ─────────────────────────────────────────────────────────────
 
 class StatsWindow:
-    def __init__(self, parent_root, history, weights):
-        self.history = history
-        self.weights = weights
-        self.top = tk.Toplevel(parent_root)
+    """Stats dashboard, filled in section by section.
+
+    `source()` runs on the UI thread and returns None while history is still
+    loading, else a callable that gives the worker a StatsIndex of its own.
+    The worker works out each section's figures in display order (overview
+    first) and queues them; `_poll` draws whatever has arrived. Closing the
+    window stops the worker at the next section.
+
+    Each section draws into its own box. Chart sections keep their canvases
+    and are updated in place when the window is refreshed.
+    """
+
+    SECTIONS = ("overview", "activity", "periods", "difficulty", "struggled", "mastered",
+                "reviewed", "least_reviewed", "daily", "weekdays", "hours", "writing",
+                "mastery", "recent_hard")
+    POLL_MS = 30
+
+    def __init__(self, parent_root, source, weights):
+        self.source = source
+        self.weights = list(weights)
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self._job = None
+        self.boxes = {}
+        self.charts = {}
+        self.top = Toplevel(parent_root)
         self.top.title("Stats")
         self.top.geometry("640x780")
-        self.top.configure(bg=C["bg"])
+        self.top.configure(bg="bg")
         self.top.minsize(540, 600)
+        self.top.bind("<Destroy>", self._on_destroy)
         self._build()
-
-    def _parse_date(self, date_str):
-        try:
-            return datetime.strptime(date_str, "%Y-%m-%d %H:%M")
-        except Exception:
-            return None
+        self._start()
 
     def _section(self, parent, text):
-        tk.Label(parent, text=text, bg=C["bg"], fg=C["text_faint"],
-                 font=F["ui_tiny"]).pack(anchor="w", padx=20, pady=(14, 4))
+        Label(parent, text=text, bg="bg", fg="text_faint",
+              font=F["ui_tiny"]).pack(anchor="w", padx=20, pady=(14, 4))
 
     def _stat_row(self, parent, label, value, color=None):
-        row = tk.Frame(parent, bg=C["surface"])
+        row = Frame(parent, bg="surface")
         row.pack(fill=tk.X, pady=1)
-        tk.Label(row, text=label, bg=C["surface"], fg=C["text_dim"],
-                 font=F["ui_small"]).pack(side=tk.LEFT)
-        tk.Label(row, text=str(value), bg=C["surface"], fg=color or C["text"],
-                 font=F["ui_bold"]).pack(side=tk.RIGHT)
-
-    def _calc_streaks(self, parsed):
-        if not parsed:
-            return 0, 0
-        dates = sorted(set(dt.strftime("%Y-%m-%d") for dt, _ in parsed))
-        today = datetime.now().strftime("%Y-%m-%d")
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-        date_set = set(dates)
-        streak = 0
-        check = today
-        if check in date_set or yesterday in date_set:
-            if check not in date_set:
-                check = yesterday
-            while check in date_set:
-                streak += 1
-                check = (datetime.strptime(check, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
-        max_streak = 1 if dates else 0
-        current_run = 1
-        for i in range(1, len(dates)):
-            d1 = datetime.strptime(dates[i-1], "%Y-%m-%d")
-            d2 = datetime.strptime(dates[i], "%Y-%m-%d")
-            if (d2 - d1).days == 1:
-                current_run += 1
-                max_streak = max(max_streak, current_run)
-            else:
-                current_run = 1
-        return streak, max_streak
+        Label(row, text=label, bg="surface", fg="text_dim",
+              font=F["ui_small"]).pack(side=tk.LEFT)
+        Label(row, text=str(value), bg="surface", fg=color or "text",
+              font=F["ui_bold"]).pack(side=tk.RIGHT)
 
     def _diff_bar(self, parent, easy_n, ok_n, hard_n):
         """Stacked proportional difficulty bar."""
         total = easy_n + ok_n + hard_n
         if total == 0:
             return
-        container = tk.Frame(parent, bg=C["border"], height=8)
+        container = Frame(parent, bg="border", height=8)
         container.pack(fill=tk.X, pady=(6, 4))
         container.update_idletasks()
         # Use a canvas for precise proportional drawing
-        bar = tk.Canvas(container, height=8, bg=C["border"], highlightthickness=0)
+        bar = Canvas(container, height=8, bg="border", highlightthickness=0)
         bar.pack(fill=tk.X)
         bar.update_idletasks()
         w = max(bar.winfo_width(), 200)
         x = 0
-        for count, color in [(easy_n, C["green"]), (ok_n, C["amber"]), (hard_n, C["red"])]:
+        for count, color in [(easy_n, "green"), (ok_n, "amber"), (hard_n, "red")]:
             if count > 0:
                 seg_w = max(2, int(w * count / total))
                 bar.create_rectangle(x, 0, x + seg_w, 8, fill=color, outline="")
                 x += seg_w
 
     def _build(self):
-        canvas = tk.Canvas(self.top, bg=C["bg"], highlightthickness=0)
-        scrollbar = tk.Scrollbar(self.top, orient="vertical", command=canvas.yview,
-                                  bg=C["surface"], troughcolor=C["bg"])
+        canvas = Canvas(self.top, bg="bg", highlightthickness=0)
+        scrollbar = Scrollbar(self.top, orient="vertical", command=canvas.yview,
+                               bg="surface", troughcolor="bg")
         canvas.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        frame = tk.Frame(canvas, bg=C["bg"])
+        frame = Frame(canvas, bg="bg")
         cw = canvas.create_window((0, 0), window=frame, anchor="nw")
         frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
         canvas.bind("<Configure>", lambda e: canvas.itemconfig(cw, width=e.width))
         canvas.bind_all("<MouseWheel>", lambda e: canvas.yview_scroll(-1 * (e.delta // 120), "units"))
+        self.frame = frame
 
         # Title
-        tk.Label(frame, text="統計", bg=C["bg"], fg=C["accent"],
-                 font=pick_font(JP_DISPLAY, 22, "bold")).pack(pady=(20, 2))
-        tk.Label(frame, text="Statistics Dashboard", bg=C["bg"], fg=C["text_dim"],
-                 font=F["ui"]).pack(pady=(0, 10))
+        Label(frame, text="統計", bg="bg", fg="accent",
+              font=pick_font(JP_DISPLAY, 22, "bold")).pack(pady=(20, 2))
+        Label(frame, text="Statistics Dashboard", bg="bg", fg="text_dim",
+              font=F["ui"]).pack(pady=(0, 10))
+        # Bottom pad
+        Frame(frame, bg="bg", height=24).pack(side=tk.BOTTOM)
+        self.status = Label(frame, text="Computing...", bg="bg", fg="text_faint",
+                            font=F["ui_small"])
+        self.status.pack(side=tk.BOTTOM, pady=(12, 0))
+
+    # ── Worker ────────────────────────────────────────────
+
+    def refresh(self, weights):
+        """Recompute with fresh data, keeping the sections already on screen."""
+        self.weights = list(weights)
+        self.cancelled.set()
+        if self._job is not None:
+            self.top.after_cancel(self._job)
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self._start()
+
+    def _start(self):
+        self._job = None
+        load = self.source()
+        if load is None:
+            self.status.config(text="Loading history...", fg="text_faint")
+            self.status.pack(side=tk.BOTTOM, pady=(12, 0))
+            self._job = self.top.after(100, self._start)
+            return
+        self.status.config(text="Computing...", fg="text_faint")
+        self.status.pack(side=tk.BOTTOM, pady=(12, 0))
+        threading.Thread(target=self._work, args=(load, self.results, self.cancelled),
+                         name="stats-worker", daemon=True).start()
+        self._job = self.top.after(self.POLL_MS, self._poll)
+
+    @PROFILER.timed
+    def _work(self, load, results, cancelled):
+        try:
+            stats = load()
+            today = datetime.now().date()
+            for name in self.SECTIONS:
+                if cancelled.is_set():
+                    return
+                results.put((name, getattr(self, "_data_" + name)(stats, today)))
+        except Exception as e:
+            results.put(("error", e))
+        results.put(("done", None))
 
-        now = datetime.now()
-        today_str = now.strftime("%Y-%m-%d")
+    def _poll(self):
+        self._job = None
+        try:
+            name, data = self.results.get_nowait()
+        except queue.Empty:
+            self._job = self.top.after(self.POLL_MS, self._poll)
+            return
+        if name == "done":
+            self.status.pack_forget()
+            return
+        if name == "error":
+            self.status.config(text=f"Could not compute stats: {data}", fg="red")
+            return
+        self._draw_section(name, data)
+        # One section per turn of the event loop keeps the window responsive.
+        self._job = self.top.after(1, self._poll)
+
+    @PROFILER.timed
+    def _draw_section(self, name, data):
+        box = self.boxes.get(name)
+        if box is None:
+            box = self.boxes[name] = Frame(self.frame, bg="bg")
+            box.pack(fill=tk.X)
+        getattr(self, "_draw_" + name)(box, data)
+
+    def _on_destroy(self, event):
+        if event.widget is not self.top:
+            return
+        self.cancelled.set()
+        if self._job is not None:
+            self.top.after_cancel(self._job)
+            self._job = None
 
-        parsed = []
-        for item in self.history:
-            dt = self._parse_date(item.get("date", ""))
-            if dt:
-                parsed.append((dt, item))
+    def _clear(self, box):
+        for w in box.winfo_children():
+            w.destroy()
 
-        # ── OVERVIEW CARDS ────────────────────────────────
+    def _chart(self, box, name, title, data, **kw):
+        """Section title plus a BarChart, built once and updated on refresh."""
+        if not box.winfo_children():
+            self._section(box, title)
+        chart = self.charts.get(name)
+        if chart is not None:
+            chart.set_data(data)
+        elif data:
+            chart = self.charts[name] = BarChart(box, data, **kw)
+            chart.pack(padx=20, anchor="w", pady=(0, 12))
+
+    # ── Sections: _data_* runs on the worker, _draw_* on the UI thread ──
+
+    def _data_overview(self, stats, today):
+        streak, max_streak = stats.streaks(today)
+        return (stats.reviews, len(stats.days), len(stats.grammar), stats.unique_sentences(),
+                streak, max_streak)
+
+    def _draw_overview(self, frame, data):
+        self._clear(frame)
+        total_reviews, total_days_active, unique_grammar, total_sentences, streak, max_streak = data
         self._section(frame, "OVERVIEW")
-        overview = tk.Frame(frame, bg=C["bg"])
+        overview = Frame(frame, bg="bg")
         overview.pack(fill=tk.X, padx=20, pady=(0, 12))
-
-        total_reviews = len(parsed)
-        total_days_active = len(set(dt.strftime("%Y-%m-%d") for dt, _ in parsed))
-        unique_grammar = len(set(it["grammar"] for _, it in parsed))
-        total_sentences = len(set(it.get("sentence", "") for _, it in parsed))
-        streak, max_streak = self._calc_streaks(parsed)
-
         cards_data = [
-            ("Total Reviews", str(total_reviews), C["accent"]),
-            ("Days Active", str(total_days_active), C["blue"]),
-            ("Grammar Studied", str(unique_grammar), C["green"]),
-            ("Unique Sentences", str(total_sentences), C["amber"]),
-            ("Current Streak", f"{streak}d", C["accent"]),
-            ("Best Streak", f"{max_streak}d", C["green"]),
+            ("Total Reviews", str(total_reviews), "accent"),
+            ("Days Active", str(total_days_active), "blue"),
+            ("Grammar Studied", str(unique_grammar), "green"),
+            ("Unique Sentences", str(total_sentences), "amber"),
+            ("Current Streak", f"{streak}d", "accent"),
+            ("Best Streak", f"{max_streak}d", "green"),
         ]
         row_frame = None
         for i, (label, value, color) in enumerate(cards_data):
             if i % 3 == 0:
-                row_frame = tk.Frame(overview, bg=C["bg"])
+                row_frame = Frame(overview, bg="bg")
                 row_frame.pack(fill=tk.X, pady=(0, 6))
-            card = tk.Frame(row_frame, bg=C["surface"], padx=14, pady=10)
+            card = Frame(row_frame, bg="surface", padx=14, pady=10)
             card.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0 if i % 3 == 0 else 4, 0))
-            tk.Label(card, text=value, bg=C["surface"], fg=color,
-                     font=pick_font(UI_FONT, 20, "bold")).pack(anchor="w")
-            tk.Label(card, text=label, bg=C["surface"], fg=C["text_dim"],
-                     font=F["ui_tiny"]).pack(anchor="w")
-
-        # ── ACTIVITY HEATMAP ──────────────────────────────
+            Label(card, text=value, bg="surface", fg=color,
+                  font=pick_font(UI_FONT, 20, "bold")).pack(anchor="w")
+            Label(card, text=label, bg="surface", fg="text_dim",
+                  font=F["ui_tiny"]).pack(anchor="w")
+
+    def _data_activity(self, stats, today):
+        return stats.day_counts()
+
+    def _draw_activity(self, frame, day_counts):
+        heatmap = self.charts.get("activity")
+        if heatmap is not None:
+            heatmap.set_data(day_counts)
+            return
         self._section(frame, "ACTIVITY  (last 90 days)")
-        day_counts = Counter(dt.strftime("%Y-%m-%d") for dt, _ in parsed)
-        heatmap = HeatmapStrip(frame, day_counts, num_days=90)
-        heatmap.pack(padx=20, anchor="w", pady=(0, 4))
-        # Legend
-        leg = tk.Frame(frame, bg=C["bg"])
-        leg.pack(padx=24, anchor="w", pady=(0, 12))
-        tk.Label(leg, text="Less", bg=C["bg"], fg=C["text_faint"], font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 4))
-        for ratio in [0, 0.3, 0.55, 0.8, 1.0]:
-            clr = C["border"] if ratio == 0 else _blend(C["border"], C["accent"], ratio)
-            tk.Canvas(leg, width=10, height=10, bg=clr, highlightthickness=0).pack(side=tk.LEFT, padx=1)
-        tk.Label(leg, text="More", bg=C["bg"], fg=C["text_faint"], font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(4, 0))
-
-        # ── PERIOD BREAKDOWN ──────────────────────────────
+        heatmap = self.charts["activity"] = HeatmapStrip(frame, day_counts, num_days=90, legend=True)
+        heatmap.pack(padx=20, anchor="w", pady=(0, 12))
+
+    def _data_periods(self, stats, today):
+        periods = [("Today", 1), ("This Week", 7), ("This Month", 30), ("This Year", 365)]
+        return [(pname, stats.period(num_days, today)) for pname, num_days in periods]
+
+    def _draw_periods(self, frame, periods):
+        self._clear(frame)
         self._section(frame, "PERIOD BREAKDOWN")
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
-        year_ago = now - timedelta(days=365)
-
-        periods = [
-            ("Today",      [(dt, it) for dt, it in parsed if dt.strftime("%Y-%m-%d") == today_str]),
-            ("This Week",  [(dt, it) for dt, it in parsed if dt >= week_ago]),
-            ("This Month", [(dt, it) for dt, it in parsed if dt >= month_ago]),
-            ("This Year",  [(dt, it) for dt, it in parsed if dt >= year_ago]),
-        ]
-        for pname, pitems in periods:
-            pcard = tk.Frame(frame, bg=C["surface"], padx=14, pady=10)
+        for pname, (ptotal, easy_n, ok_n, hard_n, unique_g) in periods:
+            pcard = Frame(frame, bg="surface", padx=14, pady=10)
             pcard.pack(fill=tk.X, padx=20, pady=(0, 4))
-            hdr = tk.Frame(pcard, bg=C["surface"])
+            hdr = Frame(pcard, bg="surface")
             hdr.pack(fill=tk.X)
-            tk.Label(hdr, text=pname, bg=C["surface"], fg=C["text"], font=F["ui_bold"]).pack(side=tk.LEFT)
-            tk.Label(hdr, text=f"{len(pitems)} reviews", bg=C["surface"], fg=C["text_dim"], font=F["ui_small"]).pack(side=tk.RIGHT)
-            if pitems:
-                diffs = Counter(it["difficulty"] for _, it in pitems)
-                easy_n, ok_n, hard_n = diffs.get("Easy", 0), diffs.get("Normal", 0), diffs.get("Hard", 0)
+            Label(hdr, text=pname, bg="surface", fg="text", font=F["ui_bold"]).pack(side=tk.LEFT)
+            Label(hdr, text=f"{ptotal} reviews", bg="surface", fg="text_dim", font=F["ui_small"]).pack(side=tk.RIGHT)
+            if ptotal:
                 self._diff_bar(pcard, easy_n, ok_n, hard_n)
-                detail = tk.Frame(pcard, bg=C["surface"])
+                detail = Frame(pcard, bg="surface")
                 detail.pack(fill=tk.X)
-                for cnt, clr, lbl in [(easy_n, C["green"], "Easy"), (ok_n, C["text_dim"], "OK"), (hard_n, C["red"], "Hard")]:
-                    tk.Label(detail, text=f"{lbl}: {cnt}", bg=C["surface"], fg=clr, font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 12))
-                unique_g = len(set(it["grammar"] for _, it in pitems))
-                tk.Label(detail, text=f"Points: {unique_g}", bg=C["surface"], fg=C["text_faint"], font=F["ui_tiny"]).pack(side=tk.RIGHT)
-
-        # ── DIFFICULTY DISTRIBUTION ───────────────────────
-        self._section(frame, "DIFFICULTY DISTRIBUTION  (all time)")
-        all_diffs = Counter(it["difficulty"] for _, it in parsed)
+                for cnt, clr, lbl in [(easy_n, "green", "Easy"), (ok_n, "text_dim", "OK"), (hard_n, "red", "Hard")]:
+                    Label(detail, text=f"{lbl}: {cnt}", bg="surface", fg=clr, font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 12))
+                Label(detail, text=f"Points: {unique_g}", bg="surface", fg="text_faint", font=F["ui_tiny"]).pack(side=tk.RIGHT)
+
+    def _data_difficulty(self, stats, today):
+        all_diffs = stats.difficulty
+        return all_diffs.get("Easy", 0), all_diffs.get("Normal", 0), all_diffs.get("Hard", 0)
+
+    def _draw_difficulty(self, frame, data):
+        easy_n, ok_n, hard_n = data
         diff_data = [
-            ("Easy", all_diffs.get("Easy", 0), C["green"]),
-            ("OK", all_diffs.get("Normal", 0), C["amber"]),
-            ("Hard", all_diffs.get("Hard", 0), C["red"]),
+            ("Easy", easy_n, "green"),
+            ("OK", ok_n, "amber"),
+            ("Hard", hard_n, "red"),
         ]
-        BarChart(frame, diff_data, width=400, bar_height=20).pack(padx=20, anchor="w", pady=(0, 12))
-
-        # ── MOST STRUGGLED ────────────────────────────────
-        self._section(frame, "MOST STRUGGLED  (highest weight)")
-        struggled = sorted(self.weights.items(), key=lambda x: x[1], reverse=True)[:10]
-        if struggled:
-            sd = [(n, int(w), C["red"] if w > 200 else C["amber"] if w > 100 else C["text_dim"]) for n, w in struggled]
-            BarChart(frame, sd, width=480, bar_height=18, label_width=120).pack(padx=20, anchor="w", pady=(0, 12))
-
-        # ── MOST MASTERED ─────────────────────────────────
-        self._section(frame, "MOST MASTERED  (lowest weight)")
-        mastered = sorted(self.weights.items(), key=lambda x: x[1])[:10]
-        if mastered:
-            md = [(n, int(w), C["green"] if w < 50 else C["blue"] if w < 100 else C["text_dim"]) for n, w in mastered]
-            BarChart(frame, md, width=480, bar_height=18, label_width=120).pack(padx=20, anchor="w", pady=(0, 12))
-
-        # ── MOST REVIEWED ─────────────────────────────────
-        self._section(frame, "MOST REVIEWED")
-        review_counts = Counter(it["grammar"] for _, it in parsed)
-        top_rev = review_counts.most_common(10)
-        if top_rev:
-            rd = [(n, c, C["accent"]) for n, c in top_rev]
-            BarChart(frame, rd, width=480, bar_height=18, label_width=120).pack(padx=20, anchor="w", pady=(0, 12))
-
-        # ── LEAST REVIEWED ────────────────────────────────
-        self._section(frame, "LEAST REVIEWED  (blind spots)")
-        if review_counts:
-            bottom_rev = review_counts.most_common()[-10:]
-            bottom_rev.reverse()
-            if bottom_rev:
-                brd = [(n, c, C["red"] if c <= 2 else C["amber"]) for n, c in bottom_rev]
-                BarChart(frame, brd, width=480, bar_height=18, label_width=120).pack(padx=20, anchor="w", pady=(0, 12))
-
-        # ── DAILY VOLUME (last 30 days) ───────────────────
-        self._section(frame, "DAILY VOLUME  (last 30 days)")
+        self._chart(frame, "difficulty", "DIFFICULTY DISTRIBUTION  (all time)", diff_data,
+                    width=400, bar_height=20)
+
+    def _data_struggled(self, stats, today):
+        return sorted(self.weights, key=lambda x: x[1], reverse=True)[:10]
+
+    def _draw_struggled(self, frame, struggled):
+        sd = [(n, int(w), "red" if w > 200 else "amber" if w > 100 else "text_dim") for n, w in struggled]
+        self._chart(frame, "struggled", "MOST STRUGGLED  (highest weight)", sd,
+                    width=480, bar_height=18, label_width=120)
+
+    def _data_mastered(self, stats, today):
+        return sorted(self.weights, key=lambda x: x[1])[:10]
+
+    def _draw_mastered(self, frame, mastered):
+        md = [(n, int(w), "green" if w < 50 else "blue" if w < 100 else "text_dim") for n, w in mastered]
+        self._chart(frame, "mastered", "MOST MASTERED  (lowest weight)", md,
+                    width=480, bar_height=18, label_width=120)
+
+    def _data_reviewed(self, stats, today):
+        return Counter(stats.grammar).most_common(10)
+
+    def _draw_reviewed(self, frame, top_rev):
+        rd = [(n, c, "accent") for n, c in top_rev]
+        self._chart(frame, "reviewed", "MOST REVIEWED", rd, width=480, bar_height=18, label_width=120)
+
+    def _data_least_reviewed(self, stats, today):
+        bottom_rev = Counter(stats.grammar).most_common()[-10:]
+        bottom_rev.reverse()
+        return bottom_rev
+
+    def _draw_least_reviewed(self, frame, bottom_rev):
+        brd = [(n, c, "red" if c <= 2 else "amber") for n, c in bottom_rev]
+        self._chart(frame, "least_reviewed", "LEAST REVIEWED  (blind spots)", brd,
+                    width=480, bar_height=18, label_width=120)
+
+    def _data_daily(self, stats, today):
+        day_counts = stats.day_counts()
         last_30 = []
         for d in range(29, -1, -1):
-            date = (now - timedelta(days=d)).strftime("%Y-%m-%d")
-            count = day_counts.get(date, 0)
-            last_30.append((date[-5:], count, C["accent"] if count > 0 else C["border"]))
-        BarChart(frame, last_30, width=520, bar_height=10, spacing=2, label_width=50).pack(padx=20, anchor="w", pady=(0, 12))
-
-        # ── WEEKDAY PATTERN ───────────────────────────────
-        self._section(frame, "WEEKDAY PATTERN")
-        weekday_counts = Counter()
-        for dt, _ in parsed:
-            weekday_counts[dt.strftime("%A")] += 1
+            date = (today - timedelta(days=d)).strftime("%Y-%m-%d")
+            last_30.append((date[-5:], day_counts.get(date, 0)))
+        return last_30
+
+    def _draw_daily(self, frame, last_30):
+        data = [(label, count, "accent" if count > 0 else "border") for label, count in last_30]
+        self._chart(frame, "daily", "DAILY VOLUME  (last 30 days)", data,
+                    width=520, bar_height=10, spacing=2, label_width=50)
+
+    def _data_weekdays(self, stats, today):
+        return list(stats.weekdays)
+
+    def _draw_weekdays(self, frame, weekdays):
         day_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        wd_data = [(d[:3], weekday_counts.get(d, 0), C["accent"]) for d in day_order]
-        BarChart(frame, wd_data, width=400, bar_height=16, spacing=3, label_width=50).pack(padx=20, anchor="w", pady=(0, 12))
-
-        # ── HOUR OF DAY PATTERN ───────────────────────────
-        self._section(frame, "TIME OF DAY PATTERN")
-        hour_counts = Counter()
-        for dt, _ in parsed:
-            hour_counts[dt.hour] += 1
+        wd_data = [(d[:3], weekdays[i], "accent") for i, d in enumerate(day_order)]
+        self._chart(frame, "weekdays", "WEEKDAY PATTERN", wd_data,
+                    width=400, bar_height=16, spacing=3, label_width=50)
+
+    def _data_hours(self, stats, today):
+        return list(stats.hours)
+
+    def _draw_hours(self, frame, hours):
         hour_data = []
         for h in range(24):
             label = f"{h:02d}:00"
-            hour_data.append((label, hour_counts.get(h, 0), C["blue"] if hour_counts.get(h, 0) > 0 else C["border"]))
-        BarChart(frame, hour_data, width=460, bar_height=8, spacing=1, label_width=50).pack(padx=20, anchor="w", pady=(0, 12))
+            hour_data.append((label, hours[h], "blue" if hours[h] > 0 else "border"))
+        self._chart(frame, "hours", "TIME OF DAY PATTERN", hour_data,
+                    width=460, bar_height=8, spacing=1, label_width=50)
 
-        # ── WRITING STATS ─────────────────────────────────
+    def _data_writing(self, stats, today):
+        if not stats.reviews:
+            return None
+        avg_len = stats.chars / stats.written if stats.written else 0
+        return stats.chars, avg_len, stats.longest, stats.shortest, len(stats.sentences)
+
+    def _draw_writing(self, frame, data):
+        self._clear(frame)
         self._section(frame, "WRITING STATS")
-        wcard = tk.Frame(frame, bg=C["surface"], padx=14, pady=12)
+        wcard = Frame(frame, bg="surface", padx=14, pady=12)
         wcard.pack(fill=tk.X, padx=20, pady=(0, 12))
-        sentences = [it.get("sentence", "") for _, it in parsed]
-        if sentences:
-            lengths = [len(s) for s in sentences if s]
-            avg_len = sum(lengths) / len(lengths) if lengths else 0
-            total_chars = sum(lengths)
-            self._stat_row(wcard, "Total characters written", f"{total_chars:,}")
+        if data:
+            chars, avg_len, longest, shortest, unique = data
+            self._stat_row(wcard, "Total characters written", f"{chars:,}")
             self._stat_row(wcard, "Average sentence length", f"{avg_len:.1f} chars")
-            self._stat_row(wcard, "Longest sentence", f"{max(lengths) if lengths else 0} chars")
-            self._stat_row(wcard, "Shortest sentence", f"{min(lengths) if lengths else 0} chars")
-            self._stat_row(wcard, "Unique sentences", str(len(set(s for s in sentences if s))))
-        else:
-            tk.Label(wcard, text="No sentences yet", bg=C["surface"], fg=C["text_faint"], font=F["ui_small"]).pack()
-
-        # ── MASTERY OVERVIEW ──────────────────────────────
-        if self.weights:
-            self._section(frame, "MASTERY OVERVIEW")
-            mcard = tk.Frame(frame, bg=C["surface"], padx=14, pady=12)
-            mcard.pack(fill=tk.X, padx=20, pady=(0, 12))
-            wvals = list(self.weights.values())
-            mastered_n = sum(1 for w in wvals if w <= 30)
-            comfortable_n = sum(1 for w in wvals if 30 < w <= 80)
-            learning_n = sum(1 for w in wvals if 80 < w <= 150)
-            struggling_n = sum(1 for w in wvals if w > 150)
-            total_g = len(wvals)
-            for label, cnt, clr in [("Mastered (w <= 30)", mastered_n, C["green"]),
-                                     ("Comfortable (w <= 80)", comfortable_n, C["blue"]),
-                                     ("Learning (w <= 150)", learning_n, C["amber"]),
-                                     ("Struggling (w > 150)", struggling_n, C["red"])]:
-                pct = f"{cnt}/{total_g}  ({100*cnt/total_g:.0f}%)" if total_g else "0"
-                self._stat_row(mcard, label, pct, clr)
-            # Stacked bar
-            bar_outer = tk.Frame(mcard, bg=C["border"], height=10)
-            bar_outer.pack(fill=tk.X, pady=(8, 0))
-            inner = tk.Frame(bar_outer, bg=C["border"])
-            inner.pack(fill=tk.BOTH, expand=True)
-            if total_g > 0:
-                for cnt, clr in [(mastered_n, C["green"]), (comfortable_n, C["blue"]),
-                                  (learning_n, C["amber"]), (struggling_n, C["red"])]:
-                    if cnt > 0:
-                        tk.Frame(inner, bg=clr, height=10,
-                                 width=max(2, int(400 * cnt / total_g))).pack(side=tk.LEFT, fill=tk.Y)
-
-        # ── RECENT HARD POINTS ────────────────────────────
-        self._section(frame, "RECENT HARD-RATED POINTS  (last 50 reviews)")
-        recent_hard = [it["grammar"] for _, it in parsed[:50] if it.get("difficulty") == "Hard"]
-        if recent_hard:
-            hc = Counter(recent_hard).most_common(8)
-            hd = [(n, c, C["red"]) for n, c in hc]
-            BarChart(frame, hd, width=400, bar_height=16, label_width=120).pack(padx=20, anchor="w", pady=(0, 12))
+            self._stat_row(wcard, "Longest sentence", f"{longest} chars")
+            self._stat_row(wcard, "Shortest sentence", f"{shortest} chars")
+            self._stat_row(wcard, "Unique sentences", str(unique))
         else:
-            tk.Label(frame, text="No hard ratings recently!", bg=C["bg"], fg=C["green"], font=F["ui_small"]).pack(padx=20, anchor="w", pady=(0, 12))
+            Label(wcard, text="No sentences yet", bg="surface", fg="text_faint", font=F["ui_small"]).pack()
 
-        # Bottom pad
-        tk.Frame(frame, bg=C["bg"], height=24).pack()
+    def _data_mastery(self, stats, today):
+        if not self.weights:
+            return None
+        return Counter(mastery_tier(w) for _, w in self.weights), len(self.weights)
+
+    def _draw_mastery(self, frame, data):
+        self._clear(frame)
+        if not data:
+            return
+        tiers, total_g = data
+        rows = [(f"{tier} (w <= {limit})", tiers[tier]) for limit, tier in TIERS]
+        rows.append((f"Struggling (w > {TIERS[-1][0]})", tiers["Struggling"]))
+        colors = ("green", "blue", "amber", "red")
+        self._section(frame, "MASTERY OVERVIEW")
+        mcard = Frame(frame, bg="surface", padx=14, pady=12)
+        mcard.pack(fill=tk.X, padx=20, pady=(0, 12))
+        for (label, cnt), clr in zip(rows, colors):
+            pct = f"{cnt}/{total_g}  ({100*cnt/total_g:.0f}%)" if total_g else "0"
+            self._stat_row(mcard, label, pct, clr)
+        # Stacked bar
+        bar_outer = Frame(mcard, bg="border", height=10)
+        bar_outer.pack(fill=tk.X, pady=(8, 0))
+        inner = Frame(bar_outer, bg="border")
+        inner.pack(fill=tk.BOTH, expand=True)
+        if total_g > 0:
+            for (_, cnt), clr in zip(rows, colors):
+                if cnt > 0:
+                    Frame(inner, bg=clr, height=10,
+                          width=max(2, int(400 * cnt / total_g))).pack(side=tk.LEFT, fill=tk.Y)
+
+    def _data_recent_hard(self, stats, today):
+        recent_hard = [name for name, diff in stats.recent if diff == "Hard"]
+        return Counter(recent_hard).most_common(8)
+
+    def _draw_recent_hard(self, frame, hc):
+        # The chart and the all-clear label are both kept; a refresh shows one of them.
+        chart = self.charts.get("recent_hard")
+        if chart is None:
+            self._section(frame, "RECENT HARD-RATED POINTS  (last 50 reviews)")
+            chart = self.charts["recent_hard"] = BarChart(frame, [], width=400, bar_height=16, label_width=120)
+            self.no_hard = Label(frame, text="No hard ratings recently!", bg="bg", fg="green", font=F["ui_small"])
+        if hc:
+            chart.set_data([(n, c, "red") for n, c in hc])
+            self.no_hard.pack_forget()
+            chart.pack(padx=20, anchor="w", pady=(0, 12))
+        else:
+            chart.pack_forget()
+            self.no_hard.pack(padx=20, anchor="w", pady=(0, 12))
 
 
 # ─────────────────────────────────────────────────────────────
@@ -692,99 +1362,250 @@ class StatsWindow:
 class HistoryWindow:
     def __init__(self, parent_root, history):
         self.history = history
-        self.filtered = list(history)
-        self.top = tk.Toplevel(parent_root)
+        self.result = None
+        self._fetch_job = None
+        self.top = Toplevel(parent_root)
         self.top.title("History")
         self.top.geometry("580x660")
-        self.top.configure(bg=C["bg"])
+        self.top.configure(bg="bg")
         self.top.minsize(420, 400)
         self._build()
 
     def _build(self):
-        tk.Label(self.top, text="履歴", bg=C["bg"], fg=C["accent"],
-                 font=pick_font(JP_DISPLAY, 18, "bold")).pack(pady=(16, 2))
-        tk.Label(self.top, text="Study History", bg=C["bg"], fg=C["text_dim"],
-                 font=F["ui"]).pack(pady=(0, 8))
+        Label(self.top, text="履歴", bg="bg", fg="accent",
+              font=pick_font(JP_DISPLAY, 18, "bold")).pack(pady=(16, 2))
+        Label(self.top, text="Study History", bg="bg", fg="text_dim",
+              font=F["ui"]).pack(pady=(0, 8))
 
         # Search bar
-        search_frame = tk.Frame(self.top, bg=C["bg"])
+        search_frame = Frame(self.top, bg="bg")
         search_frame.pack(fill=tk.X, padx=16, pady=(0, 4))
-        tk.Label(search_frame, text="SEARCH", bg=C["bg"], fg=C["text_faint"],
-                 font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 8))
+        Label(search_frame, text="SEARCH", bg="bg", fg="text_faint",
+              font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 8))
         self.search_var = tk.StringVar()
         self.search_var.trace_add("write", lambda *a: self._apply_filter())
-        self.search_entry = tk.Entry(search_frame, textvariable=self.search_var,
-                                      bg=C["input_bg"], fg=C["text"], font=F["ui"],
-                                      insertbackground=C["accent"], relief=tk.FLAT,
-                                      highlightthickness=1, highlightbackground=C["border"],
-                                      highlightcolor=C["accent"])
+        self.search_entry = Entry(search_frame, textvariable=self.search_var,
+                                   bg="input_bg", fg="text", font=F["ui"],
+                                   insertbackground="accent", relief=tk.FLAT,
+                                   highlightthickness=1, highlightbackground="border",
+                                   highlightcolor="accent")
         self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, ipady=4)
 
         # Difficulty filter
-        filter_frame = tk.Frame(self.top, bg=C["bg"])
+        filter_frame = Frame(self.top, bg="bg")
         filter_frame.pack(fill=tk.X, padx=16, pady=(4, 8))
-        tk.Label(filter_frame, text="FILTER", bg=C["bg"], fg=C["text_faint"],
-                 font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 8))
+        Label(filter_frame, text="FILTER", bg="bg", fg="text_faint",
+              font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 8))
         self.filter_var = tk.StringVar(value="All")
-        for val, label, color in [("All", "All", C["text_dim"]), ("Hard", "Hard", C["red"]),
-                                   ("Normal", "OK", C["text_dim"]), ("Easy", "Easy", C["green"])]:
-            rb = tk.Radiobutton(filter_frame, text=label, variable=self.filter_var,
-                                value=val, bg=C["bg"], fg=color, selectcolor=C["surface"],
-                                activebackground=C["bg"], activeforeground=color,
-                                font=F["ui_small"], command=self._apply_filter,
-                                indicatoron=0, padx=10, pady=3, bd=0,
-                                highlightthickness=0, relief=tk.FLAT)
+        for val, label, color in [("All", "All", "text_dim"), ("Hard", "Hard", "red"),
+                                   ("Normal", "OK", "text_dim"), ("Easy", "Easy", "green")]:
+            rb = Radiobutton(filter_frame, text=label, variable=self.filter_var,
+                             value=val, bg="bg", fg=color, selectcolor="surface",
+                             activebackground="bg", activeforeground=color,
+                             font=F["ui_small"], command=self._apply_filter,
+                             indicatoron=0, padx=10, pady=3, bd=0,
+                             highlightthickness=0, relief=tk.FLAT)
             rb.pack(side=tk.LEFT, padx=(0, 4))
 
         # Results count
-        self.results_lbl = tk.Label(self.top, text="", bg=C["bg"], fg=C["text_faint"],
-                                     font=F["ui_tiny"])
+        self.results_lbl = Label(self.top, text="", bg="bg", fg="text_faint",
+                                  font=F["ui_tiny"])
         self.results_lbl.pack(anchor="w", padx=16, pady=(0, 4))
 
-        # Results text area
-        self.txt = scrolledtext.ScrolledText(self.top, bg=C["surface"], fg=C["text"],
-                                              font=F["mono"], relief=tk.FLAT,
-                                              padx=14, pady=14, wrap=tk.WORD)
-        self.txt.pack(fill=tk.BOTH, expand=True, padx=16, pady=(0, 16))
-        self.txt.tag_config("meta", foreground=C["text_faint"])
-        self.txt.tag_config("grammar", foreground=C["accent"], font=pick_font(UI_FONT, 10, "bold"))
-        self.txt.tag_config("sentence", foreground=C["text"])
-        self.txt.tag_config("hard", foreground=C["red"])
-        self.txt.tag_config("easy", foreground=C["green"])
-        self.txt.tag_config("normal", foreground=C["text_dim"])
-
+        # Results list (virtualised)
+        self.mono = tkfont.Font(font=F["mono"])
+        self.line_h = self.mono.metrics("linespace")
+        self.meta_w = self.mono.measure("0000-00-00 00:00  ")
+        self.indent = self.mono.measure("  ")
+        self.diff_colors = {"Hard": "red", "Easy": "green", "Normal": "text_dim"}
+        self.results_list = VirtualList(self.top, self.line_h * 4 + 8, self._make_row, self._fill_row,
+                                bg="surface")
+        self.results_list.pack(fill=tk.BOTH, expand=True, padx=16, pady=(0, 16))
+
+        self.top.bind("<Destroy>", self._on_destroy)
         self._apply_filter()
         self.search_entry.focus_set()
 
-    def _apply_filter(self):
-        query = self.search_var.get().strip().lower()
-        diff_filter = self.filter_var.get()
-        self.filtered = []
-        for item in self.history:
-            if diff_filter != "All" and item.get("difficulty", "Normal") != diff_filter:
-                continue
-            if query:
-                searchable = f"{item.get('date', '')} {item.get('grammar', '')} {item.get('sentence', '')} {item.get('difficulty', '')}".lower()
-                if query not in searchable:
-                    continue
-            self.filtered.append(item)
-        self._render()
-
-    def _render(self):
-        self.txt.config(state=tk.NORMAL)
-        self.txt.delete("1.0", tk.END)
-        self.results_lbl.config(text=f"{len(self.filtered)} of {len(self.history)} entries")
-        if not self.filtered:
-            self.txt.insert(tk.END, "No matching entries found.", "meta")
+    def set_history(self, history):
+        """Swap in the fully loaded history, keeping the query and scroll position."""
+        if not self.top.winfo_exists():
+            return
+        self.history = history
+        self.result = None
+        self._apply_filter(keep_offset=True)
+
+    @PROFILER.timed
+    def _apply_filter(self, keep_offset=False):
+        self._cancel_fetch()
+        self.result = self.history.search(self.search_var.get(), self.filter_var.get(), self.result)
+        if not self._complete():
+            self.result.fetch(self._wanted())
+        self._render(keep_offset)
+
+    @PROFILER.timed
+    def _render(self, keep_offset=False):
+        if self._complete():
+            self.results_lbl.config(text=f"{len(self.result)} of {len(self.history)} entries")
+            empty = "No matching entries found."
         else:
-            for item in self.filtered[:500]:
-                diff = item.get("difficulty", "Normal")
-                diff_tag = diff.lower()
-                self.txt.insert(tk.END, f"{item.get('date', '?')}  ", "meta")
-                self.txt.insert(tk.END, f"[{diff}]\n", diff_tag)
-                self.txt.insert(tk.END, f"  {item.get('grammar', '?')}\n", "grammar")
-                self.txt.insert(tk.END, f"  {item.get('sentence', '')}\n\n", "sentence")
-        self.txt.config(state=tk.DISABLED)
+            self.results_lbl.config(text=f"{len(self.result)} of {len(self.history)}+ entries"
+                                         "  (older entries load as you scroll)")
+            empty = "Searching older entries..."
+            if len(self.result) < self._wanted():
+                self._schedule_fetch()
+        self.results_list.set_count(len(self.result), empty, keep_offset)
+
+    # A LogTail result grows as the journal is read further back.
+
+    def _complete(self):
+        return getattr(self.result, "complete", True)
+
+    def _wanted(self):
+        view = self.results_list.offset + 3 * max(self.results_list.canvas.winfo_height(), 600)
+        return view // self.results_list.row_h + 1
+
+    def _schedule_fetch(self):
+        if self._fetch_job is None:
+            self._fetch_job = self.top.after(1, self._fetch_more)
+
+    def _cancel_fetch(self):
+        if self._fetch_job is not None:
+            self.top.after_cancel(self._fetch_job)
+            self._fetch_job = None
+
+    def _fetch_more(self):
+        self._fetch_job = None
+        if self._complete():
+            return
+        self.result.fetch(self._wanted())
+        self._render(keep_offset=True)
+
+    def _on_destroy(self, event):
+        if event.widget is self.top:
+            self._cancel_fetch()
+
+    def _make_row(self, canvas):
+        return {
+            "meta": canvas.create_text(0, 0, anchor="nw", fill="text_faint", font=F["mono"]),
+            "diff": canvas.create_text(0, 0, anchor="nw", font=F["mono"]),
+            "grammar": canvas.create_text(0, 0, anchor="nw", fill="accent",
+                                          font=pick_font(UI_FONT, 10, "bold")),
+            "sentence": canvas.create_text(0, 0, anchor="nw", fill="text", font=F["mono"]),
+        }
+
+    def _fill_row(self, canvas, row, index, y, width):
+        if index >= len(self.result) - 5 and not self._complete():
+            self._schedule_fetch()
+        item = self.result.item(index)
+        diff = item.get("difficulty", "Normal")
+        y += 8
+        canvas.coords(row["meta"], 14, y)
+        canvas.itemconfig(row["meta"], text=item.get("date", "?"))
+        canvas.coords(row["diff"], 14 + self.meta_w, y)
+        canvas.itemconfig(row["diff"], text=f"[{diff}]",
+                          fill=self.diff_colors.get(diff, "text_dim"))
+        canvas.coords(row["grammar"], 14 + self.indent, y + self.line_h)
+        canvas.itemconfig(row["grammar"], text=item.get("grammar", "?"))
+        canvas.coords(row["sentence"], 14 + self.indent, y + self.line_h * 2)
+        canvas.itemconfig(row["sentence"], text=self._elide(item.get("sentence", ""), width - 40))
+
+    def _elide(self, text, max_w):
+        text = " ".join(text.split("\n"))
+        if self.mono.measure(text) <= max_w:
+            return text
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.mono.measure(text[:mid] + "...") <= max_w:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + "..."
+
+
+# ─────────────────────────────────────────────────────────────
+# Timings Window
+# ─────────────────────────────────────────────────────────────
+
+class ProfilerWindow:
+    """F12 under --profile: latest timings of the hot paths, refreshed while open.
+
+    `profile next call` arms a cProfile dump of the chosen action; `save
+    report` writes the timings to a JSON file to attach to a bug report.
+    """
+
+    REFRESH_MS = 500
+    SLOW_MS = 50
+
+    def __init__(self, parent_root, profiler, app_info):
+        self.profiler = profiler
+        self.app_info = app_info
+        self._job = None
+        self.dumps_seen = len(profiler.dumps)
+        self.top = Toplevel(parent_root)
+        self.top.title("Timings")
+        self.top.geometry("700x340")
+        self.top.configure(bg="bg")
+        self.top.bind("<Destroy>", self._on_destroy)
+        self._build()
+        self._refresh()
+
+    def _build(self):
+        Label(self.top, text=f"TIMINGS (ms, last {self.profiler.SAMPLES} calls)", bg="bg",
+              fg="text_faint", font=F["ui_tiny"]).pack(anchor="w", padx=16, pady=(14, 4))
+        self.table = Label(self.top, text="", bg="surface", fg="text", font=F["mono"],
+                           justify=tk.LEFT, anchor="nw", padx=10, pady=8)
+        self.table.pack(fill=tk.BOTH, expand=True, padx=16)
+        self.latest = Label(self.top, text="", bg="bg", fg="text_dim", font=F["ui_small"])
+        self.latest.pack(anchor="w", padx=16, pady=(6, 0))
+
+        row = Frame(self.top, bg="bg")
+        row.pack(fill=tk.X, padx=16, pady=(8, 14))
+        labels = list(self.profiler.samples)
+        self.action_var = tk.StringVar(value=labels[0])
+        menu = OptionMenu(row, self.action_var, *labels)
+        menu.config(bg="surface2", fg="text", font=F["ui_small"], highlightthickness=0, bd=0,
+                    activebackground="surface2", activeforeground="text", relief=tk.FLAT, padx=8)
+        themed(menu["menu"], bg="surface", fg="text",
+               activebackground="accent_dim", activeforeground="text")
+        menu.pack(side=tk.LEFT)
+        FlatButton(row, "Profile next call", self._arm, fg="text_dim",
+                   btn_width=130, btn_height=28).pack(side=tk.LEFT, padx=8)
+        FlatButton(row, "Save report", self._save, fg="text_dim",
+                   btn_width=100, btn_height=28).pack(side=tk.RIGHT)
+        self.status = Label(self.top, text="", bg="bg", fg="text_faint", font=F["ui_tiny"])
+        self.status.pack(anchor="w", padx=16, pady=(0, 10))
+
+    def _refresh(self):
+        self._job = None
+        self.table.config(text=self.profiler.format_summary())
+        if self.profiler.latest is not None:
+            label, ms = self.profiler.latest
+            self.latest.config(text=f"latest: {label}  {ms:.1f} ms",
+                               fg="red" if ms > self.SLOW_MS else "text_dim")
+        if len(self.profiler.dumps) > self.dumps_seen:
+            self.dumps_seen = len(self.profiler.dumps)
+            self.status.config(text=f"Profile saved to {self.profiler.dumps[-1]}", fg="text_faint")
+        self._job = self.top.after(self.REFRESH_MS, self._refresh)
+
+    def _arm(self):
+        self.profiler.arm(self.action_var.get())
+        self.status.config(text=f"Waiting for the next {self.action_var.get()}...", fg="text_faint")
+
+    def _save(self):
+        try:
+            path = self.profiler.report(self.app_info())
+        except OSError as e:
+            self.status.config(text=f"Could not save the report: {e}", fg="red")
+            return
+        dumps = len(self.profiler.dumps)
+        self.status.config(text=f"Saved {path}" + (f" ({dumps} profile dumps alongside)" if dumps else ""),
+                           fg="text_faint")
+
+    def _on_destroy(self, event):
+        if event.widget is self.top and self._job is not None:
+            self.top.after_cancel(self._job)
+            self._job = None
 
 
 # ─────────────────────────────────────────────────────────────
@@ -793,39 +1614,65 @@ class HistoryWindow:
 
 class GrammarDrillApp:
     def __init__(self, root):
+        TIMER.mark("tk ready")
         self.root = root
         self.root.title("Grammar Drill")
         self.root.geometry("680x780")
-        self.root.configure(bg=C["bg"])
+        themed(self.root, bg="bg")
         self.root.minsize(500, 600)
-        self.grammar_list = []
+        self.session = None
         self.current_cards = []
         self.card_widgets = []
+        self.empty_state = None
         self.weights = {}
-        self.history = []
+        self.history = None
+        self.waiting_windows = []  # History windows on a LogTail until the load lands
+        self.stats_window = None
+        self.profiler_window = None
+        self.stats = None
+        self.stats_changed = False
+        # The Stats worker copies self.stats under this lock; reviews rated meanwhile wait here.
+        self.stats_lock = threading.Lock()
+        self.stats_backlog = []
+        self.dirty_weights = {}
+        self.unsaved_reviews = []
+        self.pending_entries = []
         self.card_count = 1
         self.current_theme = "Wabi-sabi Dark"
+        self.storage_kind = "json"
         self._ensure_dirs()
         self._load_settings()
+        TIMER.mark("settings")
+        self.levels = LevelCache()
+        self.store = open_store(self.storage_kind)
+        self.saver = SaveWorker(self.store)
+        self.saver.start()
+        TIMER.mark("store open")
         self._load_data()
-        self.is_first_time = not os.path.exists(PROGRESS_FILE)
+        TIMER.mark("weights")
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        if PROFILER.enabled:
+            self.root.bind_all("<F12>", lambda e: self._show_profiler())
+        self.is_first_time = self.store.is_new()
         if self.is_first_time:
             self._show_onboarding()
         else:
             self._build_main_ui()
+        TIMER.mark("ui built")
+        self.root.after_idle(self._first_frame)
 
     # ── Onboarding ────────────────────────────────────────
 
     def _show_onboarding(self):
-        self.onboard_frame = tk.Frame(self.root, bg=C["bg"])
+        self.onboard_frame = Frame(self.root, bg="bg")
         self.onboard_frame.pack(fill=tk.BOTH, expand=True)
-        center = tk.Frame(self.onboard_frame, bg=C["bg"])
+        center = Frame(self.onboard_frame, bg="bg")
         center.place(relx=0.5, rely=0.5, anchor="center")
-        tk.Label(center, text="Grammar Drill", bg=C["bg"], fg=C["accent"],
-                 font=pick_font(JP_DISPLAY, 36, "bold")).pack(pady=(0, 4))
-        tk.Label(center, text="Spaced-repetition grammar practice", bg=C["bg"], fg=C["text_dim"],
-                 font=pick_font(UI_FONT, 12)).pack(pady=(0, 30))
-        card = tk.Frame(center, bg=C["surface"], padx=32, pady=24)
+        Label(center, text="Grammar Drill", bg="bg", fg="accent",
+              font=pick_font(JP_DISPLAY, 36, "bold")).pack(pady=(0, 4))
+        Label(center, text="Spaced-repetition grammar practice", bg="bg", fg="text_dim",
+              font=pick_font(UI_FONT, 12)).pack(pady=(0, 30))
+        card = Frame(center, bg="surface", padx=32, pady=24)
         card.pack(padx=40)
         instructions = [
             ("1. Load a level", "Place .txt files in the 'data/' folder.\nEach line: grammar_name ;; reference_url"),
@@ -834,39 +1681,38 @@ class GrammarDrillApp:
             ("4. Track progress", "Your ratings adjust future card weights.\nReview history and stats anytime."),
         ]
         for i, (title, desc) in enumerate(instructions):
-            row = tk.Frame(card, bg=C["surface"])
+            row = Frame(card, bg="surface")
             row.pack(fill=tk.X, pady=(0 if i == 0 else 12, 0), anchor="w")
-            tk.Label(row, text=title, bg=C["surface"], fg=C["accent"],
-                     font=F["ui_bold"], anchor="w").pack(anchor="w")
-            tk.Label(row, text=desc, bg=C["surface"], fg=C["text_dim"],
-                     font=F["ui_small"], anchor="w", justify=tk.LEFT).pack(anchor="w", padx=(16, 0))
-        tk.Label(center, text="Pick a theme to start:", bg=C["bg"],
-                 fg=C["text_dim"], font=F["ui_small"]).pack(pady=(24, 8))
-        theme_row = tk.Frame(center, bg=C["bg"])
+            Label(row, text=title, bg="surface", fg="accent",
+                  font=F["ui_bold"], anchor="w").pack(anchor="w")
+            Label(row, text=desc, bg="surface", fg="text_dim",
+                  font=F["ui_small"], anchor="w", justify=tk.LEFT).pack(anchor="w", padx=(16, 0))
+        Label(center, text="Pick a theme to start:", bg="bg",
+              fg="text_dim", font=F["ui_small"]).pack(pady=(24, 8))
+        theme_row = Frame(center, bg="bg")
         theme_row.pack()
         for tname, tcolors in THEMES.items():
-            swatch = tk.Frame(theme_row, bg=C["bg"], padx=4, pady=4)
+            swatch = Frame(theme_row, bg="bg", padx=4, pady=4)
             swatch.pack(side=tk.LEFT, padx=4)
-            dot_frame = tk.Frame(swatch, bg=C["bg"])
+            dot_frame = Frame(swatch, bg="bg")
             dot_frame.pack()
             for clr in [tcolors["bg"], tcolors["accent"], tcolors["surface"]]:
-                tk.Canvas(dot_frame, width=12, height=12, bg=clr,
-                          highlightthickness=1, highlightbackground=C["border"]).pack(side=tk.LEFT, padx=1)
-            lbl = tk.Label(swatch, text=tname.split()[0], bg=C["bg"],
-                           fg=C["text_dim"], font=F["ui_tiny"], cursor="hand2")
+                Canvas(dot_frame, width=12, height=12, bg=clr,
+                       highlightthickness=1, highlightbackground="border").pack(side=tk.LEFT, padx=1)
+            lbl = Label(swatch, text=tname.split()[0], bg="bg",
+                        fg="text_dim", font=F["ui_tiny"], cursor="hand2")
             lbl.pack(pady=(2, 0))
             lbl.bind("<Button-1>", lambda e, t=tname: self._preview_theme_onboard(t))
-            lbl.bind("<Enter>", lambda e, l=lbl: l.config(fg=C["accent"]))
-            lbl.bind("<Leave>", lambda e, l=lbl: l.config(fg=C["text_dim"]))
+            lbl.bind("<Enter>", lambda e, l=lbl: l.config(fg="accent"))
+            lbl.bind("<Leave>", lambda e, l=lbl: l.config(fg="text_dim"))
         self.btn_begin = FlatButton(center, "Let's Begin", self._finish_onboarding,
-                                     fg=C["bg"], bg=C["accent"], hover_bg=C["accent_dim"],
+                                     fg="bg", bg="accent", hover_bg="accent_dim",
                                      btn_width=220, btn_height=44, font=F["ui_bold"])
         self.btn_begin.pack(pady=(24, 0))
 
     def _preview_theme_onboard(self, theme_name):
         self._apply_theme(theme_name)
-        self.onboard_frame.destroy()
-        self._show_onboarding()
+        STYLES.recolor()
 
     def _finish_onboarding(self):
         self._save_data()
@@ -888,35 +1734,36 @@ class GrammarDrillApp:
                 with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
                     settings = json.load(f)
                     self._apply_theme(settings.get("theme", "Wabi-sabi Dark"))
+                    self.storage_kind = settings.get("storage", "json")
         except Exception:
             pass
 
     def _save_settings(self):
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump({"theme": self.current_theme}, f, indent=2)
+        self.saver.save_json(SETTINGS_FILE, {"theme": self.current_theme,
+                                             "storage": self.storage_kind}, indent=2)
 
     def _show_theme_picker(self):
-        top = tk.Toplevel(self.root)
+        top = Toplevel(self.root)
         top.title("Theme")
         top.geometry("320x420")
-        top.configure(bg=C["bg"])
+        top.configure(bg="bg")
         top.resizable(False, False)
-        tk.Label(top, text="Themes", bg=C["bg"], fg=C["accent"],
-                 font=pick_font(JP_DISPLAY, 14, "bold")).pack(pady=(16, 12))
+        Label(top, text="Themes", bg="bg", fg="accent",
+              font=pick_font(JP_DISPLAY, 14, "bold")).pack(pady=(16, 12))
         for tname, tcolors in THEMES.items():
-            row = tk.Frame(top, bg=C["surface"] if tname == self.current_theme else C["bg"],
-                           padx=12, pady=8, cursor="hand2")
+            row_bg = "surface" if tname == self.current_theme else "bg"
+            row = Frame(top, bg=row_bg, padx=12, pady=8, cursor="hand2")
             row.pack(fill=tk.X, padx=16, pady=2)
-            sf = tk.Frame(row, bg=row["bg"])
+            sf = Frame(row, bg=row_bg)
             sf.pack(side=tk.LEFT, padx=(0, 12))
             for clr in [tcolors["bg"], tcolors["surface"], tcolors["accent"], tcolors["text"]]:
-                tk.Canvas(sf, width=16, height=16, bg=clr, highlightthickness=1,
-                          highlightbackground=tcolors["border"]).pack(side=tk.LEFT, padx=1)
-            fg = C["accent"] if tname == self.current_theme else C["text"]
-            lbl = tk.Label(row, text=tname, bg=row["bg"], fg=fg, font=F["ui_bold"])
+                Canvas(sf, width=16, height=16, bg=clr, highlightthickness=1,
+                       highlightbackground=tcolors["border"]).pack(side=tk.LEFT, padx=1)
+            fg = "accent" if tname == self.current_theme else "text"
+            lbl = Label(row, text=tname, bg=row_bg, fg=fg, font=F["ui_bold"])
             lbl.pack(side=tk.LEFT)
             if tname == self.current_theme:
-                tk.Label(row, text="*", bg=row["bg"], fg=C["accent"], font=F["ui_bold"]).pack(side=tk.RIGHT)
+                Label(row, text="*", bg=row_bg, fg="accent", font=F["ui_bold"]).pack(side=tk.RIGHT)
             for widget in [row, lbl, sf]:
                 widget.bind("<Button-1>", lambda e, t=tname, w=top: self._select_theme(t, w))
 
@@ -924,13 +1771,8 @@ class GrammarDrillApp:
         self._apply_theme(theme_name)
         self._save_settings()
         dialog.destroy()
-        self._rebuild_ui()
-
-    def _rebuild_ui(self):
-        for w in self.root.winfo_children():
-            w.destroy()
-        self.root.configure(bg=C["bg"])
-        self._build_main_ui()
+        # Recolor the live widgets in place; the current round is left untouched.
+        STYLES.recolor()
 
     # ── Data ──────────────────────────────────────────────
 
@@ -938,114 +1780,172 @@ class GrammarDrillApp:
         os.makedirs(USER_DATA_FOLDER, exist_ok=True)
         os.makedirs(DATA_FOLDER, exist_ok=True)
 
+    @PROFILER.timed
     def _load_data(self):
+        # Weights load per level when it is drilled; history and stats when History or Stats opens.
         try:
-            if os.path.exists(PROGRESS_FILE):
-                with open(PROGRESS_FILE, 'r', encoding='utf-8') as f:
-                    self.weights = json.load(f)
+            self.store.migrate_progress(self.levels)
         except Exception:
-            self.weights = {}
-        try:
-            if os.path.exists(LOG_FILE):
-                with open(LOG_FILE, 'r', encoding='utf-8') as f:
-                    self.history = json.load(f)
-        except Exception:
-            self.history = []
+            traceback.print_exc(file=sys.stderr)
+        self.loader = HistoryLoader(self.store, self.saver)
+
+    def _first_frame(self):
+        self.root.update_idletasks()
+        TIMER.mark("first frame")
 
+    def _request_history(self):
+        if self.history is None and self.store.slow_history and self.loader.ident is None:
+            self.loader.start()
+            self.root.after(100, self._poll_history)
+
+    def _poll_history(self):
+        if self.history is not None:
+            return
+        if self.loader.done():
+            self._ensure_history()
+        else:
+            self.root.after(100, self._poll_history)
+
+    def _ensure_history(self):
+        # Waits for the background load; callers wait for loader.done() where they can.
+        if self.history is None:
+            self.history, stats = self.loader.result()
+            if stats is not None:
+                self.stats = stats
+            # Reviews rated before the load: the first `written` were on disk when it read the journal.
+            for entry in self.pending_entries[self.loader.written:]:
+                self.history.add(entry)
+            self._fold_stats(self.pending_entries[self.loader.written:])
+            self.pending_entries = []
+            TIMER.mark("history loaded")
+            for window in self.waiting_windows:
+                window.set_history(self.history)
+            self.waiting_windows = []
+        return self.history
+
+    def _fold_stats(self, entries, wait=False):
+        # Never blocks NEXT: while the Stats worker is copying, entries queue in the backlog.
+        if self.stats is None:
+            return
+        self.stats_backlog.extend(entries)
+        if not self.stats_lock.acquire(blocking=wait):
+            return
+        try:
+            for entry in self.stats_backlog:
+                self.stats.add(entry)
+            self.stats_changed = self.stats_changed or bool(self.stats_backlog)
+            self.stats_backlog = []
+        finally:
+            self.stats_lock.release()
+
+    @PROFILER.timed
     def _save_data(self):
-        with open(PROGRESS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.weights, f, indent=2)
-        with open(LOG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(self.history, f, indent=2, ensure_ascii=False)
+        # Hand changes to the writer thread; the UI never waits on disk.
+        # stats.json is left to _on_close: the journal alone is enough to catch it up.
+        changed = {level: {name: self.weights[level][name] for name in names}
+                   for level, names in self.dirty_weights.items() if names}
+        self.saver.submit(weights=changed, reviews=self.unsaved_reviews)
+        for names in self.dirty_weights.values():
+            names.clear()
+        self.unsaved_reviews = []
+
+    def _on_close(self):
+        self._fold_stats([], wait=True)
+        if self.stats_changed:
+            self.saver.submit(stats=self.stats.to_json())
+        self.saver.close()
+        if PROFILER.enabled:
+            print(PROFILER.format_summary(), file=sys.stderr)
+        self.root.destroy()
 
     # ── UI ────────────────────────────────────────────────
 
     def _build_main_ui(self):
         # Top bar
-        topbar = tk.Frame(self.root, bg=C["surface"], height=52)
+        topbar = Frame(self.root, bg="surface", height=52)
         topbar.pack(fill=tk.X)
         topbar.pack_propagate(False)
-        tk.Label(topbar, text="Grammar Drill", bg=C["surface"], fg=C["accent"],
-                 font=pick_font(JP_DISPLAY, 14, "bold")).pack(side=tk.LEFT, padx=16)
+        Label(topbar, text="Grammar Drill", bg="surface", fg="accent",
+              font=pick_font(JP_DISPLAY, 14, "bold")).pack(side=tk.LEFT, padx=16)
         self.btn_history = FlatButton(topbar, "History", self._show_history,
-                                       fg=C["text_dim"], bg=C["surface"], btn_width=80, btn_height=30)
+                                       fg="text_dim", bg="surface", btn_width=80, btn_height=30)
         self.btn_history.pack(side=tk.RIGHT, padx=(4, 12), pady=11)
         self.btn_stats = FlatButton(topbar, "Stats", self._show_stats,
-                                     fg=C["text_dim"], bg=C["surface"], btn_width=70, btn_height=30)
+                                     fg="text_dim", bg="surface", btn_width=70, btn_height=30)
         self.btn_stats.pack(side=tk.RIGHT, padx=(4, 0), pady=11)
         self.btn_theme = FlatButton(topbar, "Theme", self._show_theme_picker,
-                                     fg=C["text_dim"], bg=C["surface"], btn_width=70, btn_height=30)
+                                     fg="text_dim", bg="surface", btn_width=70, btn_height=30)
         self.btn_theme.pack(side=tk.RIGHT, padx=(4, 0), pady=11)
 
         # Bottom bar (pack BEFORE middle so always visible)
-        bottom = tk.Frame(self.root, bg=C["surface"])
+        bottom = Frame(self.root, bg="surface")
         bottom.pack(fill=tk.X, side=tk.BOTTOM)
-        tk.Frame(bottom, bg=C["border"], height=1).pack(fill=tk.X)
-        input_area = tk.Frame(bottom, bg=C["surface"])
+        Frame(bottom, bg="border", height=1).pack(fill=tk.X)
+        input_area = Frame(bottom, bg="surface")
         input_area.pack(fill=tk.X, padx=16, pady=12)
-        tk.Label(input_area, text="YOUR SENTENCE", bg=C["surface"], fg=C["text_dim"],
-                 font=F["ui_tiny"]).pack(anchor="w", pady=(0, 4))
-        input_row = tk.Frame(input_area, bg=C["surface"])
+        Label(input_area, text="YOUR SENTENCE", bg="surface", fg="text_dim",
+              font=F["ui_tiny"]).pack(anchor="w", pady=(0, 4))
+        input_row = Frame(input_area, bg="surface")
         input_row.pack(fill=tk.X)
         self.btn_next = FlatButton(input_row, "NEXT >>", self._next_round,
-                                    fg=C["bg"], bg=C["accent"], hover_bg=C["accent_dim"],
+                                    fg="bg", bg="accent", hover_bg="accent_dim",
                                     btn_width=90, btn_height=40)
         self.btn_next.pack(side=tk.RIGHT, padx=(10, 0))
         self.btn_next.set_disabled(True)
-        self.txt_input = tk.Text(input_row, height=3, bg=C["input_bg"], fg=C["text"],
-                                  insertbackground=C["accent"], relief=tk.FLAT,
-                                  font=F["jp_input"], padx=12, pady=10,
-                                  wrap=tk.WORD, state=tk.DISABLED)
+        self.txt_input = Text(input_row, height=3, bg="input_bg", fg="text",
+                               insertbackground="accent", relief=tk.FLAT,
+                               font=F["jp_input"], padx=12, pady=10,
+                               wrap=tk.WORD, state=tk.DISABLED)
         self.txt_input.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
         # Control strip
-        ctrl = tk.Frame(self.root, bg=C["bg"])
+        ctrl = Frame(self.root, bg="bg")
         ctrl.pack(fill=tk.X, padx=20, pady=(16, 0))
-        tk.Label(ctrl, text="LEVEL", bg=C["bg"], fg=C["text_dim"], font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 6))
+        Label(ctrl, text="LEVEL", bg="bg", fg="text_dim", font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 6))
         self.level_var = tk.StringVar(value="--")
-        self.level_menu = tk.OptionMenu(ctrl, self.level_var, "--")
-        self.level_menu.config(bg=C["surface2"], fg=C["text"], font=F["ui"],
-                                highlightthickness=0, bd=0, activebackground=C["surface2"],
-                                activeforeground=C["text"], relief=tk.FLAT, padx=8)
-        self.level_menu["menu"].config(bg=C["surface"], fg=C["text"],
-                                        activebackground=C["accent_dim"],
-                                        activeforeground=C["text"], font=F["ui"])
+        self.level_menu = OptionMenu(ctrl, self.level_var, "--")
+        self.level_menu.config(bg="surface2", fg="text", font=F["ui"],
+                                highlightthickness=0, bd=0, activebackground="surface2",
+                                activeforeground="text", relief=tk.FLAT, padx=8)
+        themed(self.level_menu["menu"], bg="surface", fg="text",
+               activebackground="accent_dim", activeforeground="text")
+        self.level_menu["menu"].config(font=F["ui"])
         self.level_menu.pack(side=tk.LEFT, padx=(0, 16))
-        tk.Label(ctrl, text="POINTS", bg=C["bg"], fg=C["text_dim"],
-                 font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 6))
+        Label(ctrl, text="POINTS", bg="bg", fg="text_dim",
+              font=F["ui_tiny"]).pack(side=tk.LEFT, padx=(0, 6))
         self.count_var = tk.StringVar(value="1")
-        count_frame = tk.Frame(ctrl, bg=C["surface2"])
+        count_frame = Frame(ctrl, bg="surface2")
         count_frame.pack(side=tk.LEFT, padx=(0, 16))
-        minus_btn = tk.Label(count_frame, text="-", bg=C["surface2"], fg=C["text_dim"],
-                             font=F["ui_bold"], padx=8, pady=2, cursor="hand2")
+        minus_btn = Label(count_frame, text="-", bg="surface2", fg="text_dim",
+                          font=F["ui_bold"], padx=8, pady=2, cursor="hand2")
         minus_btn.pack(side=tk.LEFT)
         minus_btn.bind("<Button-1>", lambda e: self._adjust_count(-1))
-        self.count_label = tk.Label(count_frame, textvariable=self.count_var,
-                                     bg=C["surface2"], fg=C["accent"], font=F["ui_bold"],
-                                     width=2, anchor="center")
+        self.count_label = Label(count_frame, textvariable=self.count_var,
+                                  bg="surface2", fg="accent", font=F["ui_bold"],
+                                  width=2, anchor="center")
         self.count_label.pack(side=tk.LEFT, padx=2)
-        plus_btn = tk.Label(count_frame, text="+", bg=C["surface2"], fg=C["text_dim"],
-                            font=F["ui_bold"], padx=8, pady=2, cursor="hand2")
+        plus_btn = Label(count_frame, text="+", bg="surface2", fg="text_dim",
+                         font=F["ui_bold"], padx=8, pady=2, cursor="hand2")
         plus_btn.pack(side=tk.LEFT)
         plus_btn.bind("<Button-1>", lambda e: self._adjust_count(1))
         self.btn_start = FlatButton(ctrl, ">> START", self._start_session,
-                                     fg=C["bg"], bg=C["accent"], hover_bg=C["accent_dim"],
+                                     fg="bg", bg="accent", hover_bg="accent_dim",
                                      btn_width=120, btn_height=32)
         self.btn_start.pack(side=tk.LEFT, padx=(0, 6))
-        self.lbl_stats = tk.Label(ctrl, text="", bg=C["bg"], fg=C["text_faint"], font=F["ui_tiny"])
+        self.lbl_stats = Label(ctrl, text="", bg="bg", fg="text_faint", font=F["ui_tiny"])
         self.lbl_stats.pack(side=tk.RIGHT)
 
         # Separator
-        tk.Frame(self.root, bg=C["border"], height=1).pack(fill=tk.X, padx=20, pady=(14, 0))
+        Frame(self.root, bg="border", height=1).pack(fill=tk.X, padx=20, pady=(14, 0))
 
         # Scrollable card area
-        self.canvas = tk.Canvas(self.root, bg=C["bg"], highlightthickness=0)
-        self.scrollbar = tk.Scrollbar(self.root, orient="vertical", command=self.canvas.yview,
-                                       bg=C["surface"], troughcolor=C["bg"])
+        self.canvas = Canvas(self.root, bg="bg", highlightthickness=0)
+        self.scrollbar = Scrollbar(self.root, orient="vertical", command=self.canvas.yview,
+                                    bg="surface", troughcolor="bg")
         self.canvas.configure(yscrollcommand=self.scrollbar.set)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=(14, 0))
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(20, 0), pady=(14, 0))
-        self.scroll_frame = tk.Frame(self.canvas, bg=C["bg"])
+        self.scroll_frame = Frame(self.canvas, bg="bg")
         self.canvas_window = self.canvas.create_window((0, 0), window=self.scroll_frame, anchor="nw")
         self.scroll_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
         self.canvas.bind("<Configure>", lambda e: self.canvas.itemconfig(self.canvas_window, width=e.width))
@@ -1056,25 +1956,28 @@ class GrammarDrillApp:
     def _show_empty_state(self):
         for w in self.scroll_frame.winfo_children():
             w.destroy()
-        empty = tk.Frame(self.scroll_frame, bg=C["bg"])
+        self.card_widgets = []
+        empty = self.empty_state = Frame(self.scroll_frame, bg="bg")
         empty.pack(fill=tk.BOTH, expand=True, pady=80)
-        tk.Label(empty, text="文", bg=C["bg"], fg=C["text_faint"],
-                 font=pick_font(JP_DISPLAY, 48, "bold")).pack()
-        tk.Label(empty, text="Select a level and press START", bg=C["bg"],
-                 fg=C["text_faint"], font=F["ui"]).pack(pady=(10, 0))
+        Label(empty, text="文", bg="bg", fg="text_faint",
+              font=pick_font(JP_DISPLAY, 48, "bold")).pack()
+        Label(empty, text="Select a level and press START", bg="bg",
+              fg="text_faint", font=F["ui"]).pack(pady=(10, 0))
 
     def _adjust_count(self, delta):
         curr = int(self.count_var.get())
         self.count_var.set(str(max(1, min(5, curr + delta))))
 
     def _scan_levels(self):
-        files = glob.glob(os.path.join(DATA_FOLDER, "*.txt"))
-        levels = sorted([os.path.basename(f).replace(".txt", "") for f in files])
+        levels = self.levels.scan()
+        if self.levels.dirty:
+            self.saver.save_json(LEVEL_CACHE_FILE, self.levels.to_json())
         menu = self.level_menu["menu"]
         menu.delete(0, "end")
         if levels:
             for lvl in levels:
-                menu.add_command(label=lvl, command=lambda v=lvl: self.level_var.set(v))
+                menu.add_command(label=f"{lvl}  ({self.levels.count(lvl)})",
+                                 command=lambda v=lvl: self.level_var.set(v))
             self.level_var.set(levels[0])
         else:
             self.level_var.set("No data files")
@@ -1088,51 +1991,51 @@ class GrammarDrillApp:
         if not os.path.exists(path) or level == "--":
             messagebox.showwarning("Setup", "Select a valid level first.")
             return
-        self.grammar_list = []
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if ";;" in line:
-                        parts = [p.strip() for p in line.split(";;")]
-                        if len(parts) >= 2 and parts[0] and parts[1]:
-                            self.grammar_list.append({"name": parts[0], "url": parts[1]})
+            points = self.levels.points(level)
+            index = self.levels.index(level)
         except Exception as e:
+            self.session = None
             messagebox.showerror("Error", f"Could not load: {e}")
             return
-        if not self.grammar_list:
+        if self.levels.dirty:
+            self.saver.save_json(LEVEL_CACHE_FILE, self.levels.to_json())
+        if not points:
+            self.session = None
             messagebox.showerror("Error", "No grammar points found in file.\nFormat: name ;; url")
             return
-        for g in self.grammar_list:
-            if g["name"] not in self.weights:
-                self.weights[g["name"]] = DEFAULT_WEIGHT
-        self.lbl_stats.config(text=f"{len(self.grammar_list)} grammar points loaded")
+        if level not in self.weights:
+            self.weights[level] = self.store.load_weights(level)
+        self.session = DrillSession(points, index, self.weights[level],
+                                    self.dirty_weights.setdefault(level, set()))
+        self.lbl_stats.config(text=f"{len(points)} grammar points loaded")
         self.txt_input.config(state=tk.NORMAL)
         self._deal_cards()
 
+    @PROFILER.timed
     def _deal_cards(self):
-        if not self.grammar_list:
+        if not self.session:
             return
-        n = min(int(self.count_var.get()), len(self.grammar_list))
-        pool = list(self.grammar_list)
-        weights = [self.weights.get(g["name"], DEFAULT_WEIGHT) for g in pool]
-        chosen = []
-        for _ in range(n):
-            if not pool:
-                break
-            pick = random.choices(range(len(pool)), weights=weights, k=1)[0]
-            chosen.append(pool[pick])
-            pool.pop(pick)
-            weights.pop(pick)
+        n = min(int(self.count_var.get()), len(self.session))
+        chosen = self.session.deal(n)
         self.current_cards = chosen
         self.pending_ratings = {}
-        for w in self.scroll_frame.winfo_children():
-            w.destroy()
-        self.card_widgets = []
+        if self.empty_state is not None:
+            self.empty_state.destroy()
+            self.empty_state = None
+        # Cards are pooled: a new round rebinds them, only a POINTS change adds or drops some.
+        pool = self.card_widgets
+        for card in pool[n:]:
+            card.destroy()
+        del pool[n:]
         for i, g in enumerate(chosen, 1):
-            card = GrammarCard(self.scroll_frame, g, i, n, self._on_card_rated, self)
-            card.pack(fill=tk.X, padx=4, pady=(0, 8))
-            self.card_widgets.append(card)
+            if i <= len(pool):
+                pool[i - 1].reset(g, i, n)
+            else:
+                card = GrammarCard(self.scroll_frame, g, i, n, self._on_card_rated, self)
+                card.pack(fill=tk.X, padx=4, pady=(0, 8))
+                pool.append(card)
+        TIMER.mark("first cards", once=True)
         self.txt_input.delete("1.0", tk.END)
         self.txt_input.focus_set()
         self.btn_next.set_disabled(True)
@@ -1143,11 +2046,12 @@ class GrammarDrillApp:
         if len(self.pending_ratings) == len(self.current_cards):
             self.btn_next.set_disabled(False)
 
+    @PROFILER.timed
     def _next_round(self):
         sentence = self.txt_input.get("1.0", tk.END).strip()
         if not sentence:
             self.root.bell()
-            self.txt_input.config(highlightbackground=C["red"], highlightthickness=1)
+            self.txt_input.config(highlightbackground="red", highlightthickness=1)
             self.root.after(600, lambda: self.txt_input.config(highlightthickness=0))
             return
         if len(self.pending_ratings) < len(self.current_cards):
@@ -1156,28 +2060,98 @@ class GrammarDrillApp:
         for g in self.current_cards:
             name = g["name"]
             diff = self.pending_ratings.get(name, "Normal")
-            w = self.weights.get(name, DEFAULT_WEIGHT)
-            if diff == "Hard":
-                w = min(w * 1.5, 500)
-            elif diff == "Easy":
-                w = max(w * 0.6, 10)
-            self.weights[name] = w
-            self.history.insert(0, {
-                "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-                "grammar": name,
-                "sentence": sentence,
-                "difficulty": diff,
-            })
+            self.session.rate(name, diff)
+            entry = make_entry(name, sentence, diff)
+            if self.history is None:
+                # Saving needs only the journal; the history catches up when it loads.
+                self.pending_entries.append(entry)
+            else:
+                self.history.add(entry)
+                self._fold_stats([entry])
+            self.unsaved_reviews.append(entry)
         self._save_data()
         self._deal_cards()
 
     # ── History & Stats ───────────────────────────────────
 
     def _show_history(self):
-        HistoryWindow(self.root, self.history)
+        if self.store.kind == "sqlite":
+            self.saver.flush()
+        if self.history is None and self.store.slow_history and self.loader.ident is None:
+            # The journal tail below should hold this session's reviews too.
+            self.saver.flush()
+            self._request_history()
+        if self.history is None and self.store.slow_history and not self.loader.done():
+            # Show the newest entries straight from the journal until the full load lands.
+            self.waiting_windows.append(HistoryWindow(self.root, LogTail(self.store.study_log)))
+        else:
+            HistoryWindow(self.root, self._ensure_history())
 
     def _show_stats(self):
-        StatsWindow(self.root, self.history, self.weights)
+        # Reopening refreshes the open window, so its charts are updated rather than rebuilt.
+        if self.stats_window is not None and self.stats_window.top.winfo_exists():
+            self.stats_window.refresh(self._all_weights())
+            self.stats_window.top.lift()
+        else:
+            self.stats_window = StatsWindow(self.root, self._stats_source, self._all_weights())
+
+    def _all_weights(self):
+        # Stats cover every level with progress, not only the ones drilled this run.
+        for level in self.store.progress_levels():
+            if level not in self.weights:
+                self.weights[level] = self.store.load_weights(level)
+        # Review stats are keyed by name, so a name listed in several levels is one
+        # point here, at its worst weight: mastered only once it is mastered everywhere.
+        worst = {}
+        for shard in self.weights.values():
+            for name, weight in shard.items():
+                if weight > worst.get(name, weight - 1):
+                    worst[name] = weight
+        return list(worst.items())
+
+    def _stats_source(self):
+        # Called by the Stats window on the UI thread; the returned loader runs on its worker.
+        if self.history is None and self.store.slow_history and not self.loader.done():
+            self._request_history()
+            return None
+        self._ensure_history()
+        if self.stats is not None:
+            self._fold_stats([])
+            return self._copy_stats
+        return self._query_stats
+
+    def _copy_stats(self):
+        # Stats worker: copying is proportional to the history, so it is done here, not on Tk.
+        with self.stats_lock:
+            data = self.stats.to_json()
+            backlog = list(self.stats_backlog)
+        stats = StatsIndex.from_json(data)
+        for entry in backlog:
+            stats.add(entry)
+        return stats
+
+    def _query_stats(self):
+        # Stats worker, SQLite: wait for queued reviews, then aggregate over a private connection.
+        self.saver.flush()
+        return self.store.load_stats(own_connection=True)
+
+    # ── Profiling ─────────────────────────────────────────
+
+    def _show_profiler(self):
+        if self.profiler_window is not None and self.profiler_window.top.winfo_exists():
+            self.profiler_window.top.lift()
+        else:
+            self.profiler_window = ProfilerWindow(self.root, PROFILER, self._profile_info)
+
+    def _profile_info(self):
+        # What a bug report needs to make sense of the timings.
+        return {
+            "storage": self.store.kind,
+            "theme": self.current_theme,
+            "levels_loaded": {level: len(shard) for level, shard in self.weights.items()},
+            "history": len(self.history) if self.history is not None else None,
+            "level_files": {level: self.levels.count(level) for level in self.levels.levels},
+        }
 
 
 # ─────────────────────────────────────────────────────────────
@@ -1192,4 +2166,5 @@ if __name__ == "__main__":
     except Exception:
         pass
     app = GrammarDrillApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.saver.close()
\ No newline at end of file
@@ -0,0 +1,384 @@
+"""Local drill service: python server.py [--host 127.0.0.1] [--port 8765]
+
+Serves many learners from one process over HTTP + JSON. The level files are
+loaded once and shared; each learner keeps their weights, deck and review
+queue in memory behind their own lock, and their files in
+user_data/users/<name>/ (the same progress/ + log/ + stats.json layout
+the desktop app uses). Dealing and rating follow the app's rules exactly.
+
+    GET  /levels                                      level names and sizes
+    POST /deal   {"user", "level", "points"}          deal a round
+    POST /rate   {"user", "sentence", "ratings"}      rate it, deal the next
+    GET  /stats?user=<name>                           totals and streaks
+
+Writes are batched: one flusher thread saves each learner's changed weights
+and new reviews every --flush seconds, and everything on shutdown.
+"""
+import argparse
+import json
+import os
+import re
+import signal
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from storage import (DATA_FOLDER, USER_DATA_FOLDER, JsonStore, LevelCache,
+                     atomic_write_json)
+from drill import DrillSession, make_entry, mastery
+
+USER_NAME = re.compile(r"[A-Za-z0-9_-]{1,32}")
+DIFFICULTIES = ("Easy", "Normal", "Hard")
+MAX_POINTS = 5
+MAX_BODY = 64 * 1024
+FLUSH_SECONDS = 2.0
+
+
+class ServiceError(Exception):
+    """Turned into a JSON error response with `status`."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ─────────────────────────────────────────────────────────────
+# Learners
+# ─────────────────────────────────────────────────────────────
+
+class Learner:
+    """One user's weights, decks, open round and unsaved reviews.
+
+    `lock` guards the in-memory state and is only held for quick updates;
+    `io_lock` serialises this learner's file writes, so saving never blocks
+    their next round.
+    """
+
+    def __init__(self, name, folder, cache):
+        self.name = name
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.store = JsonStore(folder=folder)
+        self.store.migrate_progress(cache)
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.sessions = {}
+        self.dirty = {}
+        self.pending = []
+        self.round = None
+        self.stats = None
+
+    def session(self, level, points, index):
+        # Called with `lock` held; a level's weights shard is read the first time it is dealt.
+        session = self.sessions.get(level)
+        if session is None:
+            weights = self.store.load_weights(level)
+            dirty = self.dirty[level] = set()
+            session = self.sessions[level] = DrillSession(points, index, weights, dirty)
+        return session
+
+    def _take_batch(self):
+        with self.lock:
+            weights = {level: {name: self.sessions[level].weights[name] for name in names}
+                       for level, names in self.dirty.items() if names}
+            if not weights and not self.pending:
+                return None
+            batch = {"weights": weights, "reviews": self.pending, "stats": None}
+            for names in self.dirty.values():
+                names.clear()
+            self.pending = []
+        return batch
+
+    def flush(self, final=False):
+        """Save whatever changed since the last flush; True if anything was written."""
+        with self.io_lock:
+            batch = self._take_batch()
+            if final and self.stats is not None:
+                batch = batch or {"weights": None, "reviews": [], "stats": None}
+                with self.lock:
+                    batch["stats"] = self.stats.to_json()
+            if batch is None:
+                return False
+            try:
+                self.store.write(batch)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+                self._requeue(batch)
+                return False
+            return True
+
+    def _requeue(self, batch):
+        # JsonStore.write clears each part once it is on disk; put back the rest.
+        with self.lock:
+            for level, shard in (batch["weights"] or {}).items():
+                self.dirty[level].update(shard)
+            self.pending[:0] = batch["reviews"]
+
+    def load_stats(self):
+        if self.stats is not None:
+            return self.stats
+        with self.io_lock:
+            if self.stats is None:
+                # Bring the journal up to date, then fold in what arrived while it loaded.
+                batch = self._take_batch()
+                if batch is not None:
+                    try:
+                        self.store.write(batch)
+                    except Exception:
+                        self._requeue(batch)
+                        raise
+                stats = self.store.load_stats(self.store.load_history())
+                with self.lock:
+                    for entry in self.pending:
+                        stats.add(entry)
+                    self.stats = stats
+        return self.stats
+
+
+# ─────────────────────────────────────────────────────────────
+# Service
+# ─────────────────────────────────────────────────────────────
+
+class DrillService:
+    """The WSGI application: shared levels, per-user state."""
+
+    def __init__(self, data_folder=DATA_FOLDER, user_folder=USER_DATA_FOLDER):
+        self.user_folder = user_folder
+        os.makedirs(user_folder, exist_ok=True)
+        # Also used, under `lock`, to split a learner's old flat progress.json.
+        self.cache = cache = LevelCache(data_folder, os.path.join(user_folder, "levels.json"))
+        names = cache.scan()
+        self.levels = {}
+        for level in names:
+            points = cache.points(level)
+            if points:
+                self.levels[level] = (points, cache.index(level))
+        if cache.dirty:
+            atomic_write_json(cache.path, cache.to_json())
+        self.learners = {}
+        self.lock = threading.Lock()
+        self.routes = {
+            ("GET", "/levels"): self.list_levels,
+            ("POST", "/deal"): self.deal,
+            ("POST", "/rate"): self.rate,
+            ("GET", "/stats"): self.stats,
+        }
+
+    def learner(self, name):
+        if not isinstance(name, str) or not USER_NAME.fullmatch(name):
+            raise ServiceError(400, "user must be 1-32 letters, digits, '-' or '_'")
+        learner = self.learners.get(name)
+        if learner is None:
+            with self.lock:
+                learner = self.learners.get(name)
+                if learner is None:
+                    folder = os.path.join(self.user_folder, "users", name)
+                    learner = self.learners[name] = Learner(name, folder, self.cache)
+        return learner
+
+    def flush(self, final=False):
+        with self.lock:
+            learners = list(self.learners.values())
+        return sum(1 for learner in learners if learner.flush(final))
+
+    # ── Endpoints ─────────────────────────────────────────
+
+    def list_levels(self, query, body):
+        return {"levels": [{"name": level, "points": len(points)}
+                           for level, (points, _) in self.levels.items()]}
+
+    def _deal(self, learner, level, n):
+        # Called with learner.lock held.
+        points, index = self.levels[level]
+        session = learner.session(level, points, index)
+        cards = session.deal(max(1, min(MAX_POINTS, n, len(session))))
+        learner.round = (level, cards)
+        return [{"name": card["name"], "url": card["url"],
+                 "mastery": mastery(session.weights[card["name"]])} for card in cards]
+
+    def deal(self, query, body):
+        learner = self.learner(body.get("user"))
+        level = body.get("level")
+        if not isinstance(level, str) or level not in self.levels:
+            raise ServiceError(404, f"unknown level: {level}")
+        n = body.get("points", 1)
+        if not isinstance(n, int):
+            raise ServiceError(400, "points must be an integer")
+        with learner.lock:
+            return {"level": level, "cards": self._deal(learner, level, n)}
+
+    def rate(self, query, body):
+        learner = self.learner(body.get("user"))
+        sentence = body.get("sentence")
+        ratings = body.get("ratings")
+        if not isinstance(sentence, str) or not sentence.strip():
+            raise ServiceError(400, "write a sentence before rating")
+        if not isinstance(ratings, dict) or any(d not in DIFFICULTIES for d in ratings.values()):
+            raise ServiceError(400, "ratings must map grammar names to Easy, Normal or Hard")
+        sentence = sentence.strip()
+        with learner.lock:
+            if learner.round is None:
+                raise ServiceError(409, "no round dealt")
+            level, cards = learner.round
+            if any(card["name"] not in ratings for card in cards):
+                raise ServiceError(400, "rate every grammar point before continuing")
+            session = learner.sessions[level]
+            rated = {}
+            for card in cards:
+                name = card["name"]
+                diff = ratings[name]
+                rated[name] = mastery(session.rate(name, diff))
+                entry = make_entry(name, sentence, diff)
+                learner.pending.append(entry)
+                if learner.stats is not None:
+                    learner.stats.add(entry)
+            n = body.get("points", len(cards))
+            if not isinstance(n, int):
+                n = len(cards)
+            return {"mastery": rated, "level": level, "cards": self._deal(learner, level, n)}
+
+    def stats(self, query, body):
+        learner = self.learner(query.get("user", [None])[0])
+        stats = learner.load_stats()
+        with learner.lock:
+            current, best = stats.streaks()
+            total, easy, normal, hard, grammar = stats.period(1)
+            return {
+                "reviews": stats.reviews,
+                "sentences": stats.unique_sentences(),
+                "streak": current,
+                "best_streak": best,
+                "today": {"reviews": total, "easy": easy, "normal": normal,
+                          "hard": hard, "grammar": grammar},
+                "difficulty": dict(stats.difficulty),
+            }
+
+    # ── WSGI ──────────────────────────────────────────────
+
+    def __call__(self, environ, start_response):
+        try:
+            handler = self.routes.get((environ["REQUEST_METHOD"], environ.get("PATH_INFO", "")))
+            if handler is None:
+                raise ServiceError(404, "not found")
+            query = parse_qs(environ.get("QUERY_STRING", ""))
+            body = self._read_body(environ) if environ["REQUEST_METHOD"] == "POST" else {}
+            status, payload = 200, handler(query, body)
+        except ServiceError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            status, payload = 500, {"error": "internal error"}
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        start_response(f"{status} {STATUS_TEXT.get(status, 'Error')}",
+                       [("Content-Type", "application/json; charset=utf-8"),
+                        ("Content-Length", str(len(data)))])
+        return [data]
+
+    @staticmethod
+    def _read_body(environ):
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length <= 0:
+            return {}
+        if length > MAX_BODY:
+            raise ServiceError(413, "request body too large")
+        try:
+            body = json.loads(environ["wsgi.input"].read(length).decode('utf-8'))
+        except (UnicodeDecodeError, ValueError):
+            raise ServiceError(400, "body must be JSON")
+        if not isinstance(body, dict):
+            raise ServiceError(400, "body must be a JSON object")
+        return body
+
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 409: "Conflict",
+               413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+# ─────────────────────────────────────────────────────────────
+# Server
+# ─────────────────────────────────────────────────────────────
+
+class Flusher(threading.Thread):
+    """Saves every learner's changes each `interval` seconds."""
+
+    def __init__(self, service, interval=FLUSH_SECONDS):
+        super().__init__(name="flusher", daemon=True)
+        self.service = service
+        self.interval = interval
+        self._closing = threading.Event()
+
+    def run(self):
+        while not self._closing.wait(self.interval):
+            self.service.flush()
+
+    def stop(self):
+        self._closing.set()
+        self.join()
+        self.service.flush(final=True)
+
+
+class ThreadingWSGIServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 512
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start(service, host="127.0.0.1", port=0, flush=FLUSH_SECONDS, verbose=False):
+    """Serve `service` on a background thread; returns (server, flusher)."""
+    handler = WSGIRequestHandler if verbose else QuietHandler
+    server = make_server(host, port, service, ThreadingWSGIServer, handler)
+    flusher = Flusher(service, flush)
+    flusher.start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, flusher
+
+
+def stop(server, flusher):
+    server.shutdown()
+    server.server_close()
+    flusher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grammar Drill service for many local learners")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--flush", type=float, default=FLUSH_SECONDS, help="seconds between saves")
+    parser.add_argument("--data", default=DATA_FOLDER, help="level files folder")
+    parser.add_argument("--user-data", default=USER_DATA_FOLDER, help="per-user files go in <this>/users/")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    service = DrillService(args.data, args.user_data)
+    if not service.levels:
+        print(f"No levels found. Add .txt files to the {args.data}/ folder.")
+        return 1
+    server, flusher = start(service, args.host, args.port, args.flush, args.verbose)
+    host, port = server.server_address[:2]
+    print(f"Grammar Drill service on http://{host}:{port}/  ({len(service.levels)} levels, Ctrl+C stops)")
+    # SIGTERM unwinds like Ctrl+C, so a supervised service still saves on the way out.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nSaving...")
+        stop(server, flusher)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
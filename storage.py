@@ -0,0 +1,1364 @@
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_right
+from collections import Counter
+from datetime import datetime
+
+from drill import StatsIndex, HistoryStore, sentence_key
+
+# ─────────────────────────────────────────────────────────────
+# Paths
+# ─────────────────────────────────────────────────────────────
+
+DATA_FOLDER      = "data"
+USER_DATA_FOLDER = "user_data"
+PROGRESS_FILE    = os.path.join(USER_DATA_FOLDER, "progress.json")
+PROGRESS_FOLDER  = os.path.join(USER_DATA_FOLDER, "progress")
+LOG_FOLDER       = os.path.join(USER_DATA_FOLDER, "log")
+LOG_FILE         = os.path.join(USER_DATA_FOLDER, "study_log.jsonl")
+LEGACY_LOG_FILE  = os.path.join(USER_DATA_FOLDER, "study_log.json")
+SETTINGS_FILE    = os.path.join(USER_DATA_FOLDER, "settings.json")
+STATS_FILE       = os.path.join(USER_DATA_FOLDER, "stats.json")
+SQLITE_FILE      = os.path.join(USER_DATA_FOLDER, "drill.sqlite3")
+LEVEL_CACHE_FILE = os.path.join(USER_DATA_FOLDER, "levels.json")
+PROFILE_FOLDER   = os.path.join(USER_DATA_FOLDER, "profiles")
+
+
+def read_settings():
+    try:
+        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+# ─────────────────────────────────────────────────────────────
+# Levels (compiled data/*.txt cache)
+# ─────────────────────────────────────────────────────────────
+
+def parse_level(text):
+    """Grammar points from a level file: one `name ;; url` per line."""
+    points = []
+    for line in text.splitlines():
+        line = line.strip()
+        if ";;" in line:
+            parts = [p.strip() for p in line.split(";;")]
+            if len(parts) >= 2 and parts[0] and parts[1]:
+                points.append({"name": parts[0], "url": parts[1]})
+    return points
+
+
+class LevelCache:
+    """Parsed level files, recompiled only when a file's mtime or size changes.
+
+    Each level keeps its points, a point count and a SHA-1 of the file. The
+    compiled form is kept in user_data/levels.json, so listing levels with
+    their counts never opens the .txt files and a session starts from memory.
+    """
+
+    VERSION = 1
+
+    def __init__(self, folder=DATA_FOLDER, path=LEVEL_CACHE_FILE):
+        self.folder = folder
+        self.path = path
+        self.levels = {}
+        self.dirty = False
+        self._points = {}
+        self._indexes = {}
+        self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.levels = data["levels"]
+        except Exception:
+            self.levels = {}
+
+    def _compile(self, level, filename, st):
+        with open(os.path.join(self.folder, filename), 'rb') as f:
+            raw = f.read()
+        points = parse_level(raw.decode('utf-8'))
+        self.levels[level] = {
+            "file": filename,
+            "mtime": st.st_mtime_ns,
+            "size": st.st_size,
+            "hash": hashlib.sha1(raw).hexdigest(),
+            "count": len(points),
+            "points": [[p["name"], p["url"]] for p in points],
+        }
+        self._points[level] = points
+        self._indexes.pop(level, None)
+        self.dirty = True
+
+    def _fresh(self, entry, st):
+        return entry.get("mtime") == st.st_mtime_ns and entry.get("size") == st.st_size
+
+    def scan(self):
+        """Sorted level names, recompiling changed files and dropping removed ones."""
+        seen = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for de in it:
+                    if de.name.lower().endswith(".txt") and de.is_file():
+                        seen[de.name[:-4]] = (de.name, de.stat())
+        except OSError:
+            pass
+        for level in [lvl for lvl in self.levels if lvl not in seen]:
+            del self.levels[level]
+            self._points.pop(level, None)
+            self._indexes.pop(level, None)
+            self.dirty = True
+        for level, (filename, st) in seen.items():
+            entry = self.levels.get(level)
+            if entry is None or entry.get("file") != filename or not self._fresh(entry, st):
+                try:
+                    self._compile(level, filename, st)
+                except Exception:
+                    self.levels.pop(level, None)
+                    self._points.pop(level, None)
+        return sorted(self.levels)
+
+    def count(self, level):
+        return self.levels[level]["count"]
+
+    def points(self, level):
+        """Grammar dicts for a level (shared; do not mutate). Raises if unreadable."""
+        entry = self.levels.get(level)
+        filename = entry["file"] if entry else f"{level}.txt"
+        st = os.stat(os.path.join(self.folder, filename))
+        if entry is None or not self._fresh(entry, st):
+            self._compile(level, filename, st)
+        points = self._points.get(level)
+        if points is None:
+            points = self._points[level] = [{"name": n, "url": u} for n, u in self.levels[level]["points"]]
+        return points
+
+    def index(self, level):
+        """{name: [positions]} for a level's points."""
+        index = self._indexes.get(level)
+        if index is None:
+            index = {}
+            for i, p in enumerate(self.points(level)):
+                index.setdefault(p["name"], []).append(i)
+            self._indexes[level] = index
+        return index
+
+    def to_json(self):
+        self.dirty = False
+        return {"version": self.VERSION, "levels": dict(self.levels)}
+
+
+# ─────────────────────────────────────────────────────────────
+# Study Log (monthly JSON Lines segments)
+# ─────────────────────────────────────────────────────────────
+
+def _month_of(when):
+    if isinstance(when, str) and len(when) >= 7 and when[:4].isdigit() \
+            and when[4] == "-" and when[5:7].isdigit():
+        return when[:7]
+    return None
+
+
+def segment_month(entry, newest):
+    """Segment an appended entry goes to: a later month opens a new segment,
+    anything else (older or unparseable dates) joins the newest one."""
+    month = _month_of(entry.get("date") if isinstance(entry, dict) else None)
+    if newest is None:
+        return month or datetime.now().strftime("%Y-%m")
+    return month if month is not None and month > newest else newest
+
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False)
+_encode_str = json.encoder.encode_basestring
+
+
+def _dump_line(item):
+    # A review of four strings (nearly all of them) is spelled out directly,
+    # a third of the cost of a trip through the encoder.
+    if type(item) is dict and len(item) == 4:
+        d, g, s, f = (item.get("date"), item.get("grammar"), item.get("sentence"),
+                      item.get("difficulty"))
+        if type(d) is str and type(g) is str and type(s) is str and type(f) is str:
+            return (f'{{"date": {_encode_str(d)}, "grammar": {_encode_str(g)}, '
+                    f'"sentence": {_encode_str(s)}, "difficulty": {_encode_str(f)}}}\n')
+    # One shared encoder: json.dumps with options builds a new one per call.
+    return _ENCODER.encode(item) + "\n"
+
+
+def _entry_date(item):
+    when = item.get("date") if isinstance(item, dict) else None
+    return when if isinstance(when, str) else ""
+
+
+def _json_lines(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+class StudyLog:
+    """Review journal split into monthly segments under user_data/log/.
+
+    Each segment is JSON Lines, oldest first. Only the newest segment is
+    ever appended to; `compact` closes the others into YYYY-MM.jsonl.gz with
+    a YYYY-MM.rollup.json StatsIndex beside it, so all-time stats never need
+    to decompress them, and lists their sizes in segments.json. While a
+    month still has its plain file (compaction interrupted), that file is
+    the one that counts.
+    """
+
+    def __init__(self, folder=LOG_FOLDER, flat_path=LOG_FILE, legacy_path=LEGACY_LOG_FILE):
+        self.folder = folder
+        self.flat_path = flat_path
+        self.legacy_path = legacy_path
+        self.manifest_path = os.path.join(folder, "segments.json")
+        self._newest = None
+
+    def _plain(self, month):
+        return os.path.join(self.folder, month + ".jsonl")
+
+    def _gz(self, month):
+        return os.path.join(self.folder, month + ".jsonl.gz")
+
+    def _rollup(self, month):
+        return os.path.join(self.folder, month + ".rollup.json")
+
+    def segments(self):
+        """[(month, closed)] oldest first."""
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return []
+        months = {}
+        for name in names:
+            if name.endswith(".jsonl.gz") and len(name) == 16:
+                months.setdefault(name[:7], True)
+            elif name.endswith(".jsonl") and len(name) == 13:
+                months[name[:7]] = False
+        return sorted(months.items())
+
+    def closed_sizes(self):
+        """{month: entries} for segments that compaction has closed."""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == StatsIndex.VERSION:
+                return data["closed"]
+        except Exception:
+            pass
+        return {}
+
+    def rollup(self, month):
+        """StatsIndex of a closed segment, or None if it has no usable rollup."""
+        try:
+            with open(self._rollup(month), 'r', encoding='utf-8') as f:
+                return StatsIndex.from_json(json.load(f))
+        except Exception:
+            return None
+
+    def migrate(self):
+        """One-time split of the older single-file journals into segments.
+
+        study_log.jsonl (or the original newest-first study_log.json) is
+        written out month by month into a scratch folder that then replaces
+        log/ in one rename; the source is kept as .bak.
+        """
+        if os.path.isdir(self.folder):
+            return
+        if os.path.exists(self.flat_path):
+            source = self.flat_path
+            with open(source, 'r', encoding='utf-8') as f:
+                self._split_into(_json_lines(f))
+        elif os.path.exists(self.legacy_path):
+            source = self.legacy_path
+            try:
+                with open(source, 'r', encoding='utf-8') as f:
+                    history = json.load(f)
+            except Exception:
+                return
+            self._split_into(reversed(history))
+        else:
+            return
+        os.replace(self.folder + ".tmp", self.folder)
+        os.replace(source, source + ".bak")
+
+    def _split_into(self, entries):
+        tmp = self.folder + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        StudyLog(tmp)._write(entries, chunk=5000)
+
+    def iter_segment(self, month):
+        """Entries of one segment, oldest first. Torn or corrupt lines are skipped."""
+        try:
+            with open(self._plain(month), 'r', encoding='utf-8') as f:
+                yield from _json_lines(f)
+            return
+        except FileNotFoundError:
+            pass
+        try:
+            with gzip.open(self._gz(month), 'rt', encoding='utf-8') as f:
+                yield from _json_lines(f)
+        except FileNotFoundError:
+            return
+
+    def count(self):
+        """Entries in the log, as len(SegmentedHistory) counts them; closed months by size only."""
+        sizes = self.closed_sizes()
+        return sum(sizes[month] if closed and month in sizes else sum(1 for _ in self.iter_segment(month))
+                   for month, closed in self.segments())
+
+    def iter_entries(self):
+        """Yield entries oldest first, across every segment."""
+        for month, _ in self.segments():
+            yield from self.iter_segment(month)
+
+    def load(self):
+        """Return every entry, newest first."""
+        history = list(self.iter_entries())
+        history.reverse()
+        return history
+
+    def iter_newest(self, chunk_size=500, since=None, limit=None, block=1 << 16):
+        """Yield lists of up to `chunk_size` entries, newest first.
+
+        Plain segments are read backwards from the end one block at a time;
+        a closed segment is decompressed only when reached. Stops at the
+        first entry dated before `since` ("YYYY-MM-DD" or "YYYY-MM-DD HH:MM")
+        or after `limit` entries. A segment never holds a later month than
+        its name, so older segments are not opened once `since` rules them out.
+        """
+        chunk, count = [], 0
+        for month, _ in reversed(self.segments()):
+            if since is not None and month < since[:7]:
+                break
+            for line in self._lines_newest(month, block):
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue
+                if since is not None:
+                    when = item.get("date") if isinstance(item, dict) else None
+                    if isinstance(when, str) and when[:1].isdigit() and when < since:
+                        if chunk:
+                            yield chunk
+                        return
+                chunk.append(item)
+                count += 1
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+                if limit is not None and count >= limit:
+                    if chunk:
+                        yield chunk
+                    return
+        if chunk:
+            yield chunk
+
+    def _lines_newest(self, month, block):
+        try:
+            f = open(self._plain(month), 'rb')
+        except FileNotFoundError:
+            try:
+                with gzip.open(self._gz(month), 'rb') as gz:
+                    lines = gz.read().split(b"\n")
+            except FileNotFoundError:
+                return
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode('utf-8', 'replace')
+            return
+        with f:
+            pos = f.seek(0, os.SEEK_END)
+            rest = b""
+            while pos > 0:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + rest).split(b"\n")
+                rest = lines[0]
+                for line in reversed(lines[1:]):
+                    if line.strip():
+                        yield line.decode('utf-8', 'replace')
+            if rest.strip():
+                yield rest.decode('utf-8', 'replace')
+
+    def append(self, entries):
+        """Append entries (oldest first); a later month starts a new segment."""
+        if not entries:
+            return
+        if self._newest is None:
+            # Never start a fresh journal next to an unconverted older one.
+            self.migrate()
+            os.makedirs(self.folder, exist_ok=True)
+            segments = self.segments()
+            self._newest = segments[-1][0] if segments else None
+        self._write(entries)
+
+    def _write(self, entries, chunk=None):
+        month, lines = None, []
+        for entry in entries:
+            target = segment_month(entry, self._newest)
+            if target != month or (chunk and len(lines) >= chunk):
+                self._write_lines(month, lines)
+                month, lines = target, []
+                self._newest = target
+            lines.append(_dump_line(entry))
+        self._write_lines(month, lines)
+
+    def _write_lines(self, month, lines):
+        if not lines:
+            return
+        path = self._plain(month)
+        # A crash mid-append leaves a torn last line; start fresh after it.
+        lead = self._missing_newline(path)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lead + "".join(lines))
+
+    def _missing_newline(self, path):
+        try:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                return "" if f.read(1) == b"\n" else "\n"
+        except OSError:
+            return ""
+
+    def merge(self, month, entries, later=False):
+        """Merge date-sorted `entries` into one month's segment, oldest first.
+
+        Each review the month already holds (same date, grammar, sentence and
+        difficulty) absorbs one matching entry; repeats beyond that are real
+        reviews in the same minute and are kept, so importing the same
+        source twice adds nothing the second time. The month
+        is rewritten closed if a later segment exists (or `later` says one
+        is about to), else as the plain newest segment. Returns the entries
+        actually added.
+        """
+        self.migrate()
+        os.makedirs(self.folder, exist_ok=True)
+        existing = list(self.iter_segment(month))
+        held = Counter(_review_row(item) for item in existing if isinstance(item, dict))
+        added = []
+        for entry in entries:
+            key = _review_row(entry)
+            if held[key]:
+                held[key] -= 1
+            else:
+                added.append(entry)
+        if not added:
+            return added
+        merged = heapq.merge(existing, added, key=_entry_date) if existing else added
+        self._newest = None
+        if later or any(m > month for m, _ in self.segments()):
+            sizes = self.closed_sizes()
+            sizes[month] = self._close(month, merged)
+            atomic_write_json(self.manifest_path, {"version": StatsIndex.VERSION, "closed": sizes})
+            if os.path.exists(self._plain(month)):
+                os.remove(self._plain(month))
+        else:
+            tmp = self._plain(month) + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.writelines(_dump_line(item) for item in merged)
+            os.replace(tmp, self._plain(month))
+        return added
+
+    def _close(self, month, items):
+        """Write `items` as the month's .jsonl.gz and rollup; returns the entry count."""
+        items = list(items)
+        tmp = self._gz(month) + ".tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as out:
+            # A write per line through gzip's text layer costs as much as the encoding.
+            for start in range(0, len(items), 4096):
+                out.write("".join(map(_dump_line, items[start:start + 4096])))
+        os.replace(tmp, self._gz(month))
+        stats = StatsIndex.from_store(HistoryStore.from_entries(items))
+        atomic_write_json(self._rollup(month), stats.to_json())
+        return stats.entries
+
+    def compact(self):
+        """Close every segment but the newest: gzip it and record its rollup."""
+        segments = self.segments()
+        sizes = self.closed_sizes()
+        closed_now, changed = [], False
+        for month, closed in segments[:-1]:
+            if closed and month in sizes and os.path.exists(self._rollup(month)):
+                continue
+            if closed:
+                rows = HistoryStore.from_entries(self.iter_segment(month))
+                stats = StatsIndex.from_store(rows)
+                atomic_write_json(self._rollup(month), stats.to_json())
+                sizes[month] = stats.entries
+            else:
+                sizes[month] = self._close(month, self.iter_segment(month))
+                closed_now.append(month)
+            changed = True
+        if changed:
+            atomic_write_json(self.manifest_path, {"version": StatsIndex.VERSION, "closed": sizes})
+        # Plain files go only once their gz, rollup and manifest entry are on disk.
+        for month in closed_now:
+            os.remove(self._plain(month))
+        return changed
+
+
+class LogSegment:
+    def __init__(self, month, size, store=None):
+        self.month = month
+        self.size = size
+        self.store = store
+
+
+class SegmentedHistory:
+    """Newest-first history over the study log's monthly segments.
+
+    Open segments are read up front. Closed ones are known only by their
+    size until a row or a search reaches them, and are then decompressed
+    into a HistoryStore of their own.
+    """
+
+    def __init__(self, study_log):
+        self.log = study_log
+        self.segments = []
+        sizes = study_log.closed_sizes()
+        for month, closed in study_log.segments():
+            if closed and month in sizes:
+                self.segments.append(LogSegment(month, sizes[month]))
+            else:
+                store = HistoryStore.from_entries(study_log.iter_segment(month))
+                self.segments.append(LogSegment(month, len(store), store))
+        self.size = sum(seg.size for seg in self.segments)
+
+    def __len__(self):
+        return self.size
+
+    def open(self, seg):
+        if seg.store is None:
+            seg.store = HistoryStore.from_entries(self.log.iter_segment(seg.month))
+            self.size += len(seg.store) - seg.size
+            seg.size = len(seg.store)
+        return seg.store
+
+    def add(self, entry):
+        newest = self.segments[-1] if self.segments else None
+        month = segment_month(entry, newest.month if newest else None)
+        if newest is None or month != newest.month:
+            newest = LogSegment(month, 0, HistoryStore())
+            self.segments.append(newest)
+        self.open(newest).add(entry)
+        newest.size += 1
+        self.size += 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.size
+        for seg in reversed(self.segments):
+            if i < seg.size:
+                return self.open(seg)[i]
+            i -= seg.size
+        raise IndexError(i)
+
+    def __iter__(self):
+        for seg in reversed(self.segments):
+            yield from self.open(seg)
+
+    def __reversed__(self):
+        for seg in self.segments:
+            yield from reversed(self.open(seg))
+
+    def build_stats(self):
+        """StatsIndex of everything: closed segments from their rollups, the rest from rows."""
+        stats = StatsIndex()
+        for seg in self.segments:
+            part = self.log.rollup(seg.month) if seg.store is None else None
+            stats.merge(part or StatsIndex.from_store(self.open(seg)))
+        return stats
+
+    def search(self, query, difficulty="All", previous=None):
+        return SegmentedResult(self, query, difficulty, previous)
+
+
+class SegmentedResult:
+    """Search hits newest first, gathered one segment at a time.
+
+    Segments already in memory are searched straight away; `fetch` opens
+    closed ones, oldest last, only while the view still wants more rows.
+    """
+
+    def __init__(self, history, query, difficulty, previous=None):
+        self.history = history
+        self.query = query
+        self.difficulty = difficulty
+        self.parts = []
+        self.starts = []
+        self.size = 0
+        self._next = len(history.segments) - 1
+        self._previous = {}
+        if isinstance(previous, SegmentedResult) and previous.history is history:
+            self._previous = {seg.month: res for seg, res in previous.parts}
+        while not self.complete and history.segments[self._next].store is not None:
+            self._search_next()
+
+    @property
+    def complete(self):
+        return self._next < 0
+
+    def __len__(self):
+        return self.size
+
+    def item(self, i):
+        k = bisect_right(self.starts, i) - 1
+        return self.parts[k][1].item(i - self.starts[k])
+
+    def _search_next(self):
+        seg = self.history.segments[self._next]
+        self._next -= 1
+        res = self.history.open(seg).search(self.query, self.difficulty,
+                                            self._previous.get(seg.month))
+        self.parts.append((seg, res))
+        self.starts.append(self.size)
+        self.size += len(res)
+
+    def fetch(self, wanted, max_segments=1):
+        """Search further back until `wanted` rows match, opening at most `max_segments`."""
+        while self.size < wanted and not self.complete:
+            if self.history.segments[self._next].store is None:
+                if max_segments <= 0:
+                    return
+                max_segments -= 1
+            self._search_next()
+
+
+class LogTail:
+    """History source for the History window while the full log is loading.
+
+    Entries are pulled from the end of the journal a chunk at a time, only
+    as far as scrolling or a search asks for, into a compact HistoryStore
+    kept newest first. `len()` counts what has been read so far.
+    """
+
+    CHUNK = 500
+
+    def __init__(self, study_log):
+        self.rows = HistoryStore()
+        self._chunks = study_log.iter_newest(self.CHUNK)
+        self.complete = False
+
+    def __len__(self):
+        return len(self.rows)
+
+    def read_chunk(self):
+        for chunk in self._chunks:
+            for item in chunk:
+                self.rows.append(item)
+            return True
+        self.complete = True
+        return False
+
+    def search(self, query, difficulty="All", previous=None):
+        return LogTailResult(self, query.strip().lower(), difficulty)
+
+
+class LogTailResult:
+    """Matches found so far; `fetch` scans further back until it has enough."""
+
+    def __init__(self, tail, query, difficulty):
+        self.tail = tail
+        self.query = query
+        self.difficulty = difficulty
+        self.ids = []
+        self.scanned = 0
+
+    @property
+    def complete(self):
+        return self.tail.complete and self.scanned >= len(self.tail)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def item(self, i):
+        return self.tail.rows.entry_by_row(self.ids[i])
+
+    def fetch(self, wanted, max_chunks=4):
+        """Scan up to `max_chunks` more chunks, stopping once `wanted` rows match."""
+        rows = self.tail.rows
+        while len(self.ids) < wanted:
+            if self.scanned >= len(rows):
+                if max_chunks <= 0 or not self.tail.read_chunk():
+                    return
+                max_chunks -= 1
+            for row in range(self.scanned, len(rows)):
+                item = rows.entry_by_row(row)
+                if self.difficulty != "All" and item.get("difficulty", "Normal") != self.difficulty:
+                    continue
+                text = f"{item.get('date', '')} {item.get('grammar', '')} " \
+                       f"{item.get('sentence', '')} {item.get('difficulty', '')}"
+                if self.query in text.lower():
+                    self.ids.append(row)
+            self.scanned = len(rows)
+
+
+# ─────────────────────────────────────────────────────────────
+# Background Writer
+# ─────────────────────────────────────────────────────────────
+
+def atomic_write_json(path, obj, **dump_kw):
+    """Write to a sibling temp file and rename it over `path`."""
+    tmp = path + ".tmp"
+    # dumps, not dump: dump always takes the pure-Python encoder.
+    data = json.dumps(obj, **dump_kw)
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def merge_weights(into, weights):
+    """Fold {level: {name: weight}} into `into`; the later value wins."""
+    for level, shard in weights.items():
+        into.setdefault(level, {}).update(shard)
+
+
+def split_weights(flat, cache):
+    """{level: {name: weight}} from a flat {name: weight} map.
+
+    Each level takes the weights of the names its file lists, so a name
+    shared by two levels seeds both.
+    """
+    shards = {}
+    for level in cache.scan():
+        try:
+            index = cache.index(level)
+        except Exception:
+            continue
+        shard = {name: flat[name] for name in index if name in flat}
+        if shard:
+            shards[level] = shard
+    return shards
+
+
+class SaveWorker(threading.Thread):
+    """Single writer thread for user_data/.
+
+    The UI hands over changed weights, new reviews and snapshots, then returns
+    immediately. Requests arriving within `delay` seconds of each other are
+    merged into one batch for the store, and only the newest snapshot of each
+    extra JSON file (settings) is written. Store writes hold `io_lock`, and
+    `reviews_written` counts the reviews that reached the store.
+    """
+
+    def __init__(self, store, delay=0.4):
+        super().__init__(name="save-worker", daemon=True)
+        self.store = store
+        self.delay = delay
+        self.last_error = None
+        self.io_lock = threading.Lock()
+        self.reviews_written = 0
+        self._cond = threading.Condition()
+        self._files = {}
+        self._weights = None
+        self._reviews = []
+        self._stats = None
+        self._due = 0.0
+        self._busy = False
+        self._closing = False
+
+    def save_json(self, path, obj, **dump_kw):
+        with self._cond:
+            self._files[path] = (obj, dump_kw)
+            self._schedule()
+
+    def submit(self, weights=None, reviews=(), stats=None):
+        """Queue changed weights ({level: {name: weight}}), new reviews and a stats snapshot."""
+        with self._cond:
+            if weights is not None:
+                if self._weights is None:
+                    self._weights = {}
+                merge_weights(self._weights, weights)
+            self._reviews.extend(reviews)
+            if stats is not None:
+                self._stats = stats
+            self._schedule()
+
+    def _schedule(self):
+        self._due = time.monotonic() + self.delay
+        self._cond.notify_all()
+
+    def _pending(self):
+        return bool(self._files or self._reviews or self._weights is not None
+                    or self._stats is not None)
+
+    def run(self):
+        try:
+            self._loop()
+        finally:
+            self.store.close_writer()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending() and not self._closing:
+                    self._cond.wait()
+                while self._pending() and not self._closing:
+                    remaining = self._due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if not self._pending():
+                    return
+                files, self._files = self._files, {}
+                batch = {"weights": self._weights, "reviews": self._reviews, "stats": self._stats}
+                self._weights, self._reviews, self._stats = None, [], None
+                self._busy = True
+            try:
+                ok = self._write(batch, files)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+            if not ok and self._closing:
+                return
+
+    def _write(self, batch, files):
+        try:
+            # The store clears each part of the batch once it is durable.
+            queued = len(batch["reviews"])
+            with self.io_lock:
+                try:
+                    self.store.write(batch)
+                finally:
+                    self.reviews_written += queued - len(batch["reviews"])
+            while files:
+                path, (obj, dump_kw) = next(iter(files.items()))
+                atomic_write_json(path, obj, **dump_kw)
+                del files[path]
+            return True
+        except Exception as e:
+            # Keep whatever did not make it to disk for the next attempt.
+            self.last_error = e
+            traceback.print_exc(file=sys.stderr)
+            with self._cond:
+                self._reviews[:0] = batch["reviews"]
+                if batch["weights"] is not None:
+                    newer = self._weights or {}
+                    self._weights = {level: dict(shard) for level, shard in batch["weights"].items()}
+                    merge_weights(self._weights, newer)
+                if self._stats is None:
+                    self._stats = batch["stats"]
+                for path, item in files.items():
+                    self._files.setdefault(path, item)
+                self._due = time.monotonic() + max(self.delay, 2.0)
+            return False
+
+    def flush(self, timeout=None):
+        """Write everything queued now and wait until it is on disk."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._due = 0.0
+            self._cond.notify_all()
+            while (self._pending() or self._busy) and self.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join()
+
+
+class HistoryLoader(threading.Thread):
+    """Reads history (and stats, for stores that keep them) off the UI thread.
+
+    Stores whose history is only a query handle (`slow_history = False`) are
+    never started; `result()` then loads on the caller's thread. With a
+    `saver`, no review is written while the journal is read, and `written`
+    tells how many of the saver's reviews the loaded history holds.
+    """
+
+    def __init__(self, store, saver=None):
+        super().__init__(name="history-loader", daemon=True)
+        self.store = store
+        self.saver = saver
+        self.history = None
+        self.stats = None
+        self.written = 0
+        self.error = None
+        self.seconds = 0.0
+
+    def run(self):
+        t0 = time.perf_counter()
+        try:
+            with self.saver.io_lock if self.saver is not None else threading.Lock():
+                self.history = self.store.load_history()
+                if self.store.wants_stats:
+                    self.stats = self.store.load_stats(self.history)
+                if self.saver is not None:
+                    self.written = self.saver.reviews_written
+        except Exception as e:
+            self.error = e
+            traceback.print_exc(file=sys.stderr)
+        self.seconds = time.perf_counter() - t0
+
+    def done(self):
+        return self.ident is not None and not self.is_alive()
+
+    def result(self):
+        """(history, stats), waiting for the thread or loading here if it never ran."""
+        if self.ident is None:
+            self.run()
+        else:
+            self.join()
+        if self.history is None:
+            raise self.error
+        return self.history, self.stats
+
+
+# ─────────────────────────────────────────────────────────────
+# Stores
+# ─────────────────────────────────────────────────────────────
+
+def open_store(kind):
+    """Store selected by the "storage" key in settings.json."""
+    if kind == "sqlite":
+        return SqliteStore()
+    return JsonStore()
+
+
+class JsonStore:
+    """progress/ shards + log/ segments + stats.json (the default).
+
+    Weights live in one progress/<level>.json per level: a shard is read
+    when its level is first drilled and only changed shards are rewritten.
+    `folder` defaults to user_data/; the drill service gives each learner
+    a folder of their own.
+    """
+
+    kind = "json"
+    wants_stats = True
+    slow_history = True
+
+    def __init__(self, study_log=None, folder=USER_DATA_FOLDER):
+        self.progress_path = os.path.join(folder, "progress.json")
+        self.progress_folder = os.path.join(folder, "progress")
+        self.stats_path = os.path.join(folder, "stats.json")
+        self.study_log = study_log or StudyLog(os.path.join(folder, "log"),
+                                               os.path.join(folder, "study_log.jsonl"),
+                                               os.path.join(folder, "study_log.json"))
+        self._shards = {}
+
+    def is_new(self):
+        return not os.path.isdir(self.progress_folder) and not os.path.exists(self.progress_path)
+
+    def _shard_path(self, level):
+        return os.path.join(self.progress_folder, level + ".json")
+
+    def migrate_progress(self, cache):
+        """One-time split of a flat progress.json into per-level shards.
+
+        Like the study log migration, the shards are written to a scratch
+        folder that replaces progress/ in one rename, and the source is kept
+        as .bak (the only place names no level lists any more survive).
+        Waits while there are no level files to split by.
+        """
+        if os.path.isdir(self.progress_folder) or not os.path.exists(self.progress_path):
+            return
+        try:
+            with open(self.progress_path, 'r', encoding='utf-8') as f:
+                flat = json.load(f)
+        except Exception:
+            flat = {}
+        if not cache.scan():
+            return
+        tmp = self.progress_folder + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for level, shard in split_weights(flat, cache).items():
+            atomic_write_json(os.path.join(tmp, level + ".json"), shard, indent=2)
+        os.replace(tmp, self.progress_folder)
+        os.replace(self.progress_path, self.progress_path + ".bak")
+
+    def progress_levels(self):
+        try:
+            names = os.listdir(self.progress_folder)
+        except OSError:
+            return []
+        return sorted(n[:-5] for n in names if n.endswith(".json"))
+
+    def load_weights(self, level):
+        weights = {}
+        try:
+            path = self._shard_path(level)
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    weights = json.load(f)
+        except Exception:
+            weights = {}
+        self._shards[level] = dict(weights)
+        return weights
+
+    def load_history(self):
+        try:
+            self.study_log.migrate()
+            self.study_log.compact()
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+        return SegmentedHistory(self.study_log)
+
+    def load_stats(self, history):
+        stats = None
+        try:
+            if os.path.exists(self.stats_path):
+                with open(self.stats_path, 'r', encoding='utf-8') as f:
+                    stats = StatsIndex.from_json(json.load(f))
+        except Exception:
+            stats = None
+        if stats is not None and stats.entries < len(history):
+            # The app writes stats.json on close; fold in what was journaled after it (a crash).
+            for i in range(len(history) - stats.entries - 1, -1, -1):
+                stats.add(history[i])
+        elif stats is None or stats.entries != len(history):
+            # Missing or out of step with the journal: rebuild once and keep it.
+            stats = history.build_stats()
+            atomic_write_json(self.stats_path, stats.to_json())
+        return stats
+
+    def write(self, batch):
+        if batch["reviews"]:
+            self.study_log.append(batch["reviews"])
+            batch["reviews"] = []
+        if batch["weights"] is not None:
+            os.makedirs(self.progress_folder, exist_ok=True)
+            for level in list(batch["weights"]):
+                if level not in self._shards:
+                    self.load_weights(level)
+                shard = self._shards[level]
+                shard.update(batch["weights"][level])
+                atomic_write_json(self._shard_path(level), shard, indent=2)
+                # Written shards leave the batch, so a failure retries only the rest.
+                del batch["weights"][level]
+            batch["weights"] = None
+        if batch["stats"] is not None:
+            atomic_write_json(self.stats_path, batch["stats"])
+            batch["stats"] = None
+
+    def iter_reviews(self):
+        """Every review, oldest first, one segment at a time."""
+        return self.study_log.iter_entries()
+
+    def merge_reviews(self, month, entries, later=False):
+        return self.study_log.merge(month, entries, later)
+
+    def finish_import(self):
+        # Imported reviews land between older ones, so stats.json cannot be caught up: rebuild it.
+        self.study_log.compact()
+        if os.path.exists(self.stats_path):
+            os.remove(self.stats_path)
+
+    def close_writer(self):
+        pass
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reviews (
+    id         INTEGER PRIMARY KEY,
+    date       TEXT NOT NULL,
+    grammar    TEXT NOT NULL,
+    sentence   TEXT NOT NULL DEFAULT '',
+    difficulty TEXT NOT NULL DEFAULT 'Normal'
+);
+CREATE INDEX IF NOT EXISTS reviews_date       ON reviews(date);
+CREATE INDEX IF NOT EXISTS reviews_grammar    ON reviews(grammar);
+CREATE INDEX IF NOT EXISTS reviews_difficulty ON reviews(difficulty);
+CREATE TABLE IF NOT EXISTS weights (
+    grammar TEXT PRIMARY KEY,
+    weight  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progress (
+    level   TEXT NOT NULL,
+    grammar TEXT NOT NULL,
+    weight  REAL NOT NULL,
+    PRIMARY KEY (level, grammar)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Rows whose date does not parse are kept but left out of the stats, as before.
+VALID_DATE = "date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]'"
+
+
+class SqliteStore:
+    """Everything in one sqlite3 database, queried instead of loaded.
+
+    The UI thread reads through its own connection; the writer thread opens
+    a second one on first write. WAL mode lets the two work side by side.
+    """
+
+    kind = "sqlite"
+    wants_stats = False
+    slow_history = False
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self.conn = self._connect()
+        self._wconn = None
+        if self._setting("initialized") is None:
+            self.import_json()
+
+    def _connect(self):
+        import sqlite3  # only paid for when the sqlite store is selected
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SQLITE_SCHEMA)
+        return conn
+
+    def _setting(self, key):
+        row = self.conn.execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def import_json(self, study_log=None, progress=None):
+        """Copy the JSON store's weights and study log in, streaming the log in chunks.
+
+        Weights come from the progress/ shards, or from a flat progress.json
+        not split yet (`migrate_progress` splits it here afterwards).
+        """
+        study_log = study_log or StudyLog()
+        progress = progress or JsonStore(study_log)
+        if progress.is_new():
+            return
+        shards = {level: progress.load_weights(level) for level in progress.progress_levels()}
+        flat = {}
+        if not shards and os.path.exists(progress.progress_path):
+            with open(progress.progress_path, 'r', encoding='utf-8') as f:
+                flat = json.load(f)
+        study_log.migrate()
+        with self.conn:
+            self.conn.execute("DELETE FROM reviews")
+            self.conn.execute("DELETE FROM weights")
+            self.conn.execute("DELETE FROM progress")
+            chunk = []
+            for item in study_log.iter_entries():
+                chunk.append(_review_row(item))
+                if len(chunk) >= 5000:
+                    self.conn.executemany(INSERT_REVIEW, chunk)
+                    chunk = []
+            self.conn.executemany(INSERT_REVIEW, chunk)
+            self.conn.executemany(UPSERT_FLAT_WEIGHT, flat.items())
+            self.conn.executemany(UPSERT_WEIGHT, _weight_rows(shards))
+            if shards:
+                self.conn.execute("INSERT OR REPLACE INTO settings VALUES ('progress', 'split')")
+            self.conn.execute("INSERT OR REPLACE INTO settings VALUES ('initialized', 'json')")
+
+    def is_new(self):
+        return self._setting("initialized") is None
+
+    def migrate_progress(self, cache):
+        """One-time split of the flat weights table into per-level rows.
+
+        The old table is left as it was, like the JSON store's .bak copy.
+        """
+        if self._setting("progress") is not None:
+            return
+        flat = dict(self.conn.execute("SELECT grammar, weight FROM weights"))
+        if flat and not cache.scan():
+            return
+        with self.conn:
+            self.conn.executemany(UPSERT_WEIGHT, _weight_rows(split_weights(flat, cache)))
+            self.conn.execute("INSERT OR REPLACE INTO settings VALUES ('progress', 'split')")
+
+    def progress_levels(self):
+        return [level for (level,) in self.conn.execute("SELECT DISTINCT level FROM progress ORDER BY level")]
+
+    def load_weights(self, level):
+        return dict(self.conn.execute("SELECT grammar, weight FROM progress WHERE level = ?", (level,)))
+
+    def load_history(self):
+        return SqliteHistory(self.conn)
+
+    def load_stats(self, history=None, own_connection=False):
+        """Build the dashboard aggregate with GROUP BY queries.
+
+        `own_connection` opens (and closes) a private connection, so the
+        aggregate can be built on a worker thread.
+        """
+        if not own_connection:
+            return self._aggregate(self.conn.execute)
+        conn = self._connect()
+        try:
+            return self._aggregate(conn.execute)
+        finally:
+            conn.close()
+
+    def _aggregate(self, q):
+        stats = StatsIndex()
+        stats.entries = q("SELECT COUNT(*) FROM reviews").fetchone()[0]
+        stats.reviews = q(f"SELECT COUNT(*) FROM reviews WHERE {VALID_DATE}").fetchone()[0]
+        for day, total, easy, normal, hard in q(
+                f"SELECT substr(date, 1, 10) AS day, COUNT(*), SUM(difficulty = 'Easy'), "
+                f"SUM(difficulty = 'Normal'), SUM(difficulty = 'Hard') "
+                f"FROM reviews WHERE {VALID_DATE} GROUP BY day"):
+            stats.days[day] = [total, easy, normal, hard]
+            stats.day_grammar[day] = []
+        for day, name in q(f"SELECT DISTINCT substr(date, 1, 10), grammar FROM reviews WHERE {VALID_DATE}"):
+            stats.day_grammar[day].append(name)
+        for wd, n in q(f"SELECT strftime('%w', substr(date, 1, 10)) AS wd, COUNT(*) "
+                       f"FROM reviews WHERE {VALID_DATE} GROUP BY wd"):
+            if wd is not None:
+                stats.weekdays[(int(wd) + 6) % 7] += n
+        for hour, n in q(f"SELECT CAST(substr(date, 12, 2) AS INTEGER) AS h, COUNT(*) "
+                         f"FROM reviews WHERE {VALID_DATE} GROUP BY h"):
+            if 0 <= hour < 24:
+                stats.hours[hour] += n
+        stats.difficulty = dict(q(f"SELECT difficulty, COUNT(*) FROM reviews WHERE {VALID_DATE} GROUP BY difficulty"))
+        stats.grammar = dict(q(f"SELECT grammar, COUNT(*) FROM reviews WHERE {VALID_DATE} GROUP BY grammar"))
+        chars, written, longest, shortest = q(
+            f"SELECT SUM(length(sentence)), COUNT(*), MAX(length(sentence)), MIN(length(sentence)) "
+            f"FROM reviews WHERE sentence != '' AND {VALID_DATE}").fetchone()
+        stats.chars, stats.written = chars or 0, written
+        stats.longest, stats.shortest = longest or 0, shortest or 0
+        stats.sentences = {sentence_key(s) for (s,) in q(
+            f"SELECT DISTINCT sentence FROM reviews WHERE sentence != '' AND {VALID_DATE}")}
+        stats.blank_sentence = q(
+            f"SELECT EXISTS(SELECT 1 FROM reviews WHERE sentence = '' AND {VALID_DATE})").fetchone()[0] == 1
+        stats.recent = list(q(f"SELECT grammar, difficulty FROM reviews WHERE {VALID_DATE} "
+                              f"ORDER BY date DESC, id DESC LIMIT ?", (StatsIndex.RECENT,)))
+        stats.recount_streaks()
+        return stats
+
+    def write(self, batch):
+        if self._wconn is None:
+            self._wconn = self._connect()
+        with self._wconn:
+            self._wconn.executemany(INSERT_REVIEW, [_review_row(e) for e in batch["reviews"]])
+            if batch["weights"] is not None:
+                self._wconn.executemany(UPSERT_WEIGHT, _weight_rows(batch["weights"]))
+            self._wconn.execute("INSERT OR IGNORE INTO settings VALUES ('initialized', 'app')")
+        batch["reviews"] = []
+        batch["weights"] = None
+        batch["stats"] = None
+
+    def iter_reviews(self):
+        """Every review, oldest first, straight off a cursor."""
+        for date, grammar, sentence, difficulty in self.conn.execute(
+                "SELECT date, grammar, sentence, difficulty FROM reviews ORDER BY date, id"):
+            yield {"date": date, "grammar": grammar, "sentence": sentence, "difficulty": difficulty}
+
+    def merge_reviews(self, month, entries, later=False):
+        """Insert the reviews of one month it does not hold yet; returns those added.
+
+        Matched as in StudyLog.merge: one held review absorbs one entry.
+        """
+        held = Counter(self.conn.execute(
+            "SELECT date, grammar, sentence, difficulty FROM reviews WHERE date >= ? AND date < ?",
+            (month, month + "\x7f")))
+        added, rows = [], []
+        for entry in entries:
+            row = _review_row(entry)
+            if held[row]:
+                held[row] -= 1
+            else:
+                rows.append(row)
+                added.append(entry)
+        with self.conn:
+            self.conn.executemany(INSERT_REVIEW, rows)
+        return added
+
+    def finish_import(self):
+        pass
+
+    def close_writer(self):
+        if self._wconn is not None:
+            self._wconn.close()
+            self._wconn = None
+
+
+INSERT_REVIEW = "INSERT INTO reviews (date, grammar, sentence, difficulty) VALUES (?, ?, ?, ?)"
+UPSERT_WEIGHT = "INSERT OR REPLACE INTO progress (level, grammar, weight) VALUES (?, ?, ?)"
+UPSERT_FLAT_WEIGHT = "INSERT OR REPLACE INTO weights (grammar, weight) VALUES (?, ?)"
+
+
+def _weight_rows(weights):
+    for level, shard in weights.items():
+        for name, weight in shard.items():
+            yield level, name, weight
+
+
+def _review_row(item):
+    return (item.get("date", ""), item.get("grammar", ""),
+            item.get("sentence", ""), item.get("difficulty", "Normal"))
+
+
+class SqliteHistory:
+    """History source for HistoryWindow backed by indexed queries."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+    def add(self, entry):
+        pass  # rows arrive through the writer thread
+
+    def search(self, query, difficulty="All", previous=None):
+        query = query.strip().lower()
+        where, args = [], []
+        if difficulty != "All":
+            where.append("difficulty = ?")
+            args.append(difficulty)
+        if query:
+            pattern = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("(date || ' ' || grammar || ' ' || sentence || ' ' || difficulty) "
+                         "LIKE ? ESCAPE '\\'")
+            args.append(f"%{pattern}%")
+        return SqliteResult(self.conn, " AND ".join(where) or "1", args)
+
+
+class SqliteResult:
+    """Lazily paged rows of one history query, newest first."""
+
+    PAGE = 200
+
+    def __init__(self, conn, where, args):
+        self.conn = conn
+        self.where = where
+        self.args = args
+        self.count = conn.execute(f"SELECT COUNT(*) FROM reviews WHERE {where}", args).fetchone()[0]
+        self._pages = {}
+
+    def __len__(self):
+        return self.count
+
+    def item(self, i):
+        page_no = i // self.PAGE
+        page = self._pages.get(page_no)
+        if page is None:
+            if len(self._pages) > 16:
+                self._pages.clear()
+            rows = self.conn.execute(
+                f"SELECT date, grammar, sentence, difficulty FROM reviews WHERE {self.where} "
+                f"ORDER BY date DESC, id DESC LIMIT ? OFFSET ?", self.args + [self.PAGE, page_no * self.PAGE])
+            page = self._pages[page_no] = [
+                {"date": d, "grammar": g, "sentence": s, "difficulty": f} for d, g, s, f in rows]
+        return page[i - page_no * self.PAGE]
@@ -0,0 +1,145 @@
+"""Terminal drill mode: python main.py --tui [--level N5] [--points 2]
+
+Uses the same data/ levels, weighted dealing, weight rules and user_data/
+files as the desktop app. It never imports tkinter and never loads the study
+log (it only counts it on exit, to keep stats.json honest), so it starts in a
+few tens of milliseconds however long the history is.
+"""
+import argparse
+import json
+import os
+import sys
+
+from storage import (USER_DATA_FOLDER, LEVEL_CACHE_FILE, STATS_FILE, LevelCache,
+                     atomic_write_json, open_store, read_settings)
+from drill import DrillSession, StatsIndex, make_entry, mastery
+
+RATINGS = {"h": "Hard", "1": "Hard", "o": "Normal", "2": "Normal", "e": "Easy", "3": "Easy"}
+LABELS = {"Hard": "HARD x", "Normal": "OK -", "Easy": "EASY +"}
+
+
+def _ask(prompt):
+    try:
+        return input(prompt)
+    except (EOFError, KeyboardInterrupt):
+        print()
+        return None
+
+
+def _pick_level(levels, cache, wanted):
+    if wanted:
+        return wanted if wanted in levels else None
+    for i, lvl in enumerate(levels, 1):
+        print(f"  {i}) {lvl}  ({cache.count(lvl)})")
+    answer = _ask(f"Level [{levels[0]}]: ")
+    if answer is None:
+        return None
+    answer = answer.strip()
+    if not answer:
+        return levels[0]
+    if answer.isdigit() and 1 <= int(answer) <= len(levels):
+        return levels[int(answer) - 1]
+    return answer if answer in levels else None
+
+
+def _rate(card, i, total):
+    while True:
+        answer = _ask(f"  {i}/{total} {card['name']}  [h]ard / [o]k / [e]asy: ")
+        if answer is None:
+            return None
+        diff = RATINGS.get(answer.strip().lower()[:1])
+        if diff:
+            return diff
+
+
+def _fold_stats(study_log, entries):
+    # Keep stats.json in step with the journal so the desktop app need not rebuild it.
+    # If it was already behind (the app crashed), drop it: the app rebuilds a missing one,
+    # while folding onto it here would make it look current and hide the gap.
+    try:
+        with open(STATS_FILE, 'r', encoding='utf-8') as f:
+            stats = StatsIndex.from_json(json.load(f))
+    except Exception:
+        return
+    if stats is None:
+        return
+    if stats.entries != study_log.count() - len(entries):
+        try:
+            os.remove(STATS_FILE)
+        except OSError:
+            pass
+        return
+    for entry in entries:
+        stats.add(entry)
+    atomic_write_json(STATS_FILE, stats.to_json())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="main.py --tui", description="Grammar Drill in the terminal")
+    parser.add_argument("--tui", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--level", help="level name (data/<level>.txt)")
+    parser.add_argument("--points", type=int, default=1, help="grammar points per round (1-5)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(USER_DATA_FOLDER, exist_ok=True)
+    cache = LevelCache()
+    levels = cache.scan()
+    if cache.dirty:
+        atomic_write_json(LEVEL_CACHE_FILE, cache.to_json())
+    if not levels:
+        print("No levels found. Add .txt files to the data/ folder.")
+        return 1
+
+    print("Grammar Drill  (terminal mode)")
+    level = _pick_level(levels, cache, args.level)
+    if level is None:
+        print("Unknown level.")
+        return 1
+
+    store = open_store(read_settings().get("storage", "json"))
+    store.migrate_progress(cache)
+    weights = store.load_weights(level)
+    session = DrillSession(cache.points(level), cache.index(level), weights)
+    n = max(1, min(5, args.points, len(session)))
+    print(f"{level}: {len(session)} grammar points. Empty sentence quits.\n")
+
+    written = []
+    try:
+        while True:
+            cards = session.deal(n)
+            for i, card in enumerate(cards, 1):
+                pct = mastery(weights.get(card["name"], 0))
+                bar = "#" * (pct // 10) + "." * (10 - pct // 10)
+                print(f"  {i}/{len(cards)}  {card['name']}   [{bar}]  {card['url']}")
+            sentence = _ask("\nYour sentence: ")
+            if not sentence or not sentence.strip():
+                break
+            sentence = sentence.strip()
+            ratings = []
+            for i, card in enumerate(cards, 1):
+                diff = _rate(card, i, len(cards))
+                if diff is None:
+                    return 0
+                ratings.append((card["name"], diff))
+            entries = []
+            for name, diff in ratings:
+                session.rate(name, diff)
+                entries.append(make_entry(name, sentence, diff))
+            store.write({"weights": {level: {name: weights[name] for name in session.dirty}},
+                         "reviews": entries, "stats": None})
+            session.dirty.clear()
+            written.extend(entries)
+            print("  " + "   ".join(f"{name}: {LABELS[diff]}" for name, diff in ratings) + "\n")
+    finally:
+        if session.dirty:
+            store.write({"weights": {level: {name: weights[name] for name in session.dirty}},
+                         "reviews": [], "stats": None})
+        if written and store.wants_stats:
+            _fold_stats(store.study_log, written)
+        store.close_writer()
+    print(f"{len(written)} reviews saved.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())